@@ -1,4 +1,6 @@
 import streamlit as st
+import config
+from utils.warmup import get_warmup
 
 st.set_page_config(
     page_title="Face Recognition System",
@@ -7,6 +9,10 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Load the models in the background while the landing page is shown
+if config.WARMUP_ON_START:
+    get_warmup().start()
+
 st.markdown("""
 <style>
     .stApp {
@@ -0,0 +1,60 @@
+"""Recall-vs-latency report for the ANN indexes against the exact matcher.
+
+Usage (from the project root):
+    python -m benchmarks.ann_recall --people 25000 --per-person 4 --queries 200
+"""
+import argparse
+import time
+import numpy as np
+import config
+from benchmarks.common import print_table, summarize, synthetic_database, synthetic_queries, time_calls
+from utils.ann_index import INDEX_TYPES, build_index
+from utils.gallery import EmbeddingGallery
+from utils.matching import GalleryMatcher
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--people", type=int, default=25000)
+    parser.add_argument("--per-person", type=int, default=4)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--candidates", type=int, default=config.ANN_CANDIDATES)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[config.IVF_NPROBE])
+    args = parser.parse_args()
+
+    database = synthetic_database(args.people, args.per_person)
+    queries, _ = synthetic_queries(database, args.queries)
+    gallery = EmbeddingGallery(path="")
+    gallery.set_database(database)
+    matcher = GalleryMatcher(threshold=float('inf'))
+    print(f"Gallery: {len(gallery)} people, {gallery.size} embeddings, "
+          f"{gallery.matrix.nbytes / 2**20:.1f} MiB matrix")
+
+    exact = [matcher.match(gallery, q)[0] for q in queries]
+    exact_latency = time_calls(lambda q: matcher.match(gallery, q), [(q,) for q in queries])
+    rows = [dict(index="exact", nprobe="-", build_s=0.0, index_mib=0.0, recall_at_1=1.0,
+                 **summarize(exact_latency))]
+
+    for kind in INDEX_TYPES:
+        if kind == "brute":
+            continue
+        for nprobe in args.nprobe:
+            config.IVF_NPROBE = nprobe
+            start = time.perf_counter()
+            index = build_index(gallery.matrix, kind)
+            build_seconds = time.perf_counter() - start
+
+            found = [matcher.match_indexed(gallery, index, q, args.candidates)[0] for q in queries]
+            latency = time_calls(lambda q: matcher.match_indexed(gallery, index, q, args.candidates),
+                                 [(q,) for q in queries])
+            rows.append(dict(index=kind, nprobe=nprobe, build_s=build_seconds,
+                             index_mib=index.memory_bytes() / 2**20,
+                             recall_at_1=float(np.mean([a == b for a, b in zip(found, exact)])),
+                             **summarize(latency)))
+
+    print_table(rows, ["index", "nprobe", "build_s", "index_mib", "recall_at_1",
+                       "p50_ms", "p99_ms", "throughput_per_s"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""Throughput of batched embedding/recognition against the single-image path.
+
+Needs the real models and a folder of face photos (searched recursively).
+
+Usage (from the project root):
+    python -m benchmarks.batch_inference --images path/to/photos --batch-sizes 1 8 16 32
+"""
+import argparse
+import sys
+import time
+from benchmarks.common import load_images, print_table
+
+
+def _measure(label: str, fn, count: int):
+    start = time.perf_counter()
+    fn()
+    seconds = time.perf_counter() - start
+    return dict(path=label, images=count, seconds=seconds, images_per_s=count / seconds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", required=True, help="Folder with face photos")
+    parser.add_argument("--limit", type=int, default=256)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 16, 32])
+    args = parser.parse_args()
+
+    from utils.face_recognition import FaceRecognizer
+    images = load_images(args.images, args.limit)
+    if not images:
+        sys.exit(f"No images found in {args.images}")
+
+    recognizer = FaceRecognizer()
+    recognizer.extract_embedding(images[0], use_cache=False)  # Load the models outside the timings
+    recognizer.embed_faces([recognizer.detect_faces(images[0])[0]['face']])
+
+    rows = [_measure("extract_embedding (single)",
+                     lambda: [recognizer.extract_embedding(img, use_cache=False) for img in images], len(images))]
+    for batch_size in args.batch_sizes:
+        rows.append(_measure(f"extract_embeddings_batch (bs={batch_size})",
+                             lambda: recognizer.extract_embeddings_batch(images, batch_size, use_cache=False),
+                             len(images)))
+    rows.append(_measure("recognize_face (single)",
+                         lambda: [recognizer.recognize_face(img) for img in images], len(images)))
+    rows.append(_measure(f"recognize_faces_batch (bs={max(args.batch_sizes)})",
+                         lambda: recognizer.recognize_faces_batch(images, max(args.batch_sizes)), len(images)))
+    print_table(rows, ["path", "images", "seconds", "images_per_s"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+
+
+def synthetic_database(people: int, per_person: int = 4, dim: int = 512,
+                       spread: float = 0.35, seed: int = 0) -> Dict[str, List[np.ndarray]]:
+    """Fake {name: [embedding, ...]} gallery: each person is a random centre
+    plus per-photo noise, roughly mimicking Facenet512 cosine spreads."""
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(people, dim)).astype(np.float32)
+    database = {}
+    for i in range(people):
+        photos = centres[i] + spread * rng.normal(size=(per_person, dim)).astype(np.float32)
+        database[f"person_{i:06d}"] = list(photos)
+    return database
+
+
+def synthetic_queries(database: Dict[str, List[np.ndarray]], count: int,
+                      spread: float = 0.35, seed: int = 1) -> Tuple[np.ndarray, List[str]]:
+    """Probe embeddings drawn around enrolled people, with their true names"""
+    rng = np.random.default_rng(seed)
+    names = list(database)
+    picked = [names[i] for i in rng.integers(0, len(names), count)]
+    queries = np.stack([
+        np.mean(database[name], axis=0) + spread * rng.normal(size=len(database[name][0]))
+        for name in picked
+    ]).astype(np.float32)
+    return queries, picked
+
+
+def load_images(folder: str, limit: Optional[int] = None) -> List[bytes]:
+    """Bytes of every photo under a folder (searched recursively), at most `limit` of them"""
+    images = []
+    for root, _, files in os.walk(folder):
+        for file_name in sorted(files):
+            if limit is not None and len(images) >= limit:
+                return images
+            if file_name.lower().endswith(('.jpg', '.jpeg', '.png')):
+                with open(os.path.join(root, file_name), 'rb') as f:
+                    images.append(f.read())
+    return images
+
+
+def labelled_images(folder: str) -> List[Tuple[str, bytes]]:
+    """(person, image bytes) for every photo in a folder with one sub-folder per person"""
+    return [(person, image) for person in sorted(os.listdir(folder))
+            if os.path.isdir(os.path.join(folder, person))
+            for image in load_images(os.path.join(folder, person))]
+
+
+def time_calls(fn: Callable, args_list: List, warmup: int = 1) -> np.ndarray:
+    """Call fn once per argument and return per-call latencies in milliseconds"""
+    for args in args_list[:warmup]:
+        fn(*args)
+    latencies = []
+    for args in args_list:
+        start = time.perf_counter()
+        fn(*args)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return np.array(latencies)
+
+
+def run_sessions(sessions: int, rounds: int, work: Callable[[int, int], Optional[str]]):
+    """Run `work(session, round)` from `sessions` threads released together.
+
+    `work` returns an error message or None; the result is
+    (latencies_ms, failures, wall_seconds).
+    """
+    barrier = threading.Barrier(sessions)
+    latencies, failures = [], []
+    lock = threading.Lock()
+
+    def session(session_id: int):
+        barrier.wait()
+        for round_id in range(rounds):
+            start = time.perf_counter()
+            error = work(session_id, round_id)
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                latencies.append(elapsed)
+                if error:
+                    failures.append(f"session {session_id} round {round_id}: {error}")
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=sessions) as pool:
+        list(pool.map(session, range(sessions)))
+    return np.array(latencies), failures, time.perf_counter() - started
+
+
+def summarize(latencies_ms: np.ndarray, wall_seconds: float = None) -> Dict[str, float]:
+    """Latency percentiles; pass wall_seconds when calls ran concurrently"""
+    total_seconds = wall_seconds if wall_seconds is not None else float(latencies_ms.sum()) / 1000
+    return {
+        'p50_ms': float(np.percentile(latencies_ms, 50)),
+        'p95_ms': float(np.percentile(latencies_ms, 95)),
+        'p99_ms': float(np.percentile(latencies_ms, 99)),
+        'throughput_per_s': len(latencies_ms) / total_seconds if total_seconds else float('inf'),
+    }
+
+
+def print_table(rows: List[Dict], columns: List[str]):
+    widths = {c: max(len(c), *(len(_fmt(r.get(c))) for r in rows)) for c in columns}
+    print("  ".join(c.ljust(widths[c]) for c in columns))
+    print("  ".join("-" * widths[c] for c in columns))
+    for row in rows:
+        print("  ".join(_fmt(row.get(c)).ljust(widths[c]) for c in columns))
+
+
+def _fmt(value) -> str:
+    if isinstance(value, float):
+        return f"{value:.3f}"
+    return str(value)
@@ -0,0 +1,146 @@
+"""Face detector backends compared on speed, recall and recognition accuracy.
+
+Needs the real models and a labelled folder with one sub-folder of face
+photos per person. For every backend:
+
+    detect_p50/p95_ms  DeepFace.extract_faces latency on one decoded photo
+    recall             share of photos in which a face was found
+    top1               leave-one-out identification: each photo is matched
+                       against all other photos (per-person average distance,
+                       like the kiosk) and the right person ranks first
+    accepted           top1 and within RECOGNITION_THRESHOLD
+    false_accepts      a wrong person within RECOGNITION_THRESHOLD
+
+Identification rates are over photos of people with at least two photos;
+photos without a detected face count as misses. With --enrolment-backend
+the gallery side is embedded with that backend and only the probes use the
+backend under test, as when DETECTOR_BACKENDS sets different enrolment and
+recognition detectors.
+
+Usage (from the project root):
+    python -m benchmarks.detector_benchmark --images path/to/labelled
+    python -m benchmarks.detector_benchmark --images path/to/labelled --backends opencv ssd yunet \\
+        --enrolment-backend retinaface
+"""
+import argparse
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from benchmarks.common import labelled_images, print_table, summarize
+
+DEFAULT_BACKENDS = ["opencv", "ssd", "yunet", "mediapipe", "mtcnn", "retinaface"]
+
+
+def detect_and_embed(recognizer, images: List[np.ndarray],
+                     backend: str) -> Tuple[np.ndarray, List[Optional[np.ndarray]]]:
+    """Detection latencies (ms) and the embedding of the largest face in every image"""
+    latencies, crops = [], []
+    for image in images:
+        start = time.perf_counter()
+        faces = recognizer.detect_faces(image, backend)
+        latencies.append((time.perf_counter() - start) * 1000)
+        largest = max(faces, key=lambda f: f['facial_area'].get('w', 0) * f['facial_area'].get('h', 0), default=None)
+        crops.append(None if largest is None else largest['face'])
+
+    embeddings: List[Optional[np.ndarray]] = [None] * len(images)
+    found = [i for i, crop in enumerate(crops) if crop is not None]
+    for i, embedding in zip(found, recognizer.embed_faces([crops[i] for i in found])):
+        embeddings[i] = embedding
+    return np.array(latencies), embeddings
+
+
+def leave_one_out(probes: List[Optional[np.ndarray]], references: List[Optional[np.ndarray]],
+                  labels: List[str], matcher) -> Dict[str, float]:
+    """Identification rates of every probe against the references of all other photos"""
+    from utils.gallery_file import normalize_rows
+    names = sorted(set(labels))
+    label_ids = np.array([names.index(label) for label in labels])
+    photos_per_person = np.bincount(label_ids, minlength=len(names))
+    evaluated = [i for i in range(len(labels)) if photos_per_person[label_ids[i]] > 1]
+
+    ref_rows = np.array([i for i, e in enumerate(references) if e is not None], dtype=np.int64)
+    top1 = accepted = false_accepts = 0
+    if len(ref_rows):
+        unit, norms = normalize_rows(np.stack([references[i] for i in ref_rows]))
+        ref_labels = label_ids[ref_rows]
+        for i in evaluated:
+            if probes[i] is None:
+                continue
+            distances = matcher.row_distances(unit, norms, probes[i])[0]
+            others = ref_rows != i
+            sums = np.bincount(ref_labels[others], weights=distances[others], minlength=len(names))
+            counts = np.bincount(ref_labels[others], minlength=len(names))
+            averages = np.where(counts > 0, sums / np.maximum(counts, 1), np.inf)
+            best = int(np.argmin(averages))
+            within = averages[best] <= matcher.threshold
+            if best == label_ids[i]:
+                top1 += 1
+                accepted += int(within)
+            else:
+                false_accepts += int(within)
+
+    total = max(len(evaluated), 1)
+    return {'top1': top1 / total, 'accepted': accepted / total, 'false_accepts': false_accepts / total}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", required=True, help="Folder with one sub-folder of photos per person")
+    parser.add_argument("--backends", nargs="+", default=DEFAULT_BACKENDS)
+    parser.add_argument("--enrolment-backend", help="Embed the gallery side with this backend")
+    args = parser.parse_args()
+
+    from deepface import DeepFace
+    from utils.face_recognition import FaceRecognizer
+    from utils.image_io import load_image
+    samples = labelled_images(args.images)
+    if not samples:
+        sys.exit(f"No labelled images found in {args.images}")
+    labels = [person for person, _ in samples]
+    images = [load_image(data) for _, data in samples]
+    print(f"{len(images)} photos of {len(set(labels))} people")
+
+    recognizer = FaceRecognizer()
+    recognizer.embed_faces([np.zeros((160, 160, 3), dtype=np.uint8)])  # Load the recognition model outside the timings
+
+    def prepare(backend: str) -> Optional[str]:
+        """Load the backend's weights outside the timings; an error message if it is unavailable"""
+        try:
+            DeepFace.extract_faces(img_path=images[0], detector_backend=backend, enforce_detection=False)
+            return None
+        except Exception as e:
+            return str(e).splitlines()[0]
+
+    references = None
+    if args.enrolment_backend:
+        error = prepare(args.enrolment_backend)
+        if error:
+            sys.exit(f"Enrolment backend {args.enrolment_backend} is unavailable: {error}")
+        references = detect_and_embed(recognizer, images, args.enrolment_backend)[1]
+
+    rows = []
+    for backend in args.backends:
+        error = prepare(backend)
+        if error:
+            rows.append({'backend': backend, 'error': error})
+            continue
+        latencies, embeddings = detect_and_embed(recognizer, images, backend)
+        latency = summarize(latencies)
+        rows.append({
+            'backend': backend,
+            'detect_p50_ms': latency['p50_ms'],
+            'detect_p95_ms': latency['p95_ms'],
+            'recall': sum(e is not None for e in embeddings) / len(embeddings),
+            **leave_one_out(embeddings, embeddings if references is None else references, labels, recognizer.matcher),
+            'error': '',
+        })
+
+    if args.enrolment_backend:
+        print(f"Gallery embedded with {args.enrolment_backend}")
+    print_table(rows, ["backend", "detect_p50_ms", "detect_p95_ms", "recall", "top1", "accepted",
+                       "false_accepts", "error"])
+
+
+if __name__ == "__main__":
+    main()
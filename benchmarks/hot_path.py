@@ -0,0 +1,371 @@
+"""End-to-end benchmark and regression check for the authentication hot path.
+
+Scenarios, each measured in a fresh process so peak RSS belongs to it alone:
+
+    gallery_load     cold load of the gallery file plus the first match
+    recognize_face   FaceRecognizer.recognize_face against the whole gallery
+    build_database   FaceRecognizer.build_database over one folder per person
+    log_access       DatabaseManager.log_access into a fresh database
+
+Without models, synthetic embeddings stand in for the network: "photos" are
+files holding an embedding, and recognize_face receives precomputed probe
+embeddings, so matching, storage and I/O are measured exactly. With --images
+the real models also run recognize_face (at the largest size) and
+EmotionDetector.analyze_emotion on those photos.
+
+Results are compared with benchmarks/baselines.json and the run exits 1 when
+a p95 latency, throughput or peak RSS regresses by more than --tolerance.
+Baselines are hardware-specific: record them on the machine that runs the
+check with --update-baselines.
+
+Usage (from the project root):
+    python -m benchmarks.hot_path
+    python -m benchmarks.hot_path --sizes 10 1000 --tolerance 0.5
+    python -m benchmarks.hot_path --images path/to/photos --update-baselines
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+import numpy as np
+import config
+from benchmarks.common import load_images, print_table, summarize
+from utils.face_recognition import FaceRecognizer
+from utils.gallery_file import GalleryFileWriter
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINES_PATH = os.path.join(PROJECT_ROOT, "benchmarks", "baselines.json")
+RESULT_PREFIX = "HOT_PATH_RESULT "
+DIM = 512
+SPREAD = 0.35
+# Differences below these are noise, whatever the relative change
+MIN_LATENCY_DELTA_MS = 2.0
+MIN_RSS_DELTA_MIB = 5.0
+
+
+class SyntheticRecognizer(FaceRecognizer):
+    """FaceRecognizer with the network replaced by precomputed embeddings.
+
+    An image is either an index into `probes` or the path of a file holding
+    a raw float32 embedding.
+    """
+
+    def __init__(self, probes: Optional[np.ndarray] = None):
+        super().__init__()
+        self.probes = probes
+
+    def extract_embedding(self, image, use_cache: bool = True,
+                          detector_backend: Optional[str] = None) -> Optional[np.ndarray]:
+        return self.probes[image]
+
+    def extract_embeddings_batch(self, images, batch_size: Optional[int] = None, use_cache: bool = True,
+                                 detector_backend: Optional[str] = None) -> List[Optional[np.ndarray]]:
+        return [np.fromfile(path, dtype=np.float32) for path in images]
+
+
+def _person_embeddings(rng: np.random.Generator, centre: np.ndarray, per_person: int) -> np.ndarray:
+    return centre + SPREAD * rng.standard_normal((per_person, DIM), dtype=np.float32)
+
+
+def write_synthetic_gallery(workdir: str, people: int, per_person: int, queries: int, seed: int = 0) -> str:
+    """Stream a synthetic gallery file plus probe embeddings and their true names; returns the gallery path"""
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((people, DIM), dtype=np.float32)
+    path = os.path.join(workdir, f"gallery_{people}.gallery")
+    writer = GalleryFileWriter(path, config.EMBEDDINGS_DTYPE)
+    for i in range(people):
+        writer.add_person(f"person_{i:06d}", list(_person_embeddings(rng, centres[i], per_person)))
+    writer.close()
+
+    picked = rng.integers(0, people, queries)
+    probes = centres[picked] + SPREAD * rng.standard_normal((queries, DIM), dtype=np.float32)
+    np.save(os.path.join(workdir, f"probes_{people}.npy"), probes)
+    with open(os.path.join(workdir, f"expected_{people}.json"), 'w') as f:
+        json.dump([f"person_{i:06d}" for i in picked], f)
+    return path
+
+
+def _peak_rss_mib() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+# ========================================
+# SCENARIOS (run in a child process)
+# ========================================
+
+def _use_workdir(workdir: str, tag: str):
+    """Point every file the code under test writes at a scratch location"""
+    config.DATABASE_DIR = os.path.join(workdir, f"friends_{tag}")
+    config.EMBEDDINGS_PATH = os.path.join(workdir, f"embeddings_{tag}.gallery")
+    config.EMBEDDING_CACHE_PATH = os.path.join(workdir, f"embedding_cache_{tag}.db")
+    config.DB_PATH = os.path.join(workdir, f"access_control_{tag}.db")
+    config.USER_INFO_PATH = os.path.join(workdir, "missing_user_info.json")
+    config.ACCESS_LOGS_PATH = os.path.join(workdir, "missing_access_logs.json")
+    config.AUDIT_CAPTURE_ENABLED = False
+
+
+def _timed(fn, calls: int, warmup: int = 1) -> np.ndarray:
+    for i in range(min(warmup, calls)):
+        fn(i)
+    latencies = []
+    for i in range(calls):
+        start = time.perf_counter()
+        fn(i)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return np.array(latencies)
+
+
+def scenario_gallery_load(args) -> Dict:
+    from utils.gallery import EmbeddingGallery
+    from utils.matching import GalleryMatcher
+    gallery_path = os.path.join(args.workdir, f"gallery_{args.people}.gallery")
+    probe = np.load(os.path.join(args.workdir, f"probes_{args.people}.npy"))[0]
+    matcher = GalleryMatcher()
+
+    def load(_):
+        gallery = EmbeddingGallery(gallery_path)
+        gallery.ensure_loaded()
+        matcher.match(gallery, probe)
+
+    return {'latencies': _timed(load, args.repeats, warmup=0), 'errors': 0}
+
+
+def scenario_recognize_face(args) -> Dict:
+    _use_workdir(args.workdir, f"recognize_{args.people}")
+    config.EMBEDDINGS_PATH = os.path.join(args.workdir, f"gallery_{args.people}.gallery")
+    probes = np.load(os.path.join(args.workdir, f"probes_{args.people}.npy"))
+    with open(os.path.join(args.workdir, f"expected_{args.people}.json")) as f:
+        expected = json.load(f)
+    recognizer = SyntheticRecognizer(probes)
+    recognizer.ensure_gallery()
+    found = [None] * len(probes)
+
+    def recognize(i):
+        found[i] = recognizer.recognize_face(i)[0]
+
+    latencies = _timed(recognize, len(probes))
+    return {'latencies': latencies, 'errors': sum(a != b for a, b in zip(found, expected))}
+
+
+def scenario_build_database(args) -> Dict:
+    _use_workdir(args.workdir, f"build_{args.people}")
+    rng = np.random.default_rng(1)
+    for i in range(args.people):
+        person_dir = os.path.join(config.DATABASE_DIR, f"person_{i:06d}")
+        os.makedirs(person_dir, exist_ok=True)
+        for j, embedding in enumerate(_person_embeddings(rng, rng.standard_normal(DIM, dtype=np.float32),
+                                                         args.per_person)):
+            embedding.tofile(os.path.join(person_dir, f"photo_{j+1}.jpg"))
+    recognizer = SyntheticRecognizer()
+    built = []
+    latencies = _timed(lambda _: built.append(len(recognizer.build_database())), args.repeats, warmup=0)
+    return {'latencies': latencies, 'errors': sum(count != args.people for count in built)}
+
+
+def scenario_log_access(args) -> Dict:
+    _use_workdir(args.workdir, "log_access")
+    from utils.database_manager import DatabaseManager
+    from utils.user_store import get_user_store
+    names = [f"person_{i:06d}" for i in range(100)]
+    for name in names:
+        get_user_store().upsert(name, {'full_name': name})
+    latencies = _timed(lambda i: DatabaseManager.log_access(names[i % len(names)], 0.9, "neutral"), args.calls)
+    return {'latencies': latencies, 'errors': 0}
+
+
+
+def scenario_recognize_face_models(args) -> Dict:
+    _use_workdir(args.workdir, f"recognize_models_{args.people}")
+    config.EMBEDDINGS_PATH = os.path.join(args.workdir, f"gallery_{args.people}.gallery")
+    images = load_images(args.images)
+    recognizer = FaceRecognizer()
+    recognizer.ensure_gallery()
+    latencies = _timed(lambda i: recognizer.recognize_face(images[i]), len(images))
+    return {'latencies': latencies, 'errors': 0}
+
+
+def scenario_analyze_emotion_models(args) -> Dict:
+    from utils.emotion_detector import EmotionDetector
+    images = load_images(args.images)
+    detector = EmotionDetector()
+    latencies = _timed(lambda i: detector.analyze_emotion(images[i]), len(images))
+    return {'latencies': latencies, 'errors': 0}
+
+
+SCENARIOS = {
+    'gallery_load': scenario_gallery_load,
+    'recognize_face': scenario_recognize_face,
+    'build_database': scenario_build_database,
+    'log_access': scenario_log_access,
+    'recognize_face+models': scenario_recognize_face_models,
+    'analyze_emotion+models': scenario_analyze_emotion_models,
+}
+
+
+def run_child(args):
+    result = SCENARIOS[args.scenario](args)
+    latencies = result['latencies']
+    print(RESULT_PREFIX + json.dumps({
+        'calls': len(latencies),
+        'errors': int(result['errors']),
+        **summarize(latencies),
+        'peak_rss_mib': _peak_rss_mib(),
+    }))
+
+
+# ========================================
+# DRIVER
+# ========================================
+
+def prepare_gallery(people: int, args):
+    # In a child too: Linux carries a parent's peak RSS over into the processes it starts
+    subprocess.run([sys.executable, "-m", "benchmarks.hot_path", "--write-gallery", "--workdir", args.workdir,
+                    "--people", str(people), "--per-person", str(args.per_person), "--queries", str(args.queries)],
+                   cwd=PROJECT_ROOT, check=True)
+
+
+def run_scenario(scenario: str, people: Optional[int], args) -> Dict:
+    command = [sys.executable, "-m", "benchmarks.hot_path", "--scenario", scenario, "--workdir", args.workdir,
+               "--per-person", str(args.per_person), "--repeats", str(args.repeats), "--calls", str(args.calls)]
+    if people is not None:
+        command += ["--people", str(people)]
+    if args.images:
+        command += ["--images", args.images]
+    completed = subprocess.run(command, cwd=PROJECT_ROOT, capture_output=True, text=True)
+    row = {'scenario': scenario, 'people': people if people is not None else "-"}
+    lines = [line for line in completed.stdout.splitlines() if line.startswith(RESULT_PREFIX)]
+    if completed.returncode != 0 or not lines:
+        error = completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "no result"
+        return {**row, 'status': f"failed: {error}"}
+    return {**row, **json.loads(lines[-1][len(RESULT_PREFIX):])}
+
+
+def _key(row: Dict) -> str:
+    return f"{row['scenario']}@{row['people']}"
+
+
+def _settings(args) -> Dict:
+    return {'per_person': args.per_person, 'queries': args.queries, 'repeats': args.repeats, 'calls': args.calls,
+            'embeddings_dtype': config.EMBEDDINGS_DTYPE, 'ann_index': config.ANN_INDEX}
+
+
+def compare(rows: List[Dict], baselines: Dict, tolerance: float) -> List[str]:
+    """Mark each row against its baseline; returns the regressions"""
+    regressions = []
+    for row in rows:
+        if 'p95_ms' not in row:
+            regressions.append(f"{_key(row)}: {row['status']}")
+            continue
+        base = baselines.get(_key(row))
+        if base is None:
+            row['status'] = "new"
+            continue
+        problems = []
+        if row['p95_ms'] > base['p95_ms'] * (1 + tolerance) and row['p95_ms'] - base['p95_ms'] > MIN_LATENCY_DELTA_MS:
+            problems.append(f"p95 {base['p95_ms']:.2f} -> {row['p95_ms']:.2f} ms")
+        mean_delta_ms = 1000 / row['throughput_per_s'] - 1000 / base['throughput_per_s']
+        if row['throughput_per_s'] < base['throughput_per_s'] * (1 - tolerance) and mean_delta_ms > MIN_LATENCY_DELTA_MS:
+            problems.append(f"throughput {base['throughput_per_s']:.1f} -> {row['throughput_per_s']:.1f}/s")
+        if (row['peak_rss_mib'] is not None and base.get('peak_rss_mib') is not None
+                and row['peak_rss_mib'] > base['peak_rss_mib'] * (1 + tolerance)
+                and row['peak_rss_mib'] - base['peak_rss_mib'] > MIN_RSS_DELTA_MIB):
+            problems.append(f"peak RSS {base['peak_rss_mib']:.0f} -> {row['peak_rss_mib']:.0f} MiB")
+        if row['errors']:
+            problems.append(f"{row['errors']} wrong results")
+        row['status'] = "REGRESSED" if problems else "ok"
+        regressions.extend(f"{_key(row)}: {problem}" for problem in problems)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 10000, 100000],
+                        help="Synthetic gallery sizes (people)")
+    parser.add_argument("--per-person", type=int, default=4)
+    parser.add_argument("--queries", type=int, default=200, help="recognize_face calls per size")
+    parser.add_argument("--repeats", type=int, default=5, help="Runs of gallery_load and build_database")
+    parser.add_argument("--calls", type=int, default=1000, help="log_access calls")
+    parser.add_argument("--build-max-people", type=int, default=10000,
+                        help="Largest size for build_database, which writes a file per photo")
+    parser.add_argument("--images", help="Folder of face photos for the model-backed scenarios")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative regression")
+    parser.add_argument("--baselines", default=BASELINES_PATH)
+    parser.add_argument("--update-baselines", action="store_true", help="Store this run as the new baselines")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), help=argparse.SUPPRESS)
+    parser.add_argument("--people", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    parser.add_argument("--write-gallery", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.write_gallery:
+        write_synthetic_gallery(args.workdir, args.people, args.per_person, args.queries)
+        return
+    if args.scenario:
+        run_child(args)
+        return
+
+    args.workdir = tempfile.mkdtemp(prefix="hot_path_")
+    rows = []
+    try:
+        for people in sorted(args.sizes):
+            started = time.perf_counter()
+            prepare_gallery(people, args)
+            print(f"Gallery of {people} people written in {time.perf_counter() - started:.1f}s")
+            rows.append(run_scenario('gallery_load', people, args))
+            rows.append(run_scenario('recognize_face', people, args))
+            if people <= args.build_max_people:
+                rows.append(run_scenario('build_database', people, args))
+        rows.append(run_scenario('log_access', None, args))
+        if args.images:
+            rows.append(run_scenario('recognize_face+models', max(args.sizes), args))
+            rows.append(run_scenario('analyze_emotion+models', None, args))
+    finally:
+        shutil.rmtree(args.workdir, ignore_errors=True)
+
+    stored = {}
+    if os.path.exists(args.baselines):
+        with open(args.baselines, 'r') as f:
+            stored = json.load(f)
+    baselines = stored.get('results', {})
+    if baselines and stored.get('settings') != _settings(args):
+        print(f"⚠️ Baselines were recorded with {stored.get('settings')}, this run uses {_settings(args)}; "
+              f"comparing anyway")
+    regressions = compare(rows, baselines, args.tolerance)
+    print_table(rows, ["scenario", "people", "calls", "errors", "p50_ms", "p95_ms", "p99_ms",
+                       "throughput_per_s", "peak_rss_mib", "status"])
+
+    if args.update_baselines:
+        stored = {
+            'machine': {'platform': platform.platform(), 'python': platform.python_version(),
+                        'cpus': os.cpu_count()},
+            'settings': _settings(args),
+            'results': {**baselines, **{_key(row): {metric: None if row[metric] is None else round(row[metric], 3)
+                                                     for metric in ('p50_ms', 'p95_ms', 'p99_ms',
+                                                                    'throughput_per_s', 'peak_rss_mib')}
+                                         for row in rows if 'p95_ms' in row}},
+        }
+        with open(args.baselines, 'w') as f:
+            json.dump(stored, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baselines written to {args.baselines}")
+        return
+
+    for regression in regressions:
+        print(f"  ✗ {regression}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Import-time breakdown of the Streamlit entry points (python -X importtime).
+
+Each target is imported in a fresh interpreter. Pages are not executed:
+their top-level imports are collected and imported on their own, which is
+what a page pays before it can render anything. The ML stack (deepface,
+TensorFlow, OpenCV) should only load once an inference path runs, so
+--check fails the run if any target pulls it in at import time or cannot
+be imported at all.
+
+Usage (from the project root):
+    python -m benchmarks.import_times
+    python -m benchmarks.import_times --top 10 --check
+    python -m benchmarks.import_times utils.database_manager pages/Admin_App.py
+"""
+import argparse
+import ast
+import os
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+from benchmarks.common import print_table
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_TARGETS = ["App.py", "pages/Admin_App.py", "pages/User_App.py", "utils.database_manager"]
+ML_MODULES = ("deepface", "tensorflow", "keras", "tf_keras", "cv2")
+
+
+def _import_code(target: str) -> str:
+    """Python source that performs the target's imports"""
+    if not target.endswith(".py"):
+        return f"import {target}"
+    with open(os.path.join(PROJECT_ROOT, target), 'r', encoding='utf-8') as f:
+        tree = ast.parse(f.read(), filename=target)
+    lines = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            lines.extend(f"import {alias.name}" for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            lines.append(f"import {node.module}")
+    return "\n".join(lines) or "pass"
+
+
+def _parse_importtime(stderr: str) -> List[Tuple[str, int, int, int]]:
+    """(module, self_us, cumulative_us, nesting depth) for every line of -X importtime output"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+
+def measure(target: str, top: int) -> Dict:
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", _import_code(target)],
+                            cwd=PROJECT_ROOT, capture_output=True, text=True)
+    rows = _parse_importtime(result.stderr)
+    error = ""
+    if result.returncode != 0:
+        error = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "failed"
+
+    # Self time summed per top-level package, e.g. every numpy.* submodule under "numpy"
+    packages: Dict[str, int] = {}
+    for name, self_us, _, _ in rows:
+        package = name.split(".")[0]
+        packages[package] = packages.get(package, 0) + self_us
+    heaviest = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+    return {
+        'target': target,
+        'total_ms': sum(row[1] for row in rows) / 1000,
+        'modules': len(rows),
+        'ml_stack': ",".join(m for m in ML_MODULES if m in packages) or "-",
+        'heaviest': ", ".join(f"{package} {self_us / 1000:.0f}ms" for package, self_us in heaviest),
+        'error': error,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("targets", nargs="*", default=DEFAULT_TARGETS,
+                        help="Page files (*.py) or dotted module names")
+    parser.add_argument("--top", type=int, default=5, help="Heaviest packages to list")
+    parser.add_argument("--check", action="store_true", help="Exit 1 if any target imports the ML stack or fails to import")
+    args = parser.parse_args()
+
+    results = [measure(target, args.top) for target in args.targets]
+    print_table(results, ["target", "total_ms", "modules", "ml_stack", "heaviest"])
+    for result in results:
+        if result['error']:
+            print(f"  ✗ {result['target']}: {result['error']}")
+
+    if args.check and any(result['ml_stack'] != "-" or result['error'] for result in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""Load test: N parallel kiosk sessions sharing one recognition engine.
+
+With real models, every session submits a different image at the same time
+through get_warmup().pipeline, the process-wide pipeline that User_App's
+browser sessions and the HTTP service share, and the run fails if any
+session receives another session's result. The model-free modes below race
+matching against enrolments on one FaceRecognizer, or enrolments against
+each other.
+
+Usage (from the project root):
+    # Real models: one sub-folder per enrolled person, named like the user
+    python -m benchmarks.load_test_sessions --images path/to/labelled --sessions 8 --rounds 5
+
+    # No models: synthetic embeddings, with enrolments/deletions racing the matchers
+    python -m benchmarks.load_test_sessions --synthetic --sessions 16 --rounds 200
+
+    # No models: concurrent enrolments, each session with its own gallery instance
+    # (like separate FaceRecognizers) plus worker processes; fails if anyone is lost
+    python -m benchmarks.load_test_sessions --enrolments --sessions 16 --rounds 5 --processes 2
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import config
+from benchmarks.common import labelled_images, print_table, run_sessions, summarize, synthetic_database, synthetic_queries
+
+
+def run_real(folder: str, sessions: int, rounds: int):
+    from utils.warmup import get_warmup
+    samples = labelled_images(folder)
+    if not samples:
+        sys.exit(f"No labelled images found in {folder}")
+    warmup = get_warmup().start(background=False)
+    pipeline = warmup.pipeline
+
+    def work(session_id: int, round_id: int):
+        expected, data = samples[(session_id + round_id * sessions) % len(samples)]
+        result = pipeline.run(data)
+        if result['person_name'] != expected:
+            return f"expected {expected}, got {result['person_name']}"
+        return None
+
+    return run_sessions(sessions, rounds, work)
+
+
+def run_synthetic(sessions: int, rounds: int, people: int):
+    from utils.face_recognition import FaceRecognizer
+    workdir = tempfile.mkdtemp(prefix="load_test_")
+    config.EMBEDDINGS_PATH = os.path.join(workdir, "embeddings.gallery")
+    config.EMBEDDING_CACHE_PATH = os.path.join(workdir, "embedding_cache.db")
+
+    database = synthetic_database(people, spread=0.2)
+    queries, expected = synthetic_queries(database, sessions * rounds, spread=0.2)
+    recognizer = FaceRecognizer()
+    recognizer.gallery.save_database(database)
+    churn = synthetic_database(50, seed=99)
+    stop = threading.Event()
+
+    def enrolment_churn():
+        # Other sessions enrol and delete people while matching runs
+        while not stop.is_set():
+            for name, embeddings in churn.items():
+                recognizer.gallery.add_person(f"churn_{name}", embeddings)
+                recognizer.gallery.remove_person(f"churn_{name}")
+
+    def work(session_id: int, round_id: int):
+        i = session_id * rounds + round_id
+        person_name, _, _ = recognizer.match_embedding(queries[i])
+        if person_name != expected[i]:
+            return f"expected {expected[i]}, got {person_name}"
+        return None
+
+    churner = threading.Thread(target=enrolment_churn, daemon=True)
+    churner.start()
+    try:
+        return run_sessions(sessions, rounds, work)
+    finally:
+        stop.set()
+        churner.join()
+
+
+def _enrol_people(path: str, names, seed: int):
+    """Enrol and then update each name through a fresh gallery instance, as DatabaseManager calls do"""
+    from utils.gallery import EmbeddingGallery
+    database = synthetic_database(len(names), seed=seed)
+    for name, embeddings in zip(names, database.values()):
+        EmbeddingGallery(path).add_person(name, embeddings[:2])
+        EmbeddingGallery(path).add_person(name, embeddings[2:])
+        EmbeddingGallery(path).remove_person(f"{name}_temp")
+
+
+def run_enrolments(sessions: int, rounds: int, processes: int):
+    from utils.gallery import EmbeddingGallery
+    workdir = tempfile.mkdtemp(prefix="load_test_")
+    path = os.path.join(workdir, "embeddings.gallery")
+    EmbeddingGallery(path).save_database(synthetic_database(1, seed=7))
+    expected = {"person_000000": 4}
+
+    context = multiprocessing.get_context("spawn")
+    workers = []
+    for p in range(processes):
+        names = [f"process{p}_person{i}" for i in range(rounds)]
+        expected.update({name: 4 for name in names})
+        workers.append(context.Process(target=_enrol_people, args=(path, names, 1000 + p)))
+    for worker in workers:
+        worker.start()
+
+    def work(session_id: int, round_id: int):
+        try:
+            _enrol_people(path, [f"session{session_id}_person{round_id}"], session_id * rounds + round_id)
+        except Exception as e:
+            return f"{type(e).__name__}: {e}"
+        return None
+
+    expected.update({f"session{s}_person{r}": 4 for s in range(sessions) for r in range(rounds)})
+    latencies, failures, wall_seconds = run_sessions(sessions, rounds, work)
+    for worker in workers:
+        worker.join()
+        if worker.exitcode != 0:
+            failures.append(f"enrolment process exited with {worker.exitcode}")
+
+    stored = EmbeddingGallery(path)
+    stored.ensure_loaded()
+    counts = dict(zip(stored.names, stored.counts.tolist()))
+    for name, count in expected.items():
+        if counts.get(name) != count:
+            failures.append(f"{name}: expected {count} embeddings, found {counts.get(name, 0)}")
+    leftovers = [f for f in os.listdir(workdir) if f.endswith(".tmp")]
+    if leftovers:
+        failures.append(f"temp files left behind: {leftovers}")
+    print(f"{len(counts)} of {len(expected)} people in the gallery")
+    return latencies, failures, wall_seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", help="Folder with one sub-folder of photos per enrolled user")
+    parser.add_argument("--synthetic", action="store_true", help="Use synthetic embeddings, no models needed")
+    parser.add_argument("--enrolments", action="store_true", help="Race enrolments instead of matches")
+    parser.add_argument("--processes", type=int, default=0, help="Extra enrolment processes with --enrolments")
+    parser.add_argument("--sessions", type=int, default=8)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--people", type=int, default=500, help="Synthetic gallery size")
+    args = parser.parse_args()
+
+    if args.enrolments:
+        latencies, failures, wall_seconds = run_enrolments(args.sessions, args.rounds, args.processes)
+    elif args.synthetic:
+        latencies, failures, wall_seconds = run_synthetic(args.sessions, args.rounds, args.people)
+    elif args.images:
+        latencies, failures, wall_seconds = run_real(args.images, args.sessions, args.rounds)
+    else:
+        parser.error("pass --images FOLDER or --synthetic")
+
+    print_table([dict(sessions=args.sessions, requests=len(latencies), failures=len(failures),
+                      **summarize(latencies, wall_seconds))],
+                ["sessions", "requests", "failures", "p50_ms", "p95_ms", "p99_ms", "throughput_per_s"])
+    for failure in failures[:20]:
+        print(f"  ✗ {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
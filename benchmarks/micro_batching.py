@@ -0,0 +1,102 @@
+"""Latency and throughput of micro-batched embedding under concurrent load.
+
+Compares one forward pass per request ("direct") with the MicroBatcher in
+front of the model, for several batching windows.
+
+Usage (from the project root):
+    # No models: a simulated forward pass costing --overhead-ms + --per-item-ms per crop
+    python -m benchmarks.micro_batching --clients 16 --rounds 20 --wait-ms 0 2 5 10
+
+    # Real models: extract_embedding on a folder of face photos
+    python -m benchmarks.micro_batching --images path/to/photos --clients 8 --rounds 5
+"""
+import argparse
+import sys
+import threading
+import time
+import config
+from benchmarks.common import load_images, print_table, run_sessions, summarize
+from utils.batching import MicroBatcher
+
+
+def _simulated_model(overhead_ms: float, per_item_ms: float):
+    """Stand-in for one CPU-bound model: calls run one at a time and cost more per extra item"""
+    lock = threading.Lock()
+
+    def forward(items):
+        with lock:
+            time.sleep((overhead_ms + per_item_ms * len(items)) / 1000)
+        return list(items)
+
+    return forward
+
+
+
+def _row(mode: str, clients: int, batcher, latencies, wall_seconds: float):
+    stats = batcher.get_stats() if batcher else {'mean_batch_size': 1.0}
+    return dict(mode=mode, clients=clients, requests=len(latencies),
+                mean_batch=stats['mean_batch_size'], **summarize(latencies, wall_seconds))
+
+
+def run_simulated(args):
+    forward = _simulated_model(args.overhead_ms, args.per_item_ms)
+    batcher = None
+
+    def work(session_id: int, round_id: int):
+        result = batcher(session_id) if batcher else forward([session_id])[0]
+        return None if result == session_id else f"got the result for {result}"
+
+    latencies, failures, wall = run_sessions(args.clients, args.rounds, work)
+    rows = [_row("direct", args.clients, None, latencies, wall)]
+    for wait_ms in args.wait_ms:
+        batcher = MicroBatcher(forward, args.max_batch, wait_ms)
+        latencies, batch_failures, wall = run_sessions(args.clients, args.rounds, work)
+        failures += batch_failures
+        rows.append(_row(f"batched wait={wait_ms:g}ms", args.clients, batcher, latencies, wall))
+    return rows, failures
+
+
+def run_real(args):
+    from utils.face_recognition import FaceRecognizer
+    images = load_images(args.images)
+    if not images:
+        sys.exit(f"No images found in {args.images}")
+    recognizer = FaceRecognizer()
+    recognizer.extract_embedding(images[0], use_cache=False)  # Load the models outside the timings
+
+    def work(session_id: int, round_id: int):
+        image = images[(session_id + round_id * args.clients) % len(images)]
+        return None if recognizer.extract_embedding(image, use_cache=False) is not None else "no embedding"
+
+    recognizer.face_batcher = None
+    latencies, failures, wall = run_sessions(args.clients, args.rounds, work)
+    rows = [_row("direct", args.clients, None, latencies, wall)]
+    for wait_ms in args.wait_ms:
+        recognizer.face_batcher = MicroBatcher(recognizer.embed_faces, args.max_batch, wait_ms)
+        latencies, batch_failures, wall = run_sessions(args.clients, args.rounds, work)
+        failures += batch_failures
+        rows.append(_row(f"batched wait={wait_ms:g}ms", args.clients, recognizer.face_batcher, latencies, wall))
+    return rows, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", help="Folder with face photos; omit to simulate the model")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--max-batch", type=int, default=config.MICRO_BATCH_MAX_SIZE)
+    parser.add_argument("--wait-ms", type=float, nargs="+", default=[0, config.MICRO_BATCH_WAIT_MS])
+    parser.add_argument("--overhead-ms", type=float, default=20.0, help="Simulated cost of a forward pass")
+    parser.add_argument("--per-item-ms", type=float, default=2.0, help="Simulated cost per crop in a batch")
+    args = parser.parse_args()
+
+    rows, failures = run_real(args) if args.images else run_simulated(args)
+    print_table(rows, ["mode", "clients", "requests", "mean_batch", "p50_ms", "p95_ms", "p99_ms",
+                       "throughput_per_s"])
+    for failure in failures[:20]:
+        print(f"  ✗ {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
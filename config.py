@@ -3,22 +3,62 @@ import os
 # Paths
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATABASE_DIR = os.path.join(BASE_DIR, "database", "friends")
-EMBEDDINGS_PATH = os.path.join(BASE_DIR, "database", "embeddings.pkl")
-USER_INFO_PATH = os.path.join(BASE_DIR, "database", "user_info.json")
-ACCESS_LOGS_PATH = os.path.join(BASE_DIR, "database", "access_logs.json")
+EMBEDDINGS_PATH = os.path.join(BASE_DIR, "database", "embeddings.gallery")  # embeddings.pkl is migrated on first load
+EMBEDDING_CACHE_PATH = os.path.join(BASE_DIR, "database", "embedding_cache.db")  # SQLite; an old embedding_cache.npz can be deleted
+USER_INFO_PATH = os.path.join(BASE_DIR, "database", "user_info.json")  # Legacy, imported into DB_PATH
+ACCESS_LOGS_PATH = os.path.join(BASE_DIR, "database", "access_logs.json")  # Legacy, imported into DB_PATH
+DB_PATH = os.path.join(BASE_DIR, "database", "access_control.db")
 TEMP_DIR = os.path.join(BASE_DIR, "temp")
+AUDIT_CAPTURE_DIR = os.path.join(BASE_DIR, "database", "audit")
 ASSETS_DIR = os.path.join(BASE_DIR, "assets")
 
 # Model Configuration
-FACE_DETECTION_BACKEND = "opencv"
+FACE_DETECTION_BACKEND = "opencv"  # Used by every stage not set in DETECTOR_BACKENDS
+# Per-stage detectors; compare backends with `python -m benchmarks.detector_benchmark`
+DETECTOR_BACKENDS = {
+    "recognition": "opencv",  # Kiosk frames and verification probes
+    "enrolment": "opencv",  # Stored photos: favour accuracy, e.g. "retinaface" (rebuild after changing)
+    "emotion": "opencv",  # Standalone emotion analysis; the kiosk pipeline reuses recognition crops
+}
 FACE_RECOGNITION_MODEL = "Facenet512"
 EMOTION_MODEL = "deepface"
 DISTANCE_METRIC = "cosine"
 
 # Thresholds
 RECOGNITION_THRESHOLD = 0.50
-VERIFICATION_THRESHOLD = 0.50
+VERIFICATION_THRESHOLD = 0.30  # DeepFace.verify's own threshold for Facenet512 + cosine; update with the model/metric
 CONFIDENCE_THRESHOLD = 0.70
+MATCH_TOP_K = 5  # Closest people reported in all_matches; GalleryMatcher.match(..., all_people=True) returns everyone
+
+# Gallery
+GALLERY_CHECK_INTERVAL_SECONDS = 1.0  # How often the resident gallery re-stats EMBEDDINGS_PATH
+EMBEDDINGS_DTYPE = "float32"  # "float16" halves the file size; rows are converted back to float32 on load
+EMBEDDINGS_MMAP = os.name != "nt"  # Windows cannot replace a file while it is memory-mapped
+
+# Approximate Nearest-Neighbour Search
+ANN_INDEX = "brute"  # "brute" (exact), "ivf" or "ivfpq" (IVF + product quantization)
+ANN_MIN_GALLERY_SIZE = 20000  # Smaller galleries always use the exact scan
+ANN_CANDIDATES = 200  # Rows shortlisted by the index before exact per-person re-ranking
+ANN_TRAIN_SAMPLE = 20000
+ANN_TRAIN_ITERATIONS = 10
+IVF_NLIST = 0  # 0 = 4 * sqrt(gallery size)
+IVF_NPROBE = 16
+PQ_SUBVECTORS = 64  # Must divide the embedding size (512 for Facenet512)
+
+# Warm-up
+WARMUP_ON_START = True  # Build all models and load the gallery when the app starts, not on the first request
+
+# Batch Inference
+EMBEDDING_BATCH_SIZE = 16  # Face crops per stacked forward pass
+MICRO_BATCH_MAX_SIZE = 16  # Crops from concurrent requests embedded in one forward pass; 1 disables
+MICRO_BATCH_WAIT_MS = 5.0  # How long the first crop waits for others to join its batch
+EMBEDDING_PROCESSES = 2  # Worker processes for bulk import and full rebuilds; each loads its own model
+EMBEDDING_PROCESS_CHUNK_SIZE = 64  # Photos per worker task (and per bulk import checkpoint write)
+
+# Embedding Cache
+EMBEDDING_CACHE_MAX_ENTRIES = 50000  # Least recently used entries are evicted beyond this
+EMBEDDING_CACHE_FLUSH_EVERY = 32  # New entries buffered before they are written in one transaction
+VERIFICATION_PROBE_CACHE_SIZE = 256  # Recent verification probes kept in memory only, never in the SQLite cache
 
 # Emotion-based Suspicion
 SUSPICION_EMOTIONS = {
@@ -29,6 +69,31 @@ SUSPICION_EMOTIONS = {
 }
 SUSPICION_THRESHOLD = 0.5
 
+# Authentication Pipeline
+EMOTION_POLICY = "always"  # "always": emotion runs alongside identity; "granted_only": skipped for denied faces
+IDENTITY_TIMEOUT_SECONDS = 10.0
+EMOTION_TIMEOUT_SECONDS = 5.0
+PIPELINE_WORKERS = 4  # Threads shared by all sessions for the identity and emotion stages
+
+# HTTP Service (python -m utils.http_service)
+SERVICE_HOST = "127.0.0.1"
+SERVICE_PORT = 8080
+SERVICE_WORKERS = 4  # Requests processed at once
+SERVICE_QUEUE_SIZE = 32  # Requests waiting beyond this are rejected with 503
+SERVICE_MAX_BODY_BYTES = 10 * 1024 * 1024
+SERVICE_ENROLL_TOKEN = None  # Set to require an X-Enroll-Token header on /enroll
+
+# Multi-Face Recognition
+MULTI_FACE_MODE = False  # Authenticate every face in the frame instead of only the largest
+MAX_FACES_PER_FRAME = 5  # Largest faces first; caps per-frame latency
+
+# Storage
+DB_SYNCHRONOUS = "NORMAL"  # SQLite WAL: "NORMAL" batches fsyncs to checkpoints, "FULL" syncs every event
+ACCESS_LOG_RETENTION = None  # Keep every access log entry; set a number to keep only the newest N
+
+# Audit Capture
+AUDIT_CAPTURE_ENABLED = False  # Keep a copy of every authentication frame in AUDIT_CAPTURE_DIR
+
 # Registration Settings
 MIN_PHOTOS_PER_PERSON = 3
 MAX_PHOTOS_PER_PERSON = 7
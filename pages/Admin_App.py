@@ -1,9 +1,9 @@
 import streamlit as st
-from PIL import Image
 import os
 import config
 from utils.authentication import AdminAuthenticator
 from utils.database_manager import DatabaseManager
+from utils.detectors import DETECTION_STAGES, detector_backend
 import pandas as pd
 
 st.set_page_config(page_title="Admin Panel", page_icon="👨‍💼", layout="wide")
@@ -69,6 +69,31 @@ if "Dashboard" in mode:
     col2.metric("✅ Successful Access", stats['total_accesses'])
     col3.metric("❌ Denied Access", stats['total_denials'])
     col4.metric("⚠️ Suspicious", stats['suspicious_count'])
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("🖼️ Photos", stats['total_photos'])
+    col2.metric("📈 Total Attempts", stats['total_logs'])
+    col3.metric("🚫 Denial Rate", f"{stats['denial_rate']:.1%}")
+    st.markdown("---")
+    trends = db_manager.get_access_trends()
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown("### 🕐 Accesses per Hour")
+        if trends['hourly']:
+            hourly = pd.DataFrame(trends['hourly'][::-1]).set_index('bucket')
+            st.bar_chart(hourly[['granted', 'denied']])
+        else:
+            st.info("No activity yet")
+    with col2:
+        st.markdown("### 📅 Accesses per Day")
+        if trends['daily']:
+            daily = pd.DataFrame(trends['daily'][::-1]).set_index('bucket')
+            st.bar_chart(daily[['granted', 'denied']])
+        else:
+            st.info("No activity yet")
+    if trends['by_user']:
+        st.markdown("### 👤 Most Active Users")
+        by_user = pd.DataFrame(trends['by_user']).rename(columns={'bucket': 'user_name'})
+        st.dataframe(by_user, use_container_width=True, hide_index=True)
     st.markdown("---")
     st.markdown("### 📜 Recent Activity (Last 20)")
     logs = db_manager.get_access_logs(limit=20)
@@ -157,18 +182,12 @@ elif "Register User" in mode:
             uploaded_images = st.session_state.captured_photos
         if st.button("✅ Register User", type="primary", disabled=not can_register, use_container_width=True):
             with st.spinner(f"🔄 Registering {full_name}..."):
-                temp_paths = []
-                for i, img in enumerate(uploaded_images):
-                    temp_path = os.path.join(config.TEMP_DIR, f"reg_{full_name}_{i}.jpg")
-                    Image.open(img).save(temp_path)
-                    temp_paths.append(temp_path)
-                success = db_manager.register_new_user(full_name, temp_paths, employee_id, department, notes)
+                success = db_manager.register_new_user(full_name, uploaded_images, employee_id, department, notes)
                 if success:
                     st.success(f"🎉 {full_name} registered successfully!")
                     st.balloons()
                     st.session_state.photo_step = 0
                     st.session_state.captured_photos = []
-                    st.cache_resource.clear()
                 else:
                     st.error("❌ Registration failed. Please try again.")
 
@@ -182,9 +201,10 @@ elif "Manage Users" in mode:
         if search:
             users = [u for u in users if search.lower() in u.lower()]
         st.markdown(f"### {len(users)} User(s)")
+        all_info = db_manager.get_all_user_info()
         for user in users:
             with st.expander(f"👤 {user}"):
-                info = db_manager.get_user_info(user)
+                info = all_info.get(user)
                 img_count = db_manager.get_user_image_count(user)
                 col1, col2 = st.columns([2, 1])
                 with col1:
@@ -207,16 +227,48 @@ elif "Manage Users" in mode:
                     if st.checkbox(f"⚠️ Confirm delete {user}", key=f"conf_{user}"):
                         if db_manager.delete_user(user):
                             st.success("Deleted!")
-                            st.cache_resource.clear()
                             st.rerun()
 
 elif "Access Logs" in mode:
     st.header("📜 Access Logs")
-    limit = st.slider("Logs to show", 10, 200, 50)
-    logs = db_manager.get_access_logs(limit=limit)
+    col1, col2, col3, col4 = st.columns([2, 2, 1, 1])
+    user_filter = col1.selectbox("User", ["All"] + db_manager.get_logged_user_names())
+    date_range = col2.date_input("Date range", value=())
+    status_filter = col3.selectbox("Status", ["All", "granted", "denied"])
+    suspicious_only = col4.checkbox("Suspicious only")
+    limit = st.slider("Logs per page", 10, 200, 50)
+
+    start = end = None
+    if len(date_range) >= 1:
+        start = f"{date_range[0]:%Y-%m-%d} 00:00:00"
+        end = f"{date_range[-1]:%Y-%m-%d} 23:59:59"
+    filters = dict(
+        user_name=None if user_filter == "All" else user_filter,
+        start=start,
+        end=end,
+        status=None if status_filter == "All" else status_filter,
+        suspicious=True if suspicious_only else None,
+    )
+
+    # Cursors of the pages visited so far; reset whenever the filters change
+    filter_key = (tuple(sorted(filters.items())), limit)
+    if st.session_state.get('log_filter_key') != filter_key:
+        st.session_state.log_filter_key = filter_key
+        st.session_state.log_cursors = [None]
+    cursors = st.session_state.log_cursors
+    logs, next_cursor = db_manager.query_access_logs(cursor=cursors[-1], limit=limit, **filters)
+
     if logs:
         df = pd.DataFrame(logs)
         st.dataframe(df, use_container_width=True, hide_index=True)
+        col_prev, col_page, col_next = st.columns([1, 2, 1])
+        if col_prev.button("⬅️ Newer", disabled=len(cursors) == 1, use_container_width=True):
+            cursors.pop()
+            st.rerun()
+        col_page.markdown(f"<p style='text-align: center;'>Page {len(cursors)}</p>", unsafe_allow_html=True)
+        if col_next.button("Older ➡️", disabled=next_cursor is None, use_container_width=True):
+            cursors.append(next_cursor)
+            st.rerun()
         csv = df.to_csv(index=False)
         st.download_button("📥 Download CSV", csv, "access_logs.csv", "text/csv", use_container_width=True)
     else:
@@ -245,13 +297,40 @@ elif "Settings" in mode:
         st.info("Current config from config.py")
         col1, col2 = st.columns(2)
         col1.write(f"**Model:** {config.FACE_RECOGNITION_MODEL}")
-        col1.write(f"**Backend:** {config.FACE_DETECTION_BACKEND}")
+        col1.write("**Detectors:** " + ", ".join(f"{stage} {detector_backend(stage)}" for stage in DETECTION_STAGES))
         col2.write(f"**Threshold:** {config.RECOGNITION_THRESHOLD}")
         col2.write(f"**Min Photos:** {config.MIN_PHOTOS_PER_PERSON}")
     with tab3:
         st.markdown("### System Info")
         stats = db_manager.get_statistics()
         st.json(stats)
+        st.markdown("### Embedding Cache")
+        cache_stats = db_manager.get_embedding_cache_stats()
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("🎯 Hit Rate", f"{cache_stats['hit_rate']*100:.1f}%")
+        col2.metric("✅ Hits", cache_stats['hits'])
+        col3.metric("❌ Misses", cache_stats['misses'])
+        col4.metric("🗂️ Entries", f"{cache_stats['entries']}/{cache_stats['max_entries']}")
+        st.markdown("### Face Database")
+        st.caption("Registration and deletion update the face database incrementally. A full rebuild re-embeds every photo and is only needed after a model or detector change.")
+        if st.button("🔄 Rebuild Face Database", use_container_width=True):
+            progress_bar = st.progress(0.0, text="🔄 Starting embedding workers...")
+
+            def show_progress(status):
+                eta = status['eta_s']
+                progress_bar.progress(
+                    status['photos_done'] / max(status['photos_total'], 1),
+                    text=(f"🔄 {status['photos_done']}/{status['photos_total']} photos · "
+                          f"{status['people_done']}/{status['people_total']} people · "
+                          f"{status['photos_per_second']:.1f} photos/s · ETA {int(eta // 60)}m {int(eta % 60):02d}s")
+                )
+
+            try:
+                people = db_manager.rebuild_face_database(progress=show_progress)
+                progress_bar.progress(1.0, text="✅ Done")
+                st.success(f"✅ Face database rebuilt with {people} people")
+            except Exception as e:
+                st.error(f"❌ {e}")
 
 st.markdown("---")
 st.markdown("<p style='text-align: center; color: white;'>👨‍💼 Admin Panel v2.0 | Powered by DeepFace</p>", unsafe_allow_html=True)
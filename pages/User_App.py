@@ -1,10 +1,7 @@
 import streamlit as st
-from PIL import Image
-import os
 import config
-from utils.face_recognition import FaceRecognizer
-from utils.emotion_detector import EmotionDetector
 from utils.database_manager import DatabaseManager
+from utils.warmup import get_warmup
 
 st.set_page_config(page_title="User Access", page_icon="👤", layout="wide")
 
@@ -22,16 +19,13 @@ st.markdown("""
         font-family: 'Inter', sans-serif !important;
     } </style>
 """, unsafe_allow_html=True)
-@st.cache_resource
-def get_recognizer():
-    return FaceRecognizer()
-
-@st.cache_resource
-def get_emotion_detector():
-    return EmotionDetector()
-
-recognizer = get_recognizer()
-emotion_detector = get_emotion_detector()
+# The warm-up owns the pipeline so every session reuses the models it preloaded
+warmup = get_warmup()
+if config.WARMUP_ON_START:
+    warmup.start()
+pipeline = warmup.pipeline
+recognizer = pipeline.recognizer
+emotion_detector = pipeline.emotion_detector
 db_manager = DatabaseManager()
 
 # Header
@@ -56,18 +50,50 @@ with col2:
         st.image(camera_photo, caption="Captured", use_column_width=True)
         st.markdown("<br>", unsafe_allow_html=True)
         
-        if st.button("🔍 AUTHENTICATE", type="primary", use_container_width=True):
-            with st.spinner("🔄 Analyzing..."):
-                temp_path = os.path.join(config.TEMP_DIR, "user_access.jpg")
-                Image.open(camera_photo).save(temp_path)
+        if warmup.state == warmup.WARMING:
+            with st.spinner("⏳ Loading models..."):
+                warmup.wait()
+        
+        if config.MULTI_FACE_MODE and st.button("🔍 AUTHENTICATE GROUP", type="primary", use_container_width=True):
+            with st.spinner("🔄 Analyzing all faces..."):
+                group = pipeline.run_multi(camera_photo)
                 
-                has_face = recognizer.quick_face_check(temp_path)
+                if not group['faces']:
+                    st.error("❌ No face detected")
+                elif 'identity' in group['timed_out']:
+                    st.warning("⏱️ Recognition timed out. Please try again.")
+                else:
+                    if group['face_count'] > len(group['faces']):
+                        st.warning(f"⚠️ {group['face_count']} faces detected, only the {len(group['faces'])} closest were checked")
+                    for face in group['faces']:
+                        dominant = face['emotion']['dominant_emotion']
+                        emoji = emotion_detector.get_emotion_emoji(dominant)
+                        if face['person_name']:
+                            st.success(f"✅ {face['person_name']} — {face['confidence']*100:.1f}% — {emoji} {dominant.title()}")
+                            db_manager.log_access(face['person_name'], face['confidence'], dominant, face['is_suspicious'])
+                            if face['is_suspicious']:
+                                st.warning(f"⚠️ Unusual behavior from {face['person_name']} ({face['suspicion_score']*100:.1f}%)")
+                        else:
+                            st.error(f"❌ Unknown person at {face['facial_area']}")
+                            db_manager.log_access_denied(0.0)
+        
+        elif not config.MULTI_FACE_MODE and st.button("🔍 AUTHENTICATE", type="primary", use_container_width=True):
+            with st.spinner("🔄 Analyzing..."):
+                # Decodes the camera buffer in memory, detects the face once and
+                # checks identity and emotion on the crop concurrently
+                result = pipeline.run(camera_photo)
                 
-                if not has_face:
+                if not result['face_detected']:
                     st.error("❌ No face detected")
+                elif 'identity' in result['timed_out']:
+                    st.warning("⏱️ Recognition timed out. Please try again.")
                 else:
-                    person_name, confidence, all_matches = recognizer.recognize_face(temp_path)
-                    emotion_result, suspicion_score, is_suspicious = emotion_detector.analyze_emotion(temp_path)
+                    person_name = result['person_name']
+                    confidence = result['confidence']
+                    all_matches = result['all_matches']
+                    emotion_result = result['emotion']
+                    suspicion_score = result['suspicion_score']
+                    is_suspicious = result['is_suspicious']
                     
                     st.markdown("<br>", unsafe_allow_html=True)
                     
@@ -115,6 +141,10 @@ with col2:
                         with st.expander("🔍 Debug: Matches"):
                             for name, distance in sorted(all_matches.items(), key=lambda x: x[1])[:3]:
                                 st.write(f"{name}: {(1-distance)*100:.1f}%")
+                    
+                    with st.expander("⏱️ Timings"):
+                        for stage, ms in result['timings'].items():
+                            st.write(f"{stage.replace('_ms', '').title()}: {ms:.0f} ms")
 
 # Sidebar
 with st.sidebar:
@@ -128,7 +158,19 @@ with st.sidebar:
     st.markdown("---")
     st.metric("👥 Registered", len(users))
     st.markdown("---")
-    st.success("🟢 System Online")
+    status = warmup.status()
+    if status['ready'] or status['state'] == warmup.PENDING:
+        st.success("🟢 System Online")
+    elif status['state'] == warmup.WARMING:
+        st.warning("🟡 Loading models...")
+    else:
+        st.error("🔴 Some models failed to load")
+    if status['timings_ms']:
+        with st.expander("🔥 Model Load Times"):
+            for stage, ms in status['timings_ms'].items():
+                st.write(f"{stage.replace('_', ' ').title()}: {ms:.0f} ms")
+            for stage, error in status['errors'].items():
+                st.error(f"{stage.replace('_', ' ').title()}: {error}")
 
 st.markdown("---")
 st.markdown("<p style='text-align: center; color: white;'>👤 User Access v2.0</p>", unsafe_allow_html=True)
@@ -0,0 +1,14 @@
+import config
+from utils.database_manager import DatabaseManager
+
+
+def test_access_trends_rank_users_without_denied_attempts(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "DB_PATH", str(tmp_path / "access_control.db"))
+    monkeypatch.setattr(config, "ACCESS_LOGS_PATH", str(tmp_path / "missing.json"))
+    monkeypatch.setattr(config, "USER_INFO_PATH", str(tmp_path / "missing.json"))
+    for _ in range(3):
+        DatabaseManager.log_access_denied()
+    DatabaseManager.log_access('alice', 0.9)
+
+    by_user = DatabaseManager.get_access_trends()['by_user']
+    assert [row['bucket'] for row in by_user] == ['alice']
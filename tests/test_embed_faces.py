@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+from utils.face_recognition import FaceRecognizer
+
+
+@pytest.fixture
+def recognizer(monkeypatch):
+    recognizer = FaceRecognizer()
+    monkeypatch.setattr(recognizer, "_represent_face", lambda face: pytest.fail("DeepFace.represent was used"))
+    return recognizer
+
+
+def faces(count):
+    return [np.full((4, 4, 3), i, dtype=np.uint8) for i in range(count)]
+
+
+def test_a_failed_batch_is_retried_face_by_face_and_batching_stays_on(recognizer, monkeypatch):
+    def forward(chunk):
+        if len(chunk) > 1:
+            raise MemoryError("OOM on the stacked batch")
+        return [np.full(3, float(chunk[0][0, 0, 0]))]
+    monkeypatch.setattr(recognizer, "_forward", forward)
+
+    embeddings = recognizer.embed_faces(faces(3), batch_size=3)
+
+    assert [e[0] for e in embeddings] == [0.0, 1.0, 2.0]
+    assert recognizer._batching_supported
+
+
+def test_a_bad_crop_only_loses_its_own_embedding(recognizer, monkeypatch):
+    def forward(chunk):
+        if any(face[0, 0, 0] == 1 for face in chunk):
+            raise ValueError("bad crop")
+        return [np.full(3, float(face[0, 0, 0])) for face in chunk]
+    monkeypatch.setattr(recognizer, "_forward", forward)
+
+    embeddings = recognizer.embed_faces(faces(3), batch_size=3)
+
+    assert embeddings[1] is None
+    assert embeddings[0][0] == 0.0 and embeddings[2][0] == 2.0
+
+
+def test_batching_is_disabled_only_when_the_deepface_api_is_missing(recognizer, monkeypatch):
+    def forward(chunk):
+        raise ImportError("No module named 'deepface.modules'")
+    monkeypatch.setattr(recognizer, "_forward", forward)
+    monkeypatch.setattr(recognizer, "_represent_face", lambda face: np.zeros(3))
+
+    assert len(recognizer.embed_faces(faces(2))) == 2
+    assert not recognizer._batching_supported
@@ -0,0 +1,47 @@
+import numpy as np
+from utils.face_verification import FaceVerifier
+
+
+class CountingRecognizer:
+    """Stands in for FaceRecognizer: one embedding per distinct image, calls recorded"""
+    detector_backend = "opencv"
+    enrolment_detector = "retinaface"
+
+    def __init__(self):
+        self.calls = []
+
+    def extract_embedding(self, image, use_cache=True, detector_backend=None):
+        self.calls.append((image, use_cache, detector_backend))
+        seed = sum(image.encode() if isinstance(image, str) else bytes(image))
+        return np.random.default_rng(seed).normal(size=8)
+
+
+def test_repeated_probes_are_embedded_once_and_kept_out_of_the_persistent_cache():
+    recognizer = CountingRecognizer()
+    verifier = FaceVerifier(recognizer)
+    first = verifier.probe_embedding(b"probe-a")
+    again = verifier.probe_embedding(b"probe-a")
+
+    assert np.array_equal(first, again)
+    assert recognizer.calls == [(b"probe-a", False, None)]
+
+
+def test_probe_lru_is_bounded():
+    recognizer = CountingRecognizer()
+    verifier = FaceVerifier(recognizer)
+    verifier.probe_cache_size = 2
+    for probe in (b"a", b"b", b"c"):
+        verifier.probe_embedding(probe)
+    verifier.probe_embedding(b"a")
+
+    assert len(verifier._probes) == 2
+    assert [call[0] for call in recognizer.calls] == [b"a", b"b", b"c", b"a"]
+
+
+def test_reference_photo_files_go_through_the_persistent_cache_with_the_enrolment_detector():
+    recognizer = CountingRecognizer()
+    verifier = FaceVerifier(recognizer)
+    verifier.verify_faces(b"probe", "database/friends/alice/photo_1.jpg")
+
+    assert ("database/friends/alice/photo_1.jpg", True, "retinaface") in recognizer.calls
+    assert (b"probe", False, None) in recognizer.calls
@@ -0,0 +1,36 @@
+import os
+import threading
+import numpy as np
+from utils.gallery import EmbeddingGallery
+
+
+def test_concurrent_enrolments_through_separate_instances_keep_everyone(tmp_path):
+    path = str(tmp_path / "embeddings.gallery")
+    rng = np.random.default_rng(0)
+    EmbeddingGallery(path).add_person("existing", list(rng.normal(size=(2, 8))))
+    names = [f"person_{i}" for i in range(16)]
+    embeddings = {name: list(rng.normal(size=(3, 8))) for name in names}
+    barrier = threading.Barrier(len(names))
+    errors = []
+
+    def enrol(name):
+        try:
+            barrier.wait()
+            # A fresh instance per call, like a FaceRecognizer per DatabaseManager call
+            EmbeddingGallery(path).add_person(name, embeddings[name][:2])
+            EmbeddingGallery(path).add_person(name, embeddings[name][2:])
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=enrol, args=(name,)) for name in names]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    stored = EmbeddingGallery(path)
+    assert stored.ensure_loaded()
+    counts = dict(zip(stored.names, stored.counts.tolist()))
+    assert counts == {"existing": 2, **{name: 3 for name in names}}
+    assert not [f for f in os.listdir(tmp_path) if f.endswith(".tmp")]
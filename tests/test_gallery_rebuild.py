@@ -0,0 +1,96 @@
+import os
+import threading
+import numpy as np
+import pytest
+import config
+from utils.gallery import EmbeddingGallery
+from utils.gallery_file import GalleryFileWriter, read_gallery_file, rebuild_lock
+from utils.gallery_rebuild import rebuild_gallery
+
+
+def test_writers_for_the_same_path_do_not_share_spools(tmp_path):
+    path = str(tmp_path / "embeddings.gallery")
+    rng = np.random.default_rng(0)
+    first, second = GalleryFileWriter(path), GalleryFileWriter(path)
+    first.add_person("alice", list(rng.normal(size=(2, 8))))
+    second.add_person("bob", list(rng.normal(size=(3, 8))))
+    second.abort()
+    first.close()
+
+    stored = read_gallery_file(path, mmap=False)
+    assert stored.names == ["alice"]
+    assert stored.counts.tolist() == [2]
+    assert not [f for f in os.listdir(tmp_path) if f.endswith(".tmp")]
+
+
+def test_a_second_rebuild_is_refused_while_one_runs(tmp_path):
+    path = str(tmp_path / "embeddings.gallery")
+    with rebuild_lock(path):
+        with pytest.raises(RuntimeError):
+            with rebuild_lock(path):
+                pass
+    with rebuild_lock(path):
+        pass
+
+
+class StubRecognizer:
+    """Embeds a photo as a vector derived from its bytes; runs `during` on the first batch"""
+    enrolment_detector = "opencv"
+
+    def __init__(self, during=None):
+        self.during = during
+        self.cache = self
+
+    def extract_embeddings_batch(self, paths, detector_backend=None):
+        if self.during is not None:
+            self.during, during = None, self.during
+            during()
+        return [np.frombuffer(open(path, 'rb').read().ljust(8, b"\0")[:8], dtype=np.uint8).astype(np.float32) + 1
+                for path in paths]
+
+    def save(self):
+        pass
+
+
+@pytest.fixture
+def photo_database(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "DATABASE_DIR", str(tmp_path / "friends"))
+    monkeypatch.setattr(config, "EMBEDDINGS_PATH", str(tmp_path / "embeddings.gallery"))
+    for name in ("alice", "bob", "carol"):
+        os.makedirs(tmp_path / "friends" / name)
+        (tmp_path / "friends" / name / "photo_1.jpg").write_bytes(name.encode())
+    rng = np.random.default_rng(0)
+    EmbeddingGallery(config.EMBEDDINGS_PATH).save_database(
+        {name: list(rng.normal(size=(1, 8))) for name in ("alice", "bob", "carol")})
+    return tmp_path
+
+
+def test_changes_made_during_a_rebuild_survive_the_swap(photo_database):
+    dave = np.random.default_rng(1).normal(size=(2, 8))
+
+    def enrol_and_delete():
+        # Another thread, so a rebuild holding the gallery lock throughout would deadlock here
+        def change():
+            EmbeddingGallery(config.EMBEDDINGS_PATH).add_person("dave", list(dave))
+            EmbeddingGallery(config.EMBEDDINGS_PATH).remove_person("bob")
+        thread = threading.Thread(target=change)
+        thread.start()
+        thread.join(timeout=10)
+        assert not thread.is_alive()
+
+    assert rebuild_gallery(recognizer=StubRecognizer(during=enrol_and_delete)) == 3
+
+    stored = read_gallery_file(config.EMBEDDINGS_PATH, mmap=False)
+    counts = dict(zip(stored.names, stored.counts.tolist()))
+    assert counts == {"alice": 1, "carol": 1, "dave": 2}
+    rows = dict(zip(stored.names, np.split(stored.matrix * stored.norms[:, None], np.cumsum(stored.counts)[:-1])))
+    assert np.allclose(rows["dave"], dave, atol=1e-5)
+    assert np.allclose(rows["alice"][0], np.frombuffer(b"alice\0\0\0", dtype=np.uint8) + 1)
+
+
+def test_rebuild_without_changes_replaces_every_person(photo_database):
+    assert rebuild_gallery(recognizer=StubRecognizer()) == 3
+    stored = read_gallery_file(config.EMBEDDINGS_PATH, mmap=False)
+    assert sorted(stored.names) == ["alice", "bob", "carol"]
+    assert np.allclose(stored.norms, [np.linalg.norm(np.frombuffer(name.encode().ljust(8, b"\0"), dtype=np.uint8) + 1.0)
+                                      for name in stored.names])
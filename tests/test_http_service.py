@@ -0,0 +1,128 @@
+import asyncio
+import threading
+import pytest
+import utils.http_service as http_service
+from utils.http_service import RecognitionService
+
+
+class StubGallery:
+    name_index = {}
+
+    def get_stats(self):
+        return {'people': 0}
+
+
+class StubRecognizer:
+    detector_backend = "opencv"
+    enrolment_detector = "opencv"
+    gallery = StubGallery()
+
+    def ensure_gallery(self):
+        return self.gallery
+
+
+class StubPipeline:
+    recognizer = StubRecognizer()
+
+
+class StubWarmup:
+    pipeline = StubPipeline()
+    ready = True
+    state = "ready"
+
+    def start(self):
+        return self
+
+    def wait(self, timeout=None):
+        return True
+
+    def status(self):
+        return {'state': self.state}
+
+
+@pytest.fixture
+def make_service(monkeypatch):
+    monkeypatch.setattr(http_service, "get_warmup", lambda: StubWarmup())
+
+    def make(workers=2, queue_size=4):
+        return RecognitionService(workers, queue_size)
+    return make
+
+
+def serve(service, *steps):
+    """Start the service on a loopback port and run each step(port) in order"""
+    async def main():
+        server = await service.start("127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            return [await step(port) for step in steps]
+        finally:
+            server.close()
+    return asyncio.run(asyncio.wait_for(main(), timeout=10))
+
+
+def request(raw: bytes):
+    async def send(port):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(raw)
+        await writer.drain()
+        status_line = await reader.readline()
+        writer.close()
+        return int(status_line.split()[1])
+    return send
+
+
+def post(path: str, body: bytes = b"x", extra: bytes = b"") -> bytes:
+    return (f"POST {path} HTTP/1.1\r\nConnection: close\r\nContent-Length: {len(body)}\r\n".encode()
+            + extra + b"\r\n" + body)
+
+
+def test_routing_and_request_validation(make_service):
+    service = make_service()
+    service.max_body = 8
+    statuses = serve(
+        service,
+        request(b"GET /health HTTP/1.1\r\nConnection: close\r\n\r\n"),
+        request(post("/nowhere")),
+        request(b"GET /recognize HTTP/1.1\r\nConnection: close\r\n\r\n"),
+        request(b"POST /recognize HTTP/1.1\r\nContent-Length: abc\r\n\r\n"),
+        request(b"POST /recognize HTTP/1.1\r\nContent-Length: -5\r\n\r\n"),
+        request(post("/verify")),
+        request(post("/recognize", b"x" * 9)),
+    )
+    assert statuses == [200, 404, 405, 400, 400, 400, 413]
+
+
+def test_full_queue_answers_503(make_service):
+    service = make_service(workers=1, queue_size=1)
+    release, started = threading.Event(), threading.Event()
+
+    def recognize(query, body, headers):
+        started.set()
+        release.wait(5)
+        return 200, {}
+    service.recognize = recognize
+
+    async def busy(port):
+        running = asyncio.ensure_future(service._dispatch("POST", "/recognize", {}, b"x"))
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+        queued = asyncio.ensure_future(service._dispatch("POST", "/recognize", {}, b"x"))
+        await asyncio.sleep(0)
+        rejected = await service._dispatch("POST", "/recognize", {}, b"x")
+        release.set()
+        return rejected[0], (await running)[0], (await queued)[0]
+
+    assert serve(service, busy) == [(503, 200, 200)]
+    assert service.rejected == 1
+
+
+def test_request_fails_instead_of_hanging_when_the_executor_is_gone(make_service):
+    service = make_service()
+    service._executor.shutdown()
+
+    async def dispatch(port):
+        return await service._dispatch("POST", "/recognize", {}, b"x")
+
+    [(status, payload)] = serve(service, dispatch)
+    assert status == 500
+    assert payload['error']
@@ -0,0 +1,56 @@
+import json
+import pytest
+import config
+from utils.log_store import AccessLogStore
+from utils.user_store import UserStore
+
+
+@pytest.fixture
+def legacy_files(tmp_path, monkeypatch):
+    """user_info.json already counting the two granted entries of access_logs.json"""
+    user_info = {'alice': {'full_name': 'alice', 'photo_count': 4, 'registered_date': '2024-01-01 09:00:00',
+                           'last_seen': '2024-01-03 10:00:00', 'total_access_count': 3}}
+    logs = [
+        {'timestamp': '2024-01-02 09:00:00', 'user_name': 'alice', 'confidence': 91.0, 'status': 'granted'},
+        {'timestamp': '2024-01-02 09:05:00', 'user_name': 'Unknown', 'confidence': 0.0, 'status': 'denied'},
+        {'timestamp': '2024-01-03 10:00:00', 'user_name': 'alice', 'confidence': 88.5, 'status': 'granted'},
+    ]
+    (tmp_path / "user_info.json").write_text(json.dumps(user_info))
+    (tmp_path / "access_logs.json").write_text(json.dumps(logs))
+    monkeypatch.setattr(config, "USER_INFO_PATH", str(tmp_path / "user_info.json"))
+    monkeypatch.setattr(config, "ACCESS_LOGS_PATH", str(tmp_path / "access_logs.json"))
+    return str(tmp_path / "access_control.db")
+
+
+@pytest.mark.parametrize("user_store_first", [True, False])
+def test_legacy_logs_are_not_counted_twice(legacy_files, user_store_first):
+    if user_store_first:
+        users, logs = UserStore(legacy_files), AccessLogStore(legacy_files)
+    else:
+        logs, users = AccessLogStore(legacy_files), UserStore(legacy_files)
+
+    alice = users.get('alice')
+    assert alice['total_access_count'] == 3
+    assert alice['last_seen'] == '2024-01-03 10:00:00'
+    assert logs.counters()['granted'] == 2
+
+    # Live accesses still go through the trigger
+    logs.append({'timestamp': '2024-01-04 08:00:00', 'user_name': 'alice', 'status': 'granted'})
+    alice = users.get('alice')
+    assert alice['total_access_count'] == 4
+    assert alice['last_seen'] == '2024-01-04 08:00:00'
+
+
+def test_log_store_alone_keeps_user_counters_current(tmp_path):
+    path = str(tmp_path / "access_control.db")
+    users = UserStore(path)
+    users.upsert('alice', {'full_name': 'alice'})
+    # A database from before the trigger, opened by a process that only logs (e.g. the HTTP service)
+    with users.transaction() as conn:
+        conn.execute("DROP TRIGGER users_touch_on_access")
+
+    AccessLogStore(path).append({'timestamp': '2024-01-04 08:00:00', 'user_name': 'alice', 'status': 'granted'})
+
+    alice = users.get('alice')
+    assert alice['total_access_count'] == 1
+    assert alice['last_seen'] == '2024-01-04 08:00:00'
@@ -0,0 +1,164 @@
+import numpy as np
+from typing import Optional
+import config
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Positions of the k highest scores, best first"""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    part = np.argpartition(-scores, k - 1)[:k]
+    return part[np.argsort(-scores[part])]
+
+
+def _kmeans(data: np.ndarray, k: int, iterations: int, seed: int = 0) -> np.ndarray:
+    """Plain Lloyd's k-means with squared euclidean assignment"""
+    rng = np.random.default_rng(seed)
+    k = min(k, len(data))
+    centroids = data[rng.choice(len(data), k, replace=False)].copy()
+    for _ in range(iterations):
+        assign = _nearest_centroid(data, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, data)
+        counts = np.bincount(assign, minlength=k)
+        empty = counts == 0
+        centroids[~empty] = sums[~empty] / counts[~empty, None]
+        if empty.any():
+            centroids[empty] = data[rng.choice(len(data), int(empty.sum()), replace=False)]
+    return centroids
+
+
+def _nearest_centroid(data: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    distances = (centroids ** 2).sum(axis=1)[None, :] - 2.0 * data @ centroids.T
+    return np.argmin(distances, axis=1)
+
+
+def _training_sample(matrix: np.ndarray) -> np.ndarray:
+    sample_size = config.ANN_TRAIN_SAMPLE
+    if len(matrix) <= sample_size:
+        return np.asarray(matrix, dtype=np.float32)
+    rng = np.random.default_rng(0)
+    return np.asarray(matrix[np.sort(rng.choice(len(matrix), sample_size, replace=False))], dtype=np.float32)
+
+
+class BruteForceIndex:
+    """Exact inner-product scan over the normalized gallery matrix"""
+    name = "brute"
+
+    def __init__(self):
+        self.matrix = np.empty((0, 0), dtype=np.float32)
+
+    def build(self, matrix: np.ndarray):
+        self.matrix = matrix
+        return self
+
+    def search(self, query: np.ndarray, k: int) -> np.ndarray:
+        return _top_k(self.matrix @ query, k)
+
+    def memory_bytes(self) -> int:
+        return 0  # Scans the gallery matrix in place
+
+
+class IVFIndex:
+    """Inverted-file index: rows are bucketed under k-means centroids and
+    only the ``nprobe`` closest buckets are scanned exactly."""
+    name = "ivf"
+
+    def __init__(self, nlist: int = 0, nprobe: Optional[int] = None):
+        self.nlist = nlist or config.IVF_NLIST
+        self.nprobe = nprobe or config.IVF_NPROBE
+        self.centroids = np.empty((0, 0), dtype=np.float32)
+        self.list_offsets = np.empty(0, dtype=np.int64)
+        self.list_rows = np.empty(0, dtype=np.int64)
+        self.matrix = np.empty((0, 0), dtype=np.float32)
+
+    def build(self, matrix: np.ndarray):
+        self.matrix = matrix
+        nlist = self.nlist or max(1, int(4 * np.sqrt(len(matrix))))
+        self.centroids = _kmeans(_training_sample(matrix), nlist, config.ANN_TRAIN_ITERATIONS)
+        assign = self._assign_in_chunks(matrix)
+        self.list_rows = np.argsort(assign, kind='stable')
+        counts = np.bincount(assign, minlength=len(self.centroids))
+        self.list_offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+        return self
+
+    def search(self, query: np.ndarray, k: int) -> np.ndarray:
+        rows = self._probe(query)
+        return rows[_top_k(self.matrix[rows] @ query, k)]
+
+    def memory_bytes(self) -> int:
+        return int(self.centroids.nbytes + self.list_rows.nbytes + self.list_offsets.nbytes)
+
+    def _probe(self, query: np.ndarray) -> np.ndarray:
+        lists = _top_k(self.centroids @ query, self.nprobe)
+        return np.concatenate([self.list_rows[self.list_offsets[i]:self.list_offsets[i + 1]] for i in lists])
+
+    def _assign_in_chunks(self, matrix: np.ndarray, chunk: int = 65536) -> np.ndarray:
+        return np.concatenate([
+            _nearest_centroid(np.asarray(matrix[start:start + chunk], dtype=np.float32), self.centroids)
+            for start in range(0, len(matrix), chunk)
+        ])
+
+
+class IVFPQIndex(IVFIndex):
+    """IVF index whose buckets hold product-quantized codes instead of vectors.
+
+    Each vector is split into ``subvectors`` chunks, every chunk is replaced by
+    the id of its nearest of 256 sub-centroids (one byte), and queries are
+    scored with per-chunk lookup tables. Exact distances are only computed
+    later, when the recognizer re-ranks the returned candidates.
+
+    PQ speeds up candidate scoring; it does not cut resident memory, since
+    the exact re-ranking still reads the full gallery matrix.
+    """
+    name = "ivfpq"
+
+    def __init__(self, nlist: int = 0, nprobe: Optional[int] = None, subvectors: Optional[int] = None):
+        super().__init__(nlist, nprobe)
+        self.subvectors = subvectors or config.PQ_SUBVECTORS
+        self.codebooks = np.empty((0, 0, 0), dtype=np.float32)
+        self.codes = np.empty((0, 0), dtype=np.uint8)
+
+    def build(self, matrix: np.ndarray):
+        dim = matrix.shape[1]
+        if dim % self.subvectors:
+            raise ValueError(f"Embedding size {dim} is not divisible by PQ_SUBVECTORS={self.subvectors}")
+        super().build(matrix)
+        sample = _training_sample(matrix)
+        sub_dim = dim // self.subvectors
+        self.codebooks = np.stack([
+            _kmeans(sample[:, m * sub_dim:(m + 1) * sub_dim], 256, config.ANN_TRAIN_ITERATIONS, seed=m)
+            for m in range(self.subvectors)
+        ])
+        self.codes = np.empty((len(matrix), self.subvectors), dtype=np.uint8)
+        for m in range(self.subvectors):
+            chunk = np.asarray(matrix[:, m * sub_dim:(m + 1) * sub_dim], dtype=np.float32)
+            self.codes[:, m] = _nearest_centroid(chunk, self.codebooks[m])
+        self.matrix = None  # Candidates are scored from the codes
+        return self
+
+    def search(self, query: np.ndarray, k: int) -> np.ndarray:
+        rows = self._probe(query)
+        sub_dim = len(query) // self.subvectors
+        tables = np.einsum('mkd,md->mk', self.codebooks, query.reshape(self.subvectors, sub_dim))
+        scores = tables[np.arange(self.subvectors), self.codes[rows]].sum(axis=1)
+        return rows[_top_k(scores, k)]
+
+    def memory_bytes(self) -> int:
+        return super().memory_bytes() + int(self.codebooks.nbytes + self.codes.nbytes)
+
+
+INDEX_TYPES = {
+    "brute": BruteForceIndex,
+    "ivf": IVFIndex,
+    "ivfpq": IVFPQIndex,
+}
+
+
+def build_index(matrix: np.ndarray, kind: Optional[str] = None):
+    """Build the configured index over a normalized embedding matrix"""
+    kind = kind or config.ANN_INDEX
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"Unknown ANN_INDEX '{kind}', expected one of {list(INDEX_TYPES)}")
+    return INDEX_TYPES[kind]().build(matrix)
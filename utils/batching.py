@@ -0,0 +1,90 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional
+
+
+class MicroBatcher:
+    """Coalesces concurrent single-item calls into batched calls of `fn`.
+
+    `fn` takes a list of items and returns one result per item. The first
+    item of a batch waits at most `max_wait_ms` for others to join, and a
+    batch is dispatched as soon as it holds `max_batch_size` items. Batches
+    run one at a time on a worker thread that exits after `idle_seconds`
+    without work and is restarted by the next submission.
+    """
+
+    def __init__(self, fn: Callable[[List], List], max_batch_size: int = 16,
+                 max_wait_ms: float = 5.0, idle_seconds: float = 60.0, name: str = "micro-batcher"):
+        self.fn = fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.idle_seconds = idle_seconds
+        self.name = name
+        self.batches = 0
+        self.items = 0
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def submit(self, item) -> Future:
+        future = Future()
+        with self._lock:
+            self._queue.put((item, future))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+        return future
+
+    def __call__(self, item):
+        """Submit one item and wait for its result"""
+        return self.submit(item).result()
+
+    def map(self, items: List) -> List:
+        """Submit several items (they may share batches with other callers) and wait for all"""
+        futures = [self.submit(item) for item in items]
+        return [future.result() for future in futures]
+
+    def get_stats(self) -> Dict:
+        return {
+            'batches': self.batches,
+            'items': self.items,
+            'mean_batch_size': self.items / self.batches if self.batches else 0.0,
+        }
+
+    def _run(self):
+        while True:
+            try:
+                first = self._queue.get(timeout=self.idle_seconds)
+            except queue.Empty:
+                with self._lock:
+                    if self._queue.empty():
+                        self._thread = None
+                        return
+                continue
+
+            batch = [first]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._dispatch(batch)
+
+    def _dispatch(self, batch: List):
+        items = [item for item, _ in batch]
+        try:
+            results = self.fn(items)
+            if len(results) != len(items):
+                raise RuntimeError(f"{self.name}: got {len(results)} results for {len(items)} items")
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        self.batches += 1
+        self.items += len(items)
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
@@ -0,0 +1,272 @@
+"""Bulk enrolment from an HR photo export.
+
+SOURCE is either a directory with one sub-folder of photos per person (the
+folder name becomes the user name) or a CSV manifest with `name` and `path`
+columns plus optional `employee_id`, `department` and `notes`; relative
+paths are resolved against the manifest's folder.
+
+Photos are embedded by a pool of worker processes, each with its own warm
+model, in stacked batches. Every finished chunk is appended to a checkpoint
+file, so re-running the same command after a crash only embeds what is
+left. Once everything is embedded, photos and metadata are stored the way
+the Register User form stores them and the gallery file is written once.
+Importing someone who is already enrolled replaces their photos.
+
+Usage (from the project root):
+    python -m utils.bulk_import path/to/export --workers 4
+    python -m utils.bulk_import manifest.csv --failures failures.csv
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import config
+from utils.embedding_pool import embed_path_chunks
+from utils.gallery import EmbeddingGallery
+from utils.image_io import write_image
+from utils.stats_store import IMAGE_EXTENSIONS, get_stats_store
+from utils.user_store import get_user_store
+
+METADATA_COLUMNS = ('employee_id', 'department', 'notes')
+
+# (item, reason) for every photo that could not be enrolled
+Failure = Tuple[Dict[str, str], str]
+
+
+def read_source(source: str) -> Tuple[List[Dict[str, str]], List[Failure]]:
+    """Photos to import as {'name', 'path', 'key', metadata...} dicts, plus rows rejected up front"""
+    if os.path.isdir(source):
+        rows = []
+        for name in sorted(os.listdir(source)):
+            person_dir = os.path.join(source, name)
+            if os.path.isdir(person_dir):
+                rows.extend({'name': name, 'path': os.path.join(person_dir, f)}
+                            for f in sorted(os.listdir(person_dir)) if f.lower().endswith(IMAGE_EXTENSIONS))
+    else:
+        base_dir = os.path.dirname(os.path.abspath(source))
+        with open(source, 'r', newline='', encoding='utf-8-sig') as f:
+            reader = csv.DictReader(f)
+            missing = {'name', 'path'} - set(reader.fieldnames or [])
+            if missing:
+                raise ValueError(f"{source} is missing the column(s): {', '.join(sorted(missing))}")
+            rows = [{key: (value or '').strip() for key, value in row.items() if key} for row in reader]
+        for row in rows:
+            row['path'] = os.path.join(base_dir, row['path'])
+
+    items, failures, seen = [], [], set()
+    for row in rows:
+        name, path = row['name'], os.path.abspath(row['path'])
+        row['path'] = path
+        # The name becomes a directory under DATABASE_DIR
+        if not name or name in ('.', '..') or os.path.basename(name) != name:
+            failures.append((row, "invalid user name"))
+            continue
+        try:
+            st = os.stat(path)
+        except OSError:
+            failures.append((row, "file not found"))
+            continue
+        # Size and mtime in the key so an edited photo is embedded again on resume
+        row['key'] = f"{path}|{st.st_size}|{st.st_mtime_ns}"
+        if (name, row['key']) not in seen:
+            seen.add((name, row['key']))
+            items.append(row)
+    return items, failures
+
+
+class ImportCheckpoint:
+    """Append-only JSON lines file holding the embedding (or null) of every finished photo"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    @staticmethod
+    def default_path(source: str) -> str:
+        digest = hashlib.sha1(os.path.abspath(source).encode('utf-8')).hexdigest()[:12]
+        return os.path.join(config.TEMP_DIR, f"bulk_import_{digest}.jsonl")
+
+    def load(self) -> Dict[str, Optional[np.ndarray]]:
+        done = {}
+        if not os.path.exists(self.path):
+            return done
+        with open(self.path, 'rb+') as f:
+            data = f.read()
+            # Drop a torn last line from a crash mid-write; that chunk is embedded again
+            end = data.rfind(b"\n") + 1
+            if end < len(data):
+                f.truncate(end)
+        for line in data[:end].decode('utf-8').splitlines():
+            record = json.loads(line)
+            embedding = record['embedding']
+            done[record['key']] = None if embedding is None else np.asarray(embedding, dtype=np.float32)
+        return done
+
+    def record(self, results: List[Tuple[str, Optional[np.ndarray]]]):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        lines = "".join(json.dumps({'key': key, 'embedding': None if e is None else np.asarray(e).tolist()}) + "\n"
+                        for key, e in results)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+# ========================================
+# IMPORT
+# ========================================
+
+def bulk_import(source: str, workers: Optional[int] = None, chunk_size: Optional[int] = None,
+                checkpoint_path: Optional[str] = None, restart: bool = False) -> Dict:
+    """Embed every photo of SOURCE, then enrol all people with one gallery write"""
+    workers = workers or config.EMBEDDING_PROCESSES
+    chunk_size = chunk_size or config.EMBEDDING_PROCESS_CHUNK_SIZE
+    items, failures = read_source(source)
+    checkpoint = ImportCheckpoint(checkpoint_path or ImportCheckpoint.default_path(source))
+    if restart:
+        checkpoint.remove()
+    done = checkpoint.load()
+    pending = [item for item in items if item['key'] not in done]
+    people = len({item['name'] for item in items})
+    print(f"Importing {len(items)} photos of {people} people; "
+          f"{len(items) - len(pending)} already embedded (checkpoint {checkpoint.path})")
+
+    started = time.perf_counter()
+    embedded = 0
+    chunks = [pending[start:start + chunk_size] for start in range(0, len(pending), chunk_size)]
+    for i, embeddings, error in embed_path_chunks([[item['path'] for item in c] for c in chunks], workers):
+        chunk = chunks[i]
+        if embeddings is None:
+            # Not checkpointed, so the next run retries the chunk
+            print(f"Embedding error: {error}")
+            failures.extend((item, f"embedding failed: {error}") for item in chunk)
+            continue
+        results = [(item['key'], embedding) for item, embedding in zip(chunk, embeddings)]
+        checkpoint.record(results)
+        done.update(results)
+        embedded += len(chunk)
+        elapsed = time.perf_counter() - started
+        print(f"  {embedded}/{len(pending)} photos embedded, {embedded / elapsed:.1f} img/s")
+    embed_seconds = time.perf_counter() - started
+
+    enrolled = _enrol(items, done, failures)
+    if all(item['key'] in done for item in items):
+        checkpoint.remove()
+    return {
+        'people': enrolled,
+        'photos': sum(1 for item in items if done.get(item['key']) is not None),
+        'embedded': embedded,
+        'resumed': len(items) - len(pending),
+        'failures': failures,
+        'embed_seconds': embed_seconds,
+        'images_per_second': embedded / embed_seconds if embed_seconds > 0 else 0.0,
+        'total_seconds': time.perf_counter() - started,
+    }
+
+
+def _enrol(items: List[Dict[str, str]], done: Dict[str, Optional[np.ndarray]],
+           failures: List[Failure]) -> int:
+    """Store photos and metadata, then write every person's embeddings in one gallery update"""
+    by_person: Dict[str, List[Dict[str, str]]] = {}
+    for item in items:
+        if item['key'] not in done:
+            continue
+        if done[item['key']] is None:
+            failures.append((item, "no face detected"))
+        else:
+            by_person.setdefault(item['name'], []).append(item)
+
+    gallery = EmbeddingGallery(config.EMBEDDINGS_PATH)
+    if by_person and not gallery.ensure_loaded() and get_stats_store().counters().get('users'):
+        # No gallery yet for the people already enrolled: build it before adding to it
+        from utils.gallery_rebuild import rebuild_gallery
+        rebuild_gallery()
+
+    user_store = get_user_store()
+    database = {}
+    for name, person_items in by_person.items():
+        # Read first: the export may point into the user's own directory
+        photos = []
+        for item in person_items:
+            with open(item['path'], 'rb') as f:
+                photos.append(f.read())
+        user_dir = os.path.join(config.DATABASE_DIR, name)
+        os.makedirs(user_dir, exist_ok=True)
+        for file_name in os.listdir(user_dir):
+            if file_name.lower().endswith(IMAGE_EXTENSIONS):
+                os.remove(os.path.join(user_dir, file_name))
+        for i, data in enumerate(photos):
+            write_image(os.path.join(user_dir, f"photo_{i+1}.jpg"), data)
+
+        info = user_store.get(name) or {
+            'full_name': str(name),
+            'registered_date': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            'last_seen': None,
+            'total_access_count': 0
+        }
+        for column in METADATA_COLUMNS:
+            value = next((item[column] for item in person_items if item.get(column)), None)
+            if value is not None:
+                info[column] = value
+        info['photo_count'] = len(photos)
+        user_store.upsert(name, info)
+        database[name] = [done[item['key']] for item in person_items]
+
+    if database:
+        gallery.replace_people(database)
+        get_stats_store().resync()
+    return len(database)
+
+
+def _write_failures(path: str, failures: List[Failure]):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['name', 'path', 'reason'])
+        for item, reason in failures:
+            writer.writerow([item.get('name', ''), item.get('path', ''), reason])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", help="Directory with one folder per person, or a CSV manifest")
+    parser.add_argument("--workers", type=int, default=config.EMBEDDING_PROCESSES,
+                        help="Embedding processes, each loading its own model")
+    parser.add_argument("--chunk-size", type=int, default=config.EMBEDDING_PROCESS_CHUNK_SIZE,
+                        help="Photos per task and per checkpoint write")
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: one per source in TEMP_DIR)")
+    parser.add_argument("--restart", action="store_true", help="Ignore an existing checkpoint")
+    parser.add_argument("--failures", help="Write failed photos to this CSV file")
+    args = parser.parse_args()
+    if not os.path.exists(args.source):
+        sys.exit(f"{args.source} does not exist")
+
+    try:
+        report = bulk_import(args.source, args.workers, args.chunk_size, args.checkpoint, args.restart)
+    except ValueError as e:
+        sys.exit(str(e))
+    print(f"✅ Enrolled {report['people']} people with {report['photos']} photos "
+          f"({report['embedded']} embedded in {report['embed_seconds']:.1f}s, "
+          f"{report['images_per_second']:.1f} img/s; {report['resumed']} from the checkpoint)")
+    failures = report['failures']
+    if failures:
+        print(f"⚠️ {len(failures)} photos failed:")
+        for item, reason in failures[:20]:
+            print(f"  {item.get('name', '')}: {item.get('path', '')} ({reason})")
+        if len(failures) > 20:
+            print(f"  ... and {len(failures) - 20} more")
+        if args.failures:
+            _write_failures(args.failures, failures)
+            print(f"Failures written to {args.failures}")
+
+
+if __name__ == "__main__":
+    main()
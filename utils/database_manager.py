@@ -1,10 +1,12 @@
 import os
 import shutil
-import json
 import config
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Optional
+from utils.image_io import ImageSource, write_image
+from utils.log_store import get_log_store
+from utils.stats_store import IMAGE_EXTENSIONS, get_stats_store
+from utils.user_store import get_user_store
 from datetime import datetime
-import numpy as np
 
 class DatabaseManager:
     
@@ -17,40 +19,83 @@ class DatabaseManager:
                 if os.path.isdir(os.path.join(config.DATABASE_DIR, name))]
     
     @staticmethod
-    def register_new_user(name: str, image_paths: List[str], employee_id: str = "", 
+    def register_new_user(name: str, images: List[ImageSource], employee_id: str = "", 
                          department: str = "", notes: str = "") -> bool:
         """Register a new user with face images"""
         try:
             user_dir = os.path.join(config.DATABASE_DIR, name)
+            is_existing_user = os.path.isdir(user_dir)
             os.makedirs(user_dir, exist_ok=True)
             
-            # Copy images
-            for i, img_path in enumerate(image_paths):
+            # Store images
+            dest_paths = []
+            for i, image in enumerate(images):
                 dest_path = os.path.join(user_dir, f"photo_{i+1}.jpg")
-                shutil.copy(img_path, dest_path)
+                write_image(dest_path, image)
+                dest_paths.append(dest_path)
             
             # Save metadata
-            DatabaseManager._save_user_metadata(name, {
+            get_user_store().upsert(name, {
                 'full_name': str(name),
                 'employee_id': str(employee_id),
                 'department': str(department),
                 'notes': str(notes),
-                'photo_count': int(len(image_paths)),
+                'photo_count': int(len(images)),
                 'registered_date': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
                 'last_seen': None,
                 'total_access_count': 0
             })
             
-            # Rebuild face database
-            from utils.face_recognition import FaceRecognizer
-            recognizer = FaceRecognizer()
-            recognizer.build_database()
+            # Embed only this user's photos
+            recognizer = DatabaseManager._recognizer()
+            if is_existing_user:
+                recognizer.replace_photos(name, DatabaseManager._get_user_image_paths(name))
+            else:
+                recognizer.add_person(name, dest_paths)
+            get_stats_store().record_enrolment(name, DatabaseManager.get_user_image_count(name))
             return True
             
         except Exception as e:
             print(f"Registration error: {e}")
             return False
     
+    @staticmethod
+    def add_user_photo(name: str, image: ImageSource, employee_id: str = "",
+                       department: str = "", notes: str = "") -> int:
+        """Add one photo to a user (registering them if new); returns the embeddings added"""
+        user_dir = os.path.join(config.DATABASE_DIR, name)
+        is_new_user = not os.path.isdir(user_dir)
+        os.makedirs(user_dir, exist_ok=True)
+        
+        index = len(DatabaseManager._get_user_image_paths(name)) + 1
+        while os.path.exists(os.path.join(user_dir, f"photo_{index}.jpg")):
+            index += 1
+        dest_path = os.path.join(user_dir, f"photo_{index}.jpg")
+        write_image(dest_path, image)
+        
+        added = DatabaseManager._recognizer().add_person(name, [dest_path])
+        if not added:
+            # No usable face: keep neither the photo nor an empty user
+            os.remove(dest_path)
+            if is_new_user:
+                shutil.rmtree(user_dir, ignore_errors=True)
+            return 0
+        
+        photo_count = DatabaseManager.get_user_image_count(name)
+        info = get_user_store().get(name) or {
+            'full_name': str(name),
+            'employee_id': str(employee_id),
+            'department': str(department),
+            'notes': str(notes),
+            'registered_date': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            'last_seen': None,
+            'total_access_count': 0
+        }
+        info['photo_count'] = photo_count
+        get_user_store().upsert(name, info)
+        get_stats_store().record_enrolment(name, photo_count)
+        return added
+    
     @staticmethod
     def delete_user(name: str) -> bool:
         """Delete a registered user"""
@@ -58,12 +103,9 @@ class DatabaseManager:
             user_dir = os.path.join(config.DATABASE_DIR, name)
             if os.path.exists(user_dir):
                 shutil.rmtree(user_dir)
-                DatabaseManager._remove_user_metadata(name)
-                
-                # Rebuild face database
-                from utils.face_recognition import FaceRecognizer
-                recognizer = FaceRecognizer()
-                recognizer.build_database()
+                get_user_store().delete(name)
+                get_stats_store().record_removal(name)
+                DatabaseManager._recognizer().remove_person(name)
                 return True
             return False
             
@@ -71,27 +113,37 @@ class DatabaseManager:
             print(f"Deletion error: {e}")
             return False
     
+    @staticmethod
+    def rebuild_face_database(progress: Optional[Callable[[Dict], None]] = None) -> int:
+        """Re-embed every photo of every user across worker processes (explicit admin action)"""
+        from utils.gallery_rebuild import rebuild_gallery
+        get_stats_store().resync()
+        return rebuild_gallery(progress=progress)
+    
+    @staticmethod
+    def get_embedding_cache_stats() -> Dict:
+        """Hit-rate statistics of the embedding cache the shared recognizer uses"""
+        return DatabaseManager._recognizer().cache.get_stats()
+    
     @staticmethod
     def get_user_image_count(name: str) -> int:
         """Get number of images for a user"""
-        user_dir = os.path.join(config.DATABASE_DIR, name)
-        if not os.path.exists(user_dir):
-            return 0
-        return len([f for f in os.listdir(user_dir) 
-                   if f.lower().endswith(('.jpg', '.jpeg', '.png'))])
+        return len(DatabaseManager._get_user_image_paths(name))
     
     @staticmethod
     def get_user_info(name: str) -> Optional[Dict]:
         """Get metadata about a user"""
-        metadata = DatabaseManager._load_all_metadata()
-        return metadata.get(name)
+        return get_user_store().get(name)
+    
+    @staticmethod
+    def get_all_user_info() -> Dict[str, Dict]:
+        """Metadata of every user in one query, keyed by name"""
+        return get_user_store().get_all()
     
     @staticmethod
     def log_access(name: str, confidence: float, emotion: str = "", suspicious: bool = False):
         """Log successful user access attempt"""
-        access_logs = DatabaseManager._load_access_logs()
-        
-        # Convert all values to JSON-serializable Python types
+        # Convert all values to plain Python types
         log_entry = {
             'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
             'user_name': str(name),
@@ -100,63 +152,69 @@ class DatabaseManager:
             'suspicious': bool(suspicious),  # This handles numpy.bool_ automatically
             'status': 'granted'
         }
-        
-        access_logs.append(log_entry)
-        
-        # Keep only last 1000 logs
-        if len(access_logs) > 1000:
-            access_logs = access_logs[-1000:]
-        
-        DatabaseManager._save_access_logs(access_logs)
-        
-        # Update user metadata
-        metadata = DatabaseManager._load_all_metadata()
-        if name in metadata:
-            metadata[name]['last_seen'] = log_entry['timestamp']
-            metadata[name]['total_access_count'] = int(metadata[name].get('total_access_count', 0) + 1)
-            DatabaseManager._save_all_metadata(metadata)
+        # A trigger on access_logs bumps last_seen/total_access_count in the same transaction
+        get_log_store().append(log_entry)
     
     @staticmethod
     def log_access_denied(confidence: float = 0.0):
         """Log denied access attempt"""
-        access_logs = DatabaseManager._load_access_logs()
-        
-        log_entry = {
+        get_log_store().append({
             'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
             'user_name': 'Unknown',
             'confidence': float(round(float(confidence) * 100, 2)),
             'emotion': '',
             'suspicious': False,
             'status': 'denied'
-        }
-        
-        access_logs.append(log_entry)
-        
-        # Keep only last 1000 logs
-        if len(access_logs) > 1000:
-            access_logs = access_logs[-1000:]
-            
-        DatabaseManager._save_access_logs(access_logs)
+        })
     
     @staticmethod
     def get_access_logs(limit: int = 50) -> List[Dict]:
         """Get recent access logs"""
-        logs = DatabaseManager._load_access_logs()
-        return logs[-limit:][::-1]
+        return get_log_store().recent(limit)
+    
+    @staticmethod
+    def query_access_logs(user_name: Optional[str] = None, start: Optional[str] = None, end: Optional[str] = None,
+                          status: Optional[str] = None, suspicious: Optional[bool] = None,
+                          cursor: Optional[int] = None, limit: int = 50):
+        """Filtered, paginated access logs; returns (logs, next_cursor)"""
+        return get_log_store().search(user_name, start, end, status, suspicious, cursor, limit)
+    
+    @staticmethod
+    def get_logged_user_names() -> List[str]:
+        """Distinct user names appearing in the access logs"""
+        return get_log_store().user_names()
+    
+    @staticmethod
+    def import_access_logs(path: str = None, force: bool = False) -> int:
+        """Import entries from a legacy access_logs.json file (once, unless forced)"""
+        return get_log_store().import_json(path or config.ACCESS_LOGS_PATH, force=force)
     
     @staticmethod
     def get_statistics() -> Dict:
-        """Get system statistics"""
-        users = DatabaseManager.get_registered_users()
-        logs = DatabaseManager._load_access_logs()
+        """Get system statistics (maintained counters, nothing is recounted)"""
+        enrolments = get_stats_store().counters()
+        counts = get_log_store().counters()
+        total_logs = counts.get('total', 0)
         
         return {
-            'total_users': len(users),
-            'total_photos': sum([DatabaseManager.get_user_image_count(u) for u in users]),
-            'total_accesses': len([l for l in logs if l.get('status') == 'granted']),
-            'total_denials': len([l for l in logs if l.get('status') == 'denied']),
-            'suspicious_count': len([l for l in logs if l.get('suspicious', False)]),
-            'total_logs': len(logs)
+            'total_users': enrolments.get('users', 0),
+            'total_photos': enrolments.get('photos', 0),
+            'total_accesses': counts.get('granted', 0),
+            'total_denials': counts.get('denied', 0),
+            'suspicious_count': counts.get('suspicious', 0),
+            'total_logs': total_logs,
+            'denial_rate': counts.get('denied', 0) / total_logs if total_logs else 0.0
+        }
+    
+    @staticmethod
+    def get_access_trends(hours: int = 24, days: int = 14, top_users: int = 10) -> Dict[str, List[Dict]]:
+        """Hourly, daily and per-user access counts, newest buckets first"""
+        store = get_log_store()
+        return {
+            'hourly': store.aggregates('access_hourly', hours),
+            'daily': store.aggregates('access_daily', days),
+            # Denied attempts are all logged as 'Unknown', which is not a user to rank
+            'by_user': store.aggregates('access_by_user', top_users, order_by='total', exclude=('Unknown',)),
         }
     
     # ========================================
@@ -164,76 +222,16 @@ class DatabaseManager:
     # ========================================
     
     @staticmethod
-    def _load_all_metadata() -> Dict:
-        """Load all user metadata from JSON"""
-        if os.path.exists(config.USER_INFO_PATH):
-            try:
-                with open(config.USER_INFO_PATH, 'r') as f:
-                    return json.load(f)
-            except json.JSONDecodeError:
-                print("Warning: Could not decode user_info.json")
-                return {}
-        return {}
-    
-    @staticmethod
-    def _save_all_metadata(metadata: Dict):
-        """Save all user metadata to JSON"""
-        with open(config.USER_INFO_PATH, 'w') as f:
-            json.dump(metadata, f, indent=2)
-    
-    @staticmethod
-    def _save_user_metadata(name: str, data: Dict):
-        """Save metadata for a specific user"""
-        metadata = DatabaseManager._load_all_metadata()
-        metadata[name] = data
-        DatabaseManager._save_all_metadata(metadata)
-    
-    @staticmethod
-    def _remove_user_metadata(name: str):
-        """Remove metadata for a specific user"""
-        metadata = DatabaseManager._load_all_metadata()
-        if name in metadata:
-            del metadata[name]
-            DatabaseManager._save_all_metadata(metadata)
-    
-    @staticmethod
-    def _load_access_logs() -> List[Dict]:
-        """Load access logs from JSON"""
-        if os.path.exists(config.ACCESS_LOGS_PATH):
-            try:
-                with open(config.ACCESS_LOGS_PATH, 'r') as f:
-                    return json.load(f)
-            except json.JSONDecodeError:
-                print("Warning: Could not decode access_logs.json")
-                return []
-        return []
-    
-    @staticmethod
-    def _save_access_logs(logs: List[Dict]):
-        """Save access logs to JSON - handles numpy types automatically"""
-        # Simple conversion function
-        def convert_value(value):
-            """Convert numpy types to Python native types"""
-            if isinstance(value, (np.integer, np.int64, np.int32, np.int16, np.int8)):
-                return int(value)
-            elif isinstance(value, (np.floating, np.float64, np.float32, np.float16)):
-                return float(value)
-            elif isinstance(value, np.bool_):
-                return bool(value)
-            elif isinstance(value, (list, tuple)):
-                return [convert_value(v) for v in value]
-            elif isinstance(value, dict):
-                return {k: convert_value(v) for k, v in value.items()}
-            else:
-                return value
-        
-        # Clean all logs
-        clean_logs = []
-        for log in logs:
-            clean_log = {key: convert_value(value) for key, value in log.items()}
-            clean_logs.append(clean_log)
-        
-        # Save to JSON
-        with open(config.ACCESS_LOGS_PATH, 'w') as f:
-            json.dump(clean_logs, f, indent=2)
-
+    def _recognizer():
+        """The recognizer every kiosk session shares, so enrolments update its resident gallery"""
+        from utils.warmup import get_warmup
+        return get_warmup().pipeline.recognizer
+    
+    @staticmethod
+    def _get_user_image_paths(name: str) -> List[str]:
+        """Paths of all face images stored for a user"""
+        user_dir = os.path.join(config.DATABASE_DIR, name)
+        if not os.path.exists(user_dir):
+            return []
+        return [os.path.join(user_dir, f) for f in sorted(os.listdir(user_dir))
+                if f.lower().endswith(IMAGE_EXTENSIONS)]
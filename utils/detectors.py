@@ -0,0 +1,13 @@
+import config
+
+# Where faces are detected: identifying kiosk frames and verification probes,
+# embedding stored photos (registration, bulk import, rebuild) and standalone
+# emotion analysis.
+DETECTION_STAGES = ("recognition", "enrolment", "emotion")
+
+
+def detector_backend(stage: str) -> str:
+    """DeepFace detector backend configured for a stage, defaulting to FACE_DETECTION_BACKEND"""
+    if stage not in DETECTION_STAGES:
+        raise ValueError(f"Unknown detection stage {stage}, expected one of {DETECTION_STAGES}")
+    return config.DETECTOR_BACKENDS.get(stage) or config.FACE_DETECTION_BACKEND
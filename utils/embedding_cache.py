@@ -0,0 +1,132 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+import numpy as np
+import config
+from utils.sqlite_store import SQLiteStore
+
+_shared_caches: Dict[tuple, 'EmbeddingCache'] = {}
+_shared_lock = threading.Lock()
+
+
+def get_embedding_cache(model_name: Optional[str] = None, detector_backend: Optional[str] = None) -> 'EmbeddingCache':
+    """Process-wide cache instance for a model/detector pair"""
+    key = (config.EMBEDDING_CACHE_PATH, model_name or config.FACE_RECOGNITION_MODEL,
+           detector_backend or config.FACE_DETECTION_BACKEND)
+    with _shared_lock:
+        if key not in _shared_caches:
+            _shared_caches[key] = EmbeddingCache(*key)
+        return _shared_caches[key]
+
+
+class EmbeddingCache(SQLiteStore):
+    """Persistent LRU cache of embeddings keyed by image content hash.
+
+    Every entry is one row of a SQLite file, keyed by model, detector and
+    hash, so entries of all detectors live side by side and nothing is read
+    until it is looked up. New entries and LRU touches are buffered and
+    written in one transaction every EMBEDDING_CACHE_FLUSH_EVERY puts (or on
+    save()), which costs the same however large the cache is; beyond
+    max_entries the least recently used rows are deleted.
+    """
+
+    def __init__(self, path: Optional[str] = None, model_name: Optional[str] = None,
+                 detector_backend: Optional[str] = None, max_entries: Optional[int] = None):
+        self.model_name = model_name or config.FACE_RECOGNITION_MODEL
+        self.detector_backend = detector_backend or config.FACE_DETECTION_BACKEND
+        self.max_entries = max_entries or config.EMBEDDING_CACHE_MAX_ENTRIES
+        self.flush_every = config.EMBEDDING_CACHE_FLUSH_EVERY
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._pending: Dict[str, np.ndarray] = {}
+        self._touched: Dict[str, float] = {}
+        super().__init__(path or config.EMBEDDING_CACHE_PATH)
+        self._counters_key = f"counters:{self.model_name}:{self.detector_backend}"
+        rows = self.query("SELECT value FROM store_meta WHERE key = ?", (self._counters_key,))
+        if rows:
+            self.hits, self.misses, self.evictions = json.loads(rows[0]['value'])
+
+    def _create_schema(self, conn: sqlite3.Connection):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS embedding_cache (
+                key TEXT PRIMARY KEY,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_embedding_cache_last_used ON embedding_cache (last_used)")
+
+    def __len__(self) -> int:
+        self.save()
+        return self.query("SELECT COUNT(*) AS n FROM embedding_cache")[0]['n']
+
+    def key_for(self, data: bytes, detector_backend: Optional[str] = None) -> str:
+        """Entries of other detectors (e.g. the enrolment one) are told apart by their key"""
+        digest = hashlib.sha256(data).hexdigest()
+        return f"{self.model_name}:{detector_backend or self.detector_backend}:{digest}"
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            embedding = self._pending.get(key)
+            if embedding is not None:
+                embedding = embedding.copy()
+            else:
+                row = self._conn.execute("SELECT vector FROM embedding_cache WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    embedding = np.frombuffer(row['vector'], dtype=np.float32).copy()
+            if embedding is None:
+                self.misses += 1
+                return None
+            self._touched[key] = time.time()
+            self.hits += 1
+            return embedding
+
+    def put(self, key: str, embedding: np.ndarray):
+        with self._lock:
+            self._pending[key] = np.asarray(embedding, dtype=np.float32).ravel()
+            should_flush = len(self._pending) >= self.flush_every
+        if should_flush:
+            self.save()
+
+    def save(self):
+        """Write buffered entries and LRU touches, then evict beyond max_entries"""
+        with self._lock:
+            if not self._pending and not self._touched:
+                return
+        with self.transaction() as conn:
+            now = time.time()
+            conn.executemany("INSERT OR REPLACE INTO embedding_cache (key, vector, last_used) VALUES (?, ?, ?)",
+                             [(key, vector.tobytes(), now) for key, vector in self._pending.items()])
+            conn.executemany("UPDATE embedding_cache SET last_used = ? WHERE key = ?",
+                             [(used, key) for key, used in self._touched.items() if key not in self._pending])
+            excess = conn.execute("SELECT COUNT(*) FROM embedding_cache").fetchone()[0] - self.max_entries
+            if excess > 0:
+                conn.execute("DELETE FROM embedding_cache WHERE key IN "
+                             "(SELECT key FROM embedding_cache ORDER BY last_used LIMIT ?)", (excess,))
+                self.evictions += excess
+            self._set_meta(conn, self._counters_key, json.dumps([self.hits, self.misses, self.evictions]))
+            self._pending.clear()
+            self._touched.clear()
+
+    def clear(self):
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM embedding_cache")
+            self._pending.clear()
+            self._touched.clear()
+
+    def get_stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'model': self.model_name,
+            'detector': self.detector_backend,
+        }
@@ -0,0 +1,54 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Iterator, List, Optional, Tuple
+import numpy as np
+
+# Recognizer of the current worker process, built once by _init_worker
+_worker_recognizer = None
+
+
+def _init_worker():
+    global _worker_recognizer
+    from utils.face_recognition import FaceRecognizer
+    _worker_recognizer = FaceRecognizer()
+
+
+def _embed_paths(paths: List[str]) -> List[Optional[np.ndarray]]:
+    # Bypass the embedding cache: worker processes must not race on its file
+    embeddings = _worker_recognizer.extract_embeddings_batch(
+        paths, use_cache=False, detector_backend=_worker_recognizer.enrolment_detector)
+    return [None if e is None else np.asarray(e, dtype=np.float32) for e in embeddings]
+
+
+def embed_path_chunks(chunks: List[List[str]],
+                      workers: int) -> Iterator[Tuple[int, Optional[List[Optional[np.ndarray]]], str]]:
+    """Embed chunks of image paths across worker processes, each holding its own warm model.
+
+    Yields (chunk index, embeddings or None, error) as chunks finish, in
+    completion order; an embedding is None when its image has no face, and
+    the embeddings are None with an error message when the whole chunk failed.
+    Closing the generator early cancels the chunks not started yet. With
+    `workers` <= 1 the chunks are embedded in this process.
+    """
+    if workers <= 1:
+        _init_worker()
+        for i, paths in enumerate(chunks):
+            try:
+                yield i, _embed_paths(paths), ""
+            except Exception as e:
+                yield i, None, str(e)
+        return
+
+    # spawn, not fork: TensorFlow state does not survive a fork
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker) as pool:
+        try:
+            futures = {pool.submit(_embed_paths, paths): i for i, paths in enumerate(chunks)}
+            for future in as_completed(futures):
+                try:
+                    yield futures[future], future.result(), ""
+                except Exception as e:
+                    yield futures[future], None, str(e)
+        finally:
+            # A consumer that stops early (e.g. a failed rebuild) only waits for the running chunks
+            pool.shutdown(wait=False, cancel_futures=True)
@@ -1,19 +1,29 @@
-from deepface import DeepFace
+import numpy as np
 import config
 from typing import Dict, Tuple
+from utils.detectors import detector_backend
+from utils.image_io import ImageSource, load_image
 
 class EmotionDetector:
     def __init__(self):
-        self.detector_backend = config.FACE_DETECTION_BACKEND
+        self.detector_backend = detector_backend("emotion")
         self.suspicion_emotions = config.SUSPICION_EMOTIONS
         self.suspicion_threshold = config.SUSPICION_THRESHOLD
     
-    def analyze_emotion(self, img_path: str) -> Tuple[Dict, float, bool]:
+    def analyze_emotion(self, image: ImageSource) -> Tuple[Dict, float, bool]:
+        return self._analyze(load_image(image), self.detector_backend)
+    
+    def analyze_face(self, face: np.ndarray) -> Tuple[Dict, float, bool]:
+        """Emotion of an already detected and aligned face crop (BGR)"""
+        return self._analyze(face, "skip")
+    
+    def _analyze(self, img, detector_backend: str) -> Tuple[Dict, float, bool]:
+        from deepface import DeepFace
         try:
             analysis = DeepFace.analyze(
-                img_path=img_path,
+                img_path=img,
                 actions=['emotion'],
-                detector_backend=self.detector_backend,
+                detector_backend=detector_backend,
                 enforce_detection=False
             )
             if isinstance(analysis, list):
@@ -37,12 +47,17 @@ class EmotionDetector:
             }, suspicion_score, is_suspicious
         except Exception as e:
             print(f"Emotion analysis error: {e}")
-            return {
-                'emotions': {},
-                'dominant_emotion': 'unknown',
-                'suspicion_score': 0.0,
-                'is_suspicious': False
-            }, 0.0, False
+            return self.unknown_result()
+    
+    @staticmethod
+    def unknown_result() -> Tuple[Dict, float, bool]:
+        """Result used when emotion could not be (or was not) analyzed"""
+        return {
+            'emotions': {},
+            'dominant_emotion': 'unknown',
+            'suspicion_score': 0.0,
+            'is_suspicious': False
+        }, 0.0, False
     
     def get_emotion_emoji(self, emotion: str) -> str:
         emoji_map = {
@@ -1,24 +1,243 @@
-from deepface import DeepFace
 import numpy as np
-import os
-import pickle
+import threading
 from typing import Dict, List, Tuple, Optional
 import config
+from utils.ann_index import build_index
+from utils.batching import MicroBatcher
+from utils.detectors import detector_backend
+from utils.embedding_cache import get_embedding_cache
+from utils.gallery import EmbeddingGallery
+from utils.image_io import ImageSource, image_fingerprint, load_image
+from utils.matching import GalleryMatcher
+
+def to_bgr_uint8(face: np.ndarray) -> np.ndarray:
+    """Convert an extract_faces crop (RGB, floats in [0, 1]) to a BGR uint8 image"""
+    if face.dtype != np.uint8:
+        face = np.clip(face * 255.0, 0, 255).astype(np.uint8)
+    return np.ascontiguousarray(face[:, :, ::-1])
 
 class FaceRecognizer:
     def __init__(self):
         self.model_name = config.FACE_RECOGNITION_MODEL
-        self.detector_backend = config.FACE_DETECTION_BACKEND
+        self.detector_backend = detector_backend("recognition")
+        self.enrolment_detector = detector_backend("enrolment")
         self.distance_metric = config.DISTANCE_METRIC
         self.threshold = config.RECOGNITION_THRESHOLD
+        self.gallery = EmbeddingGallery(config.EMBEDDINGS_PATH)
+        self._cache = None
+        self.matcher = GalleryMatcher(self.distance_metric, self.threshold)
+        self.index_kind = config.ANN_INDEX
+        self._index = None  # (index, gallery snapshot it was built from)
+        self._index_wanted = None  # Newest snapshot the background builder should index
+        self._index_failed_version = None
+        self._index_builder = None
+        self._index_idle = threading.Event()
+        self._index_idle.set()
+        self._fresh = None  # (indexed version, gallery version, people added or changed since)
+        self._index_lock = threading.Lock()
+        self.batch_size = config.EMBEDDING_BATCH_SIZE
+        self._model = None
+        self._batching_supported = True
+        # Concurrent callers share forward passes; detection stays on the calling thread
+        self.face_batcher = None
+        if config.MICRO_BATCH_MAX_SIZE > 1:
+            self.face_batcher = MicroBatcher(self.embed_faces, config.MICRO_BATCH_MAX_SIZE,
+                                              config.MICRO_BATCH_WAIT_MS, name="face-embedding-batcher")
+        
+    @property
+    def cache(self):
+        """Embedding cache, opened on first use so processes that bypass it never touch the file"""
+        if self._cache is None:
+            self._cache = get_embedding_cache(self.model_name, self.detector_backend)
+        return self._cache
+    
+    def extract_embedding(self, image: ImageSource, use_cache: bool = True,
+                          detector_backend: Optional[str] = None) -> Optional[np.ndarray]:
+        from deepface import DeepFace
+        detector_backend = detector_backend or self.detector_backend
+        try:
+            cache_key = None
+            if use_cache:
+                cache_key = self.cache.key_for(image_fingerprint(image), detector_backend)
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    return cached
+            
+            if self.face_batcher is not None:
+                faces = self.detect_faces(image, detector_backend)
+                if not faces:
+                    return None
+                embedding = self.face_batcher(faces[0]['face'])
+            else:
+                embedding = DeepFace.represent(
+                    img_path=load_image(image),
+                    model_name=self.model_name,
+                    detector_backend=detector_backend,
+                    enforce_detection=True
+                )
+                embedding = np.array(embedding[0]["embedding"])
+            if embedding is not None and cache_key is not None:
+                self.cache.put(cache_key, embedding)
+            return embedding
+        except Exception as e:
+            print(f"Error extracting embedding: {e}")
+            return None
+    
+    def detect_faces(self, image: ImageSource, detector_backend: Optional[str] = None) -> List[Dict]:
+        """Detect and align faces once so later stages can skip detection.
         
-    def extract_embedding(self, img_path: str) -> Optional[np.ndarray]:
+        Each face is returned as a BGR uint8 crop with its facial_area and
+        detector confidence; an empty list means no face was found. The
+        recognition detector is used unless another backend is given.
+        """
+        from deepface import DeepFace
+        try:
+            faces = DeepFace.extract_faces(
+                img_path=load_image(image),
+                detector_backend=detector_backend or self.detector_backend,
+                enforce_detection=True,
+                align=True
+            )
+        except ValueError:
+            return []
+        except Exception as e:
+            print(f"Error detecting faces: {e}")
+            return []
+        return [{
+            'face': to_bgr_uint8(face['face']),
+            'facial_area': face.get('facial_area', {}),
+            'confidence': float(face.get('confidence', 0.0))
+        } for face in faces]
+    
+    def embed_face(self, face: np.ndarray) -> Optional[np.ndarray]:
+        """Embedding of an already detected and aligned face crop"""
+        return self.embed_faces([face])[0]
+    
+    def embed_faces_shared(self, faces: List[np.ndarray]) -> List[Optional[np.ndarray]]:
+        """Like embed_faces, but the crops may share a forward pass with concurrent callers"""
+        if self.face_batcher is None:
+            return self.embed_faces(faces)
+        return self.face_batcher.map(faces)
+    
+    def embed_faces(self, faces: List[np.ndarray], batch_size: Optional[int] = None) -> List[Optional[np.ndarray]]:
+        """Embeddings of aligned BGR face crops, one stacked forward pass per batch"""
+        batch_size = batch_size or self.batch_size
+        embeddings = []
+        for start in range(0, len(faces), batch_size):
+            chunk = faces[start:start + batch_size]
+            if self._batching_supported:
+                try:
+                    embeddings.extend(self._forward(chunk))
+                    continue
+                except (ImportError, AttributeError) as e:
+                    # This deepface version lacks the preprocessing module or model attributes
+                    print(f"Batched embedding unavailable, using DeepFace.represent from now on: {e}")
+                    self._batching_supported = False
+                except Exception as e:
+                    # E.g. out of memory on a large stack or one bad crop: retry this chunk face by face
+                    print(f"Batched embedding failed, embedding {len(chunk)} faces one at a time: {e}")
+                    embeddings.extend(self._forward_one(face) for face in chunk)
+                    continue
+            embeddings.extend(self._represent_face(face) for face in chunk)
+        return embeddings
+    
+    def extract_embeddings_batch(self, images: List[ImageSource], batch_size: Optional[int] = None,
+                                 use_cache: bool = True,
+                                 detector_backend: Optional[str] = None) -> List[Optional[np.ndarray]]:
+        """Embeddings for many images: detect each, then embed all faces in stacked batches.
+        
+        Like extract_embedding, the first detected face of each image is used and
+        None is returned for images without a face.
+        """
+        batch_size = batch_size or self.batch_size
+        detector_backend = detector_backend or self.detector_backend
+        results: List[Optional[np.ndarray]] = [None] * len(images)
+        pending_faces, pending_slots, pending_keys = [], [], []
+        
+        def flush():
+            for slot, cache_key, embedding in zip(pending_slots, pending_keys, self.embed_faces(pending_faces, batch_size)):
+                results[slot] = embedding
+                if cache_key is not None and embedding is not None:
+                    self.cache.put(cache_key, embedding)
+            pending_faces.clear()
+            pending_slots.clear()
+            pending_keys.clear()
+        
+        for i, image in enumerate(images):
+            try:
+                cache_key = self.cache.key_for(image_fingerprint(image), detector_backend) if use_cache else None
+            except Exception as e:
+                print(f"Error reading image: {e}")
+                continue
+            if cache_key is not None:
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    results[i] = cached
+                    continue
+            faces = self.detect_faces(image, detector_backend)
+            if faces:
+                pending_faces.append(faces[0]['face'])
+                pending_slots.append(i)
+                pending_keys.append(cache_key)
+                if len(pending_faces) >= batch_size:
+                    flush()
+        flush()
+        return results
+    
+    def recognize_faces_batch(self, images: List[ImageSource],
+                              batch_size: Optional[int] = None) -> List[Tuple[Optional[str], float, Dict]]:
+        """recognize_face for many images, with batched embedding and one matching pass"""
+        embeddings = self.extract_embeddings_batch(images, batch_size, use_cache=False)
+        found = [i for i, e in enumerate(embeddings) if e is not None]
+        results = [(None, 0.0, {})] * len(images)
+        if found:
+            matches = self.match_embeddings(np.stack([embeddings[i] for i in found]))
+            for i, match in zip(found, matches):
+                results[i] = match
+        return results
+    
+    def _get_model(self):
+        if self._model is None:
+            from deepface import DeepFace
+            self._model = DeepFace.build_model(self.model_name)
+        return self._model
+    
+    def _forward(self, faces: List[np.ndarray]) -> List[np.ndarray]:
+        """Run the recognition network once over a stack of face crops.
+        
+        Preprocessing mirrors DeepFace.represent with detection skipped: BGR
+        scaled to [0, 1], padded/resized to the model input, base normalization.
+        """
+        from deepface.modules import preprocessing
+        model = self._get_model()
+        target_h, target_w = model.input_shape[0], model.input_shape[1]
+        tensors = [
+            preprocessing.normalize_input(
+                img=preprocessing.resize_image(img=face.astype(np.float32) / 255.0, target_size=(target_w, target_h)),
+                normalization="base"
+            )
+            for face in faces
+        ]
+        output = model.model(np.concatenate(tensors, axis=0), training=False)
+        return [np.asarray(row, dtype=np.float64) for row in np.asarray(output)]
+    
+    def _forward_one(self, face: np.ndarray) -> Optional[np.ndarray]:
+        """A batch of one, so the embedding matches those of full batches"""
+        try:
+            return self._forward([face])[0]
+        except Exception as e:
+            print(f"Error extracting embedding: {e}")
+            return None
+    
+    def _represent_face(self, face: np.ndarray) -> Optional[np.ndarray]:
+        """Only for deepface versions _forward cannot drive; every embedding then comes from here"""
+        from deepface import DeepFace
         try:
             embedding = DeepFace.represent(
-                img_path=img_path,
+                img_path=face,
                 model_name=self.model_name,
-                detector_backend=self.detector_backend,
-                enforce_detection=True
+                detector_backend="skip",
+                enforce_detection=False
             )
             return np.array(embedding[0]["embedding"])
         except Exception as e:
@@ -26,33 +245,53 @@ class FaceRecognizer:
             return None
     
     def build_database(self) -> Dict[str, List[np.ndarray]]:
-        database = {}
-        for person_name in os.listdir(config.DATABASE_DIR):
-            person_path = os.path.join(config.DATABASE_DIR, person_name)
-            if not os.path.isdir(person_path):
-                continue
-            embeddings = []
-            for img_file in os.listdir(person_path):
-                if img_file.lower().endswith(('.jpg', '.jpeg', '.png')):
-                    img_path = os.path.join(person_path, img_file)
-                    embedding = self.extract_embedding(img_path)
-                    if embedding is not None:
-                        embeddings.append(embedding)
-            if embeddings:
-                database[person_name] = embeddings
-                print(f"✓ Loaded {len(embeddings)} embeddings for {person_name}")
-        
-        with open(config.EMBEDDINGS_PATH, 'wb') as f:
-            pickle.dump(database, f)
-        print(f"✅ Database built with {len(database)} people")
-        return database
+        """Full rebuild from every photo in DATABASE_DIR (admin action).
+
+        Goes through rebuild_gallery, so it never runs alongside another
+        rebuild, but embeds in this process with this recognizer's model and
+        cache.
+        """
+        from utils.gallery_rebuild import rebuild_gallery
+        rebuild_gallery(recognizer=self)
+        self.gallery.ensure_loaded()
+        return self.gallery.as_dict()
+    
+    def add_person(self, name: str, images: List[ImageSource]) -> int:
+        """Embed only the given photos and append them to the gallery"""
+        embeddings = self._embed_images(images)
+        if embeddings:
+            self.gallery.add_person(name, embeddings)
+        return len(embeddings)
+    
+    def replace_photos(self, name: str, images: List[ImageSource]) -> int:
+        """Re-embed one person's photos, replacing their stored embeddings"""
+        embeddings = self._embed_images(images)
+        if embeddings:
+            self.gallery.replace_photos(name, embeddings)
+        else:
+            self.gallery.remove_person(name)
+        return len(embeddings)
+    
+    def remove_person(self, name: str) -> bool:
+        return self.gallery.remove_person(name)
+    
+    def _embed_images(self, images: List[ImageSource]) -> List[np.ndarray]:
+        embeddings = self.extract_embeddings_batch(images, detector_backend=self.enrolment_detector)
+        embeddings = [e for e in embeddings if e is not None]
+        self.cache.save()
+        return embeddings
     
     def load_database(self) -> Dict[str, List[np.ndarray]]:
-        if os.path.exists(config.EMBEDDINGS_PATH):
-            with open(config.EMBEDDINGS_PATH, 'rb') as f:
-                return pickle.load(f)
+        if self.gallery.ensure_loaded():
+            return self.gallery.as_dict()
         return self.build_database()
     
+    def ensure_gallery(self) -> EmbeddingGallery:
+        """Up-to-date snapshot of the gallery, safe to use while others update it"""
+        if not self.gallery.ensure_loaded():
+            self.build_database()
+        return self.gallery.snapshot()
+    
     def calculate_distance(self, embedding1: np.ndarray, embedding2: np.ndarray) -> float:
         if self.distance_metric == "cosine":
             return 1 - np.dot(embedding1, embedding2) / (
@@ -62,36 +301,107 @@ class FaceRecognizer:
             return np.linalg.norm(embedding1 - embedding2)
         return float('inf')
     
-    def recognize_face(self, img_path: str) -> Tuple[Optional[str], float, Dict]:
-        query_embedding = self.extract_embedding(img_path)
+    def recognize_face(self, image: ImageSource) -> Tuple[Optional[str], float, Dict]:
+        # One-off camera frames would only churn the cache
+        query_embedding = self.extract_embedding(image, use_cache=False)
         if query_embedding is None:
             return None, 0.0, {}
         
-        database = self.load_database()
-        if not database:
-            return None, 0.0, {}
-        
-        best_match = None
-        best_distance = float('inf')
-        all_matches = {}
-        
-        for person_name, embeddings in database.items():
-            distances = [self.calculate_distance(query_embedding, emb) for emb in embeddings]
-            avg_distance = np.mean(distances)
-            all_matches[person_name] = avg_distance
-            if avg_distance < best_distance:
-                best_distance = avg_distance
-                best_match = person_name
+        return self.match_embedding(query_embedding)
+    
+    def match_embedding(self, embedding: np.ndarray) -> Tuple[Optional[str], float, Dict]:
+        gallery = self.ensure_gallery()
+        indexed = self._get_index(gallery)
+        if indexed is None:
+            return self.matcher.match(gallery, embedding)
+        index, snapshot, fresh_ids = indexed
+        return self.matcher.match_indexed(gallery, index, embedding, indexed=snapshot, fresh_ids=fresh_ids)
+    
+    def match_embeddings(self, embeddings: np.ndarray) -> List[Tuple[Optional[str], float, Dict]]:
+        gallery = self.ensure_gallery()
+        indexed = self._get_index(gallery)
+        if indexed is None:
+            return self.matcher.match_batch(gallery, embeddings)
+        index, snapshot, fresh_ids = indexed
+        return [self.matcher.match_indexed(gallery, index, e, indexed=snapshot, fresh_ids=fresh_ids)
+                for e in np.atleast_2d(embeddings)]
+    
+    def wait_for_index(self, timeout: Optional[float] = None) -> bool:
+        """Block until no ANN index build is running; False on timeout"""
+        return self._index_idle.wait(timeout)
+    
+    def _get_index(self, gallery: EmbeddingGallery):
+        """(index, snapshot it covers, people added or changed since) for large galleries.
         
-        if best_distance <= self.threshold:
-            confidence = 1 - best_distance
-            return best_match, confidence, all_matches
-        return None, 0.0, all_matches
+        None means use the exact scan. Indexes are built in the background:
+        after a gallery update the previous index keeps serving, with the
+        changed people scanned exactly, until the new one is swapped in.
+        """
+        if self.index_kind == "brute" or gallery.size < config.ANN_MIN_GALLERY_SIZE:
+            return None
+        with self._index_lock:
+            current = self._index
+            if current is None or current[1].version != gallery.version:
+                self._request_index(gallery)
+            if current is None:
+                return None
+            index, snapshot = current
+            if snapshot.version == gallery.version:
+                return index, snapshot, None
+            if self._fresh is None or self._fresh[:2] != (snapshot.version, gallery.version):
+                self._fresh = (snapshot.version, gallery.version, self._changed_people(snapshot, gallery))
+            return index, snapshot, self._fresh[2]
+    
+    def _request_index(self, gallery: EmbeddingGallery):
+        # Called with _index_lock held
+        if gallery.version == self._index_failed_version:
+            return
+        if self._index_wanted is None or gallery.version > self._index_wanted.version:
+            self._index_wanted = gallery
+        if self._index_builder is None:
+            self._index_idle.clear()
+            self._index_builder = threading.Thread(target=self._build_indexes, name="ann-index-builder", daemon=True)
+            self._index_builder.start()
+    
+    def _build_indexes(self):
+        """Index the newest requested snapshot until no newer one is waiting"""
+        while True:
+            with self._index_lock:
+                gallery = self._index_wanted
+                if gallery is None or (self._index is not None and self._index[1].version >= gallery.version):
+                    self._index_builder = None
+                    self._index_idle.set()
+                    return
+            try:
+                index = build_index(gallery.matrix, self.index_kind)
+            except Exception as e:
+                print(f"ANN index build failed, using the exact scan: {e}")
+                with self._index_lock:
+                    self._index_failed_version = gallery.version
+                    if self._index_wanted is gallery:
+                        self._index_wanted = None
+                continue
+            with self._index_lock:
+                self._index = (index, gallery)
+    
+    @staticmethod
+    def _changed_people(indexed: EmbeddingGallery, gallery: EmbeddingGallery) -> np.ndarray:
+        """Ids of people in `gallery` who are new or whose rows differ from `indexed`"""
+        old_ids = np.array([indexed.name_index.get(name, -1) for name in gallery.names], dtype=np.int64)
+        known = old_ids >= 0
+        # Row norms are a cheap fingerprint of a person's block
+        old_sums = np.add.reduceat(indexed.norms.astype(np.float64), indexed.offsets)
+        new_sums = np.add.reduceat(gallery.norms.astype(np.float64), gallery.offsets)
+        same = known.copy()
+        same[known] = ((indexed.counts[old_ids[known]] == gallery.counts[known])
+                       & (old_sums[old_ids[known]] == new_sums[known]))
+        return np.flatnonzero(~same)
     
-    def quick_face_check(self, img_path: str) -> bool:
+    def quick_face_check(self, image: ImageSource) -> bool:
+        from deepface import DeepFace
         try:
             faces = DeepFace.extract_faces(
-                img_path=img_path,
+                img_path=load_image(image),
                 detector_backend=self.detector_backend,
                 enforce_detection=False
             )
@@ -1,28 +1,118 @@
-from deepface import DeepFace
 import config
-from typing import Tuple, Dict
+import hashlib
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple, Union
+from utils.face_recognition import FaceRecognizer
+from utils.image_io import ImageSource, image_fingerprint
+from utils.matching import GalleryMatcher
+
+# An image to embed, or an embedding that was already computed
+Probe = Union[ImageSource, np.ndarray]
 
 class FaceVerifier:
-    def __init__(self):
+    """1:1 verification on embeddings instead of DeepFace.verify.
+
+    Enrolled people are compared against their rows in the resident gallery,
+    so a check costs at most one forward pass: the probe's. Recent probes are
+    kept in a small in-memory LRU rather than the persistent embedding cache;
+    reference photo files are enrolled images and go through the persistent
+    cache. Probes and references may also be embeddings.
+    """
+
+    def __init__(self, recognizer: Optional[FaceRecognizer] = None):
+        self.recognizer = recognizer or FaceRecognizer()
         self.model_name = config.FACE_RECOGNITION_MODEL
-        self.detector_backend = config.FACE_DETECTION_BACKEND
+        self.detector_backend = self.recognizer.detector_backend
         self.distance_metric = config.DISTANCE_METRIC
         self.threshold = config.VERIFICATION_THRESHOLD
-    
-    def verify_faces(self, img1_path: str, img2_path: str) -> Tuple[bool, float, Dict]:
+        self.matcher = GalleryMatcher(self.distance_metric, self.threshold)
+        self.probe_cache_size = config.VERIFICATION_PROBE_CACHE_SIZE
+        self._probes: 'OrderedDict[str, np.ndarray]' = OrderedDict()
+        self._probes_lock = threading.Lock()
+
+    def verify(self, probe: Probe, reference: Union[str, np.ndarray]) -> Tuple[bool, float, Dict]:
+        """Check a probe against an enrolled person (by name) or a reference embedding"""
+        embedding = self.probe_embedding(probe)
+        if embedding is None:
+            return False, 0.0, {"error": "No face detected in probe"}
+
+        if isinstance(reference, str):
+            gallery = self.recognizer.ensure_gallery()
+            person_id = gallery.name_index.get(reference)
+            if person_id is None:
+                return False, 0.0, {"error": f"{reference} is not enrolled"}
+            distance = self.matcher.candidate_distances(gallery, embedding, np.array([person_id]))[0]
+        else:
+            reference = np.asarray(reference, dtype=np.float32).ravel()
+            norm = float(np.linalg.norm(reference))
+            distance = self.matcher.row_distances((reference / max(norm, 1e-12))[None, :],
+                                                  np.array([norm], dtype=np.float32), embedding)[0, 0]
+        return self._result(float(distance))
+
+    def verify_many(self, probe: Probe, names: Optional[List[str]] = None) -> Dict[str, Dict]:
+        """Re-verify one probe against several enrolled people (all of them by default)"""
+        embedding = self.probe_embedding(probe)
+        if embedding is None:
+            return {}
+        gallery = self.recognizer.ensure_gallery()
+        if names is None:
+            person_ids = np.arange(len(gallery.names))
+        else:
+            person_ids = np.array([gallery.name_index[n] for n in names if n in gallery.name_index],
+                                  dtype=np.int64)
+        if not len(person_ids):
+            return {}
+        distances = self.matcher.candidate_distances(gallery, embedding, person_ids)
+        return {gallery.names[pid]: self._result(float(d))[2] for pid, d in zip(person_ids, distances)}
+
+    def verify_faces(self, img1: Probe, img2: Probe) -> Tuple[bool, float, Dict]:
+        """Check whether two images (or embeddings) show the same person"""
+        reference = self.reference_embedding(img2)
+        if reference is None:
+            return False, 0.0, {"error": "No face detected in reference"}
+        return self.verify(img1, reference)
+
+    def probe_embedding(self, probe: Probe) -> Optional[np.ndarray]:
+        """Embedding of a probe, remembered in the in-memory LRU"""
+        if isinstance(probe, np.ndarray) and probe.ndim == 1:
+            return probe
         try:
-            result = DeepFace.verify(
-                img1_path=img1_path,
-                img2_path=img2_path,
-                model_name=self.model_name,
-                detector_backend=self.detector_backend,
-                distance_metric=self.distance_metric,
-                enforce_detection=True
-            )
-            is_verified = result["verified"]
-            distance = result["distance"]
-            confidence = 1 - (distance / result["threshold"]) if distance < result["threshold"] else 0
-            return is_verified, confidence, result
+            key = hashlib.sha256(image_fingerprint(probe)).hexdigest()
         except Exception as e:
-            print(f"Verification error: {e}")
-            return False, 0.0, {"error": str(e)}
+            print(f"Error reading probe: {e}")
+            return None
+        with self._probes_lock:
+            embedding = self._probes.get(key)
+            if embedding is not None:
+                self._probes.move_to_end(key)
+                return embedding
+        embedding = self.recognizer.extract_embedding(probe, use_cache=False)
+        if embedding is not None and self.probe_cache_size > 0:
+            with self._probes_lock:
+                self._probes[key] = embedding
+                self._probes.move_to_end(key)
+                while len(self._probes) > self.probe_cache_size:
+                    self._probes.popitem(last=False)
+        return embedding
+
+    def reference_embedding(self, reference: Probe) -> Optional[np.ndarray]:
+        """Embedding of a reference; photo files are enrolled images, read through the persistent cache"""
+        if isinstance(reference, str):
+            return self.recognizer.extract_embedding(
+                reference, use_cache=True, detector_backend=self.recognizer.enrolment_detector)
+        return self.probe_embedding(reference)
+
+    def _result(self, distance: float) -> Tuple[bool, float, Dict]:
+        verified = distance <= self.threshold
+        confidence = 1 - (distance / self.threshold) if distance < self.threshold else 0.0
+        return verified, confidence, {
+            "verified": verified,
+            "distance": distance,
+            "threshold": self.threshold,
+            "confidence": confidence,
+            "model": self.model_name,
+            "detector_backend": self.detector_backend,
+            "distance_metric": self.distance_metric,
+        }
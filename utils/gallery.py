@@ -0,0 +1,264 @@
+import copy
+import os
+import pickle
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+import numpy as np
+import config
+from utils.gallery_file import normalize_rows, read_gallery_file, write_gallery_file, write_lock
+
+
+class EmbeddingGallery:
+    """Resident copy of the enrolled face embeddings.
+
+    All embeddings live in one contiguous, L2-normalized float32 matrix whose
+    rows are grouped per person. ``labels`` holds the person index of every row
+    and ``offsets``/``counts`` describe each person's block of rows. The
+    original vector norms are kept so euclidean distances stay exact.
+
+    The file is loaded memory-mapped (see utils.gallery_file), so processes
+    serving the same gallery share its pages. Updates reload, patch and write
+    the file under utils.gallery_file.write_lock, shared by every instance
+    and process using the same path, so concurrent enrolments cannot drop
+    each other's people. A legacy pickle with the same base name is migrated
+    the first time the gallery file is missing.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = config.EMBEDDINGS_PATH if path is None else path
+        self.legacy_path = os.path.splitext(self.path)[0] + ".pkl"
+        self.check_interval = config.GALLERY_CHECK_INTERVAL_SECONDS
+        self.names: List[str] = []
+        self.name_index: Dict[str, int] = {}
+        self.matrix = np.empty((0, 0), dtype=np.float32)
+        self.norms = np.empty(0, dtype=np.float32)
+        self.labels = np.empty(0, dtype=np.int32)
+        self.offsets = np.empty(0, dtype=np.int64)
+        self.counts = np.empty(0, dtype=np.int64)
+        self.version = 0
+        self.hits = 0
+        self.reloads = 0
+        self.stat_checks = 0
+        self._stamp = None
+        self._last_check = 0.0
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    @property
+    def size(self) -> int:
+        """Total number of stored embeddings"""
+        return int(self.matrix.shape[0])
+
+    def ensure_loaded(self) -> bool:
+        """Make sure the resident copy matches the file; False if there is no file"""
+        with self._lock:
+            now = time.monotonic()
+            if self._stamp is not None and now - self._last_check < self.check_interval:
+                self.hits += 1
+                return True
+            self._last_check = now
+            self.stat_checks += 1
+            stamp = self._file_stamp()
+            if stamp is not None:
+                if stamp == self._stamp:
+                    self.hits += 1
+                else:
+                    self._load_file(stamp)
+                return True
+
+        # No file yet: migrate under the write lock, taken before the instance lock like every writer
+        with write_lock(self.path), self._lock:
+            stamp = self._file_stamp()
+            if stamp is not None:
+                if stamp != self._stamp:
+                    self._load_file(stamp)
+                return True
+            return self._migrate_legacy() or self._stamp is not None
+
+    def snapshot(self) -> 'EmbeddingGallery':
+        """Consistent read-only view for one request.
+
+        Updates always swap in new arrays instead of mutating them, so a
+        shallow copy taken under the lock cannot change underneath a reader.
+        """
+        with self._lock:
+            return copy.copy(self)
+
+    def invalidate(self):
+        """Force the next access to re-check the file"""
+        with self._lock:
+            self._stamp = None
+            self._last_check = 0.0
+
+    def set_database(self, database: Dict[str, List[np.ndarray]]):
+        """Replace the resident copy with an already loaded database dict"""
+        with self._lock:
+            self._build(database)
+            self._stamp = self._file_stamp()
+            self._last_check = time.monotonic()
+
+    def save_database(self, database: Dict[str, List[np.ndarray]]):
+        """Atomically replace the gallery file and the resident copy"""
+        with write_lock(self.path), self._lock:
+            self._build(database)
+            self._write_file()
+
+    def add_person(self, name: str, embeddings: List[np.ndarray]):
+        """Append embeddings for a person (new or existing) and persist"""
+        with write_lock(self.path), self._lock:
+            self._refresh_for_write()
+            existing = self._person_rows(name)
+            self._replace_block(name, list(existing) + list(embeddings))
+            self._write_file()
+
+    def replace_photos(self, name: str, embeddings: List[np.ndarray]):
+        """Replace all embeddings of a person and persist"""
+        with write_lock(self.path), self._lock:
+            self._refresh_for_write()
+            self._replace_block(name, list(embeddings))
+            self._write_file()
+
+    def replace_people(self, database: Dict[str, List[np.ndarray]]):
+        """Replace the embeddings of many people at once and persist with a single write"""
+        with write_lock(self.path), self._lock:
+            self._refresh_for_write()
+            self._replace_blocks(database)
+            self._write_file()
+
+    def remove_person(self, name: str) -> bool:
+        """Drop a person from the gallery and persist; False if unknown"""
+        with write_lock(self.path), self._lock:
+            self._refresh_for_write()
+            if name not in self.name_index:
+                return False
+            self._replace_block(name, [])
+            self._write_file()
+            return True
+
+    def people(self) -> Iterator[Tuple[str, np.ndarray]]:
+        """Yield (name, raw embeddings) for every enrolled person"""
+        for idx, name in enumerate(self.names):
+            start, count = int(self.offsets[idx]), int(self.counts[idx])
+            rows = slice(start, start + count)
+            yield name, self.matrix[rows] * self.norms[rows, None]
+
+    def as_dict(self) -> Dict[str, List[np.ndarray]]:
+        """Rebuild the legacy {name: [embedding, ...]} mapping"""
+        return {name: list(rows) for name, rows in self.people()}
+
+    def get_stats(self) -> Dict:
+        return {
+            'people': len(self.names),
+            'embeddings': self.size,
+            'version': self.version,
+            'hits': self.hits,
+            'reloads': self.reloads,
+            'stat_checks': self.stat_checks,
+        }
+
+    # ========================================
+    # PRIVATE HELPER METHODS
+    # ========================================
+
+    def _file_stamp(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def _refresh_for_write(self):
+        # Another process may have patched the file since our last check
+        self._last_check = 0.0
+        self.ensure_loaded()
+
+    def _person_rows(self, name: str) -> np.ndarray:
+        if name not in self.name_index:
+            return np.empty((0, self.matrix.shape[1]), dtype=np.float32)
+        idx = self.name_index[name]
+        rows = slice(int(self.offsets[idx]), int(self.offsets[idx] + self.counts[idx]))
+        return self.matrix[rows] * self.norms[rows, None]
+
+    def _replace_block(self, name: str, embeddings: List[np.ndarray]):
+        """Remove a person's rows and re-append the given ones at the end"""
+        self._replace_blocks({name: embeddings})
+
+    def _replace_blocks(self, database: Dict[str, List[np.ndarray]]):
+        """Remove the given people's rows and re-append the new ones at the end, in one pass"""
+        keep = np.ones(self.size, dtype=bool)
+        dropped = [self.name_index[name] for name in database if name in self.name_index]
+        for idx in dropped:
+            keep[int(self.offsets[idx]):int(self.offsets[idx] + self.counts[idx])] = False
+        names = [name for name in self.names if name not in database]
+        counts = np.delete(self.counts, dropped)
+
+        matrix, norms = self.matrix[keep], self.norms[keep]
+        blocks = [np.asarray(e, dtype=np.float32).reshape(len(e), -1) for e in database.values() if len(e)]
+        if blocks:
+            new_unit, new_norms = self._normalize(np.concatenate(blocks))
+            matrix = np.concatenate([matrix, new_unit]) if len(matrix) else new_unit
+            norms = np.concatenate([norms, new_norms])
+            names.extend(name for name, e in database.items() if len(e))
+            counts = np.append(counts, [len(block) for block in blocks])
+        self._set_arrays(names, np.ascontiguousarray(matrix), norms, counts.astype(np.int64))
+
+    def _write_file(self):
+        write_gallery_file(self.path, self.names, self.matrix, self.norms, self.counts)
+        self._stamp = self._file_stamp()
+        self._last_check = time.monotonic()
+
+    def _load_file(self, stamp: Tuple[int, int, int]):
+        stored = read_gallery_file(self.path)
+        model = stored.header.get('model')
+        if model != config.FACE_RECOGNITION_MODEL:
+            print(f"Warning: {self.path} holds {model} embeddings but the configured model is "
+                  f"{config.FACE_RECOGNITION_MODEL}; rebuild the face database")
+        self._set_arrays(stored.names, stored.matrix, stored.norms, stored.counts)
+        self._stamp = stamp
+        self.reloads += 1
+
+    def _migrate_legacy(self) -> bool:
+        """One-shot conversion of a legacy embeddings pickle into the gallery file"""
+        if self.legacy_path == self.path or not os.path.exists(self.legacy_path):
+            return False
+        with open(self.legacy_path, 'rb') as f:
+            database = pickle.load(f)
+        self._build(database)
+        self._write_file()
+        print(f"✓ Migrated {len(self.names)} people from {self.legacy_path} to {self.path}")
+        return True
+
+    def _build(self, database: Dict[str, List[np.ndarray]]):
+        names, blocks = [], []
+        for name, embeddings in database.items():
+            if len(embeddings) == 0:
+                continue
+            names.append(name)
+            blocks.append(np.asarray(embeddings, dtype=np.float32).reshape(len(embeddings), -1))
+
+        if blocks:
+            matrix, norms = self._normalize(np.ascontiguousarray(np.concatenate(blocks, axis=0)))
+            counts = np.array([len(b) for b in blocks], dtype=np.int64)
+        else:
+            matrix, norms = np.empty((0, 0), dtype=np.float32), np.empty(0, dtype=np.float32)
+            counts = np.empty(0, dtype=np.int64)
+        self._set_arrays(names, matrix, norms, counts)
+
+    @staticmethod
+    def _normalize(raw: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        return normalize_rows(raw)
+
+    def _set_arrays(self, names: List[str], matrix: np.ndarray, norms: np.ndarray, counts: np.ndarray):
+        if not names:
+            matrix, norms = np.empty((0, 0), dtype=np.float32), np.empty(0, dtype=np.float32)
+        self.names = names
+        self.name_index = {name: idx for idx, name in enumerate(names)}
+        self.matrix = matrix
+        self.norms = norms
+        self.counts = counts
+        self.offsets = np.concatenate(([0], np.cumsum(counts)[:-1])).astype(np.int64) if len(counts) else counts
+        self.labels = np.repeat(np.arange(len(names), dtype=np.int32), counts)
+        self.version += 1
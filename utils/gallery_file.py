@@ -0,0 +1,353 @@
+import json
+import os
+import shutil
+import struct
+import tempfile
+import threading
+import uuid
+from contextlib import contextmanager
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple
+import numpy as np
+import config
+from utils.detectors import detector_backend
+
+# File layout:
+#   magic | uint32 format version | uint32 header length | JSON header
+#   | padding | matrix (rows x dim, header dtype) | padding | norms (rows, float32)
+# Both arrays start on ALIGNMENT boundaries so they can be memory-mapped directly.
+MAGIC = b"FACEGAL\x00"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+SUPPORTED_DTYPES = ("float32", "float16")
+
+_PREFIX = struct.Struct("<8sII")
+
+# Per-path locks shared by every EmbeddingGallery in this process
+_path_locks: Dict[str, '_PathLock'] = {}
+_rebuild_locks: Dict[str, threading.Lock] = {}
+_path_locks_guard = threading.Lock()
+
+if os.name == "nt":
+    import msvcrt
+
+    def _lock_file(f, blocking: bool = True):
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+
+    def _unlock_file(f):
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+else:
+    import fcntl
+
+    def _lock_file(f, blocking: bool = True):
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+    def _unlock_file(f):
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+class GalleryFile:
+    """Contents of a gallery file: header plus (possibly memory-mapped) arrays"""
+
+    def __init__(self, header: Dict, names: List[str], matrix: np.ndarray,
+                 norms: np.ndarray, counts: np.ndarray):
+        self.header = header
+        self.names = names
+        self.matrix = matrix
+        self.norms = norms
+        self.counts = counts
+
+
+class _PathLock:
+    """Thread lock plus OS file lock for one gallery path; re-entrant within a thread"""
+
+    def __init__(self, path: str):
+        self.lock_path = f"{path}.lock"
+        self.lock = threading.RLock()
+        self.depth = 0
+        self.file = None
+
+
+@contextmanager
+def write_lock(path: str) -> Iterator[None]:
+    """Serialize read-modify-write of a gallery file across threads and processes.
+
+    Held around "reload, patch, write" so concurrent enrolments cannot drop
+    each other's people; other processes wait on an OS lock of `{path}.lock`.
+    """
+    key = os.path.abspath(path)
+    with _path_locks_guard:
+        entry = _path_locks.setdefault(key, _PathLock(key))
+    with entry.lock:
+        if entry.depth == 0:
+            os.makedirs(os.path.dirname(key), exist_ok=True)
+            entry.file = open(entry.lock_path, 'a+b')
+            try:
+                _lock_file(entry.file)
+            except BaseException:
+                entry.file.close()
+                raise
+        entry.depth += 1
+        try:
+            yield
+        finally:
+            entry.depth -= 1
+            if entry.depth == 0:
+                try:
+                    _unlock_file(entry.file)
+                finally:
+                    entry.file.close()
+                    entry.file = None
+
+
+@contextmanager
+def rebuild_lock(path: str) -> Iterator[None]:
+    """Held for a whole rebuild of `path`; raises RuntimeError if one is already running.
+
+    Unlike write_lock it never waits: a second rebuild would only redo the
+    work. Other processes are excluded by an OS lock of `{path}.rebuild.lock`.
+    """
+    key = os.path.abspath(path)
+    with _path_locks_guard:
+        lock = _rebuild_locks.setdefault(key, threading.Lock())
+    if not lock.acquire(blocking=False):
+        raise RuntimeError("A face database rebuild is already running")
+    try:
+        os.makedirs(os.path.dirname(key), exist_ok=True)
+        with open(f"{key}.rebuild.lock", 'a+b') as f:
+            try:
+                _lock_file(f, blocking=False)
+            except OSError:
+                raise RuntimeError("A face database rebuild is already running in another process") from None
+            try:
+                yield
+            finally:
+                _unlock_file(f)
+    finally:
+        lock.release()
+
+
+def _aligned(position: int) -> int:
+    return -(-position // ALIGNMENT) * ALIGNMENT
+
+
+def _data_offsets(header_length: int, rows: int, dim: int, dtype: str) -> Tuple[int, int]:
+    matrix_offset = _aligned(_PREFIX.size + header_length)
+    norms_offset = _aligned(matrix_offset + rows * dim * np.dtype(dtype).itemsize)
+    return matrix_offset, norms_offset
+
+
+def _check_dtype(dtype: Optional[str]) -> str:
+    dtype = dtype or config.EMBEDDINGS_DTYPE
+    if dtype not in SUPPORTED_DTYPES:
+        raise ValueError(f"Unsupported embedding dtype {dtype}, expected one of {SUPPORTED_DTYPES}")
+    return dtype
+
+
+def normalize_rows(raw: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """L2-normalized float32 rows and their original norms"""
+    raw = np.asarray(raw, dtype=np.float32)
+    norms = np.linalg.norm(raw, axis=1).astype(np.float32)
+    safe_norms = np.where(norms > 0, norms, 1.0).astype(np.float32)
+    return raw / safe_norms[:, None], norms
+
+
+def _write_file(path: str, names: List[str], counts, rows: int, dim: int, dtype: str,
+                write_matrix: Callable[[BinaryIO], None], write_norms: Callable[[BinaryIO], None]):
+    """Lay out header and data in a temp file, then atomically replace `path`"""
+    offsets = np.concatenate(([0], np.cumsum(counts)[:-1])) if len(counts) else []
+    header = json.dumps({
+        'model': config.FACE_RECOGNITION_MODEL,
+        'detector': detector_backend("enrolment"),
+        'distance_metric': config.DISTANCE_METRIC,
+        'normalization': 'l2',
+        'dtype': dtype,
+        'rows': rows,
+        'dim': dim,
+        'people': [{'name': name, 'offset': int(offset), 'count': int(count)}
+                   for name, offset, count in zip(names, offsets, counts)],
+    }).encode('utf-8')
+    matrix_offset, norms_offset = _data_offsets(len(header), rows, dim, dtype)
+
+    # Unique temp name in the target directory, so concurrent writers never share it.
+    # Created with the umask's default mode rather than mkstemp's owner-only one.
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_BINARY', 0), 0o666)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(_PREFIX.pack(MAGIC, FORMAT_VERSION, len(header)))
+            f.write(header)
+            f.write(b"\0" * (matrix_offset - f.tell()))
+            write_matrix(f)
+            f.write(b"\0" * (norms_offset - f.tell()))
+            write_norms(f)
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(path):
+            shutil.copymode(path, tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def write_gallery_file(path: str, names: List[str], matrix: np.ndarray, norms: np.ndarray,
+                       counts: np.ndarray, dtype: Optional[str] = None):
+    """Atomically write L2-normalized rows, their original norms and the per-person index"""
+    dtype = _check_dtype(dtype)
+    rows = int(matrix.shape[0])
+    dim = int(matrix.shape[1]) if rows else 0
+    _write_file(path, names, counts, rows, dim, dtype,
+                lambda f: f.write(np.ascontiguousarray(matrix, dtype=dtype).tobytes()),
+                lambda f: f.write(np.ascontiguousarray(norms, dtype=np.float32).tobytes()))
+
+
+class GalleryFileWriter:
+    """Streams person blocks into a new gallery file without holding the whole matrix.
+
+    Blocks are spooled to anonymous temporary files next to `path` as they
+    arrive; close() lays out the final file and atomically replaces `path`, so
+    readers see either the old gallery or the complete new one. abort()
+    discards everything.
+    """
+
+    def __init__(self, path: str, dtype: Optional[str] = None):
+        self.path = path
+        self.dtype = _check_dtype(dtype)
+        self.names: List[str] = []
+        self.counts: List[int] = []
+        self.rows = 0
+        self.dim = 0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        # Unique and removed on close, so concurrent writers never share a spool
+        self._files = {key: tempfile.TemporaryFile(prefix=f"{os.path.basename(path)}.{key}.",
+                                                   suffix=".tmp", dir=directory)
+                       for key in ('matrix', 'norms')}
+
+    def add_person(self, name: str, embeddings: List[np.ndarray]):
+        """Append one person's raw embeddings"""
+        if not len(embeddings):
+            return
+        unit, norms = normalize_rows(np.asarray(embeddings, dtype=np.float32).reshape(len(embeddings), -1))
+        if self.dim and unit.shape[1] != self.dim:
+            raise ValueError(f"{name} has {unit.shape[1]}-d embeddings, expected {self.dim}")
+        self.dim = int(unit.shape[1])
+        self._files['matrix'].write(np.ascontiguousarray(unit, dtype=self.dtype).tobytes())
+        self._files['norms'].write(norms.tobytes())
+        self.names.append(name)
+        self.counts.append(len(unit))
+        self.rows += len(unit)
+
+    def close(self, replace: Optional[Dict[str, Tuple[np.ndarray, np.ndarray]]] = None, drop=()):
+        """Lay out the final file and atomically replace `path`.
+
+        People in `replace` get the given (unit rows, norms) instead of their
+        spooled block, or are appended if they were never added; people in
+        `drop` are left out.
+        """
+        replace = {name: rows for name, rows in (replace or {}).items() if len(rows[0]) and name not in drop}
+        try:
+            # (name, spooled row offset or None for a replacement, rows)
+            blocks: List[Tuple[str, Optional[int], int]] = []
+            offset = 0
+            for name, count in zip(self.names, self.counts):
+                if name in replace:
+                    blocks.append((name, None, len(replace[name][0])))
+                elif name not in drop:
+                    blocks.append((name, offset, count))
+                offset += count
+            blocks.extend((name, None, len(rows[0])) for name, rows in replace.items() if name not in self.names)
+            for name, (unit, _) in replace.items():
+                if self.dim and unit.shape[1] != self.dim:
+                    raise ValueError(f"{name} has {unit.shape[1]}-d embeddings, expected {self.dim}")
+                self.dim = int(unit.shape[1])
+
+            for spool in self._files.values():
+                spool.flush()
+            self.names = [name for name, _, _ in blocks]
+            self.counts = [count for _, _, count in blocks]
+            self.rows = sum(self.counts)
+            itemsize = np.dtype(self.dtype).itemsize
+            _write_file(self.path, self.names, np.array(self.counts, dtype=np.int64), self.rows,
+                        self.dim, self.dtype,
+                        lambda f: self._copy_blocks(f, 'matrix', self.dim * itemsize, blocks,
+                                                    {name: unit.astype(self.dtype) for name, (unit, _) in replace.items()}),
+                        lambda f: self._copy_blocks(f, 'norms', 4, blocks,
+                                                    {name: norms.astype(np.float32) for name, (_, norms) in replace.items()}))
+        finally:
+            self.abort()
+
+    def _copy_blocks(self, f: BinaryIO, key: str, row_bytes: int,
+                     blocks: List[Tuple[str, Optional[int], int]], replacements: Dict[str, np.ndarray]):
+        """Write each block from its spool range or its replacement, copying adjacent spool ranges at once"""
+        spool = self._files[key]
+        start = end = None  # Spooled rows not written yet
+
+        def copy_range():
+            if start is None:
+                return
+            spool.seek(start * row_bytes)
+            remaining = (end - start) * row_bytes
+            while remaining:
+                data = spool.read(min(remaining, 1 << 20))
+                if not data:
+                    raise IOError(f"Spooled {key} ended early")
+                f.write(data)
+                remaining -= len(data)
+
+        for name, offset, count in blocks:
+            if offset is not None and offset == end:
+                end += count
+                continue
+            copy_range()
+            if offset is None:
+                f.write(np.ascontiguousarray(replacements[name]).tobytes())
+                start = end = None
+            else:
+                start, end = offset, offset + count
+        copy_range()
+
+    def abort(self):
+        for spool in self._files.values():
+            spool.close()
+
+
+def read_gallery_file(path: str, mmap: Optional[bool] = None) -> GalleryFile:
+    """Read a gallery file, memory-mapping the float32 matrix when `mmap` is set.
+
+    Mapped pages are shared by every process that opens the same file. A
+    float16 matrix is converted to float32 on load, so it saves disk and
+    page cache but not resident memory.
+    """
+    mmap = config.EMBEDDINGS_MMAP if mmap is None else mmap
+    with open(path, 'rb') as f:
+        prefix = f.read(_PREFIX.size)
+        if len(prefix) < _PREFIX.size:
+            raise ValueError(f"{path} is not a gallery file")
+        magic, version, header_length = _PREFIX.unpack(prefix)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a gallery file")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"{path} has gallery format version {version}, expected {FORMAT_VERSION}")
+        header = json.loads(f.read(header_length).decode('utf-8'))
+
+    rows, dim, dtype = header['rows'], header['dim'], header['dtype']
+    names = [person['name'] for person in header['people']]
+    counts = np.array([person['count'] for person in header['people']], dtype=np.int64)
+    if rows == 0:
+        return GalleryFile(header, names, np.empty((0, 0), dtype=np.float32), np.empty(0, dtype=np.float32), counts)
+
+    matrix_offset, norms_offset = _data_offsets(header_length, rows, dim, dtype)
+    if mmap:
+        matrix = np.memmap(path, dtype=dtype, mode='r', offset=matrix_offset, shape=(rows, dim)).view(np.ndarray)
+        norms = np.memmap(path, dtype=np.float32, mode='r', offset=norms_offset, shape=(rows,)).view(np.ndarray)
+    else:
+        matrix = np.fromfile(path, dtype=dtype, count=rows * dim, offset=matrix_offset).reshape(rows, dim)
+        norms = np.fromfile(path, dtype=np.float32, count=rows, offset=norms_offset)
+    if matrix.dtype != np.float32:
+        matrix = matrix.astype(np.float32)
+    return GalleryFile(header, names, matrix, norms, counts)
+
@@ -0,0 +1,152 @@
+import os
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+import config
+from utils.embedding_pool import embed_path_chunks
+from utils.gallery_file import GalleryFile, GalleryFileWriter, read_gallery_file, rebuild_lock, write_lock
+from utils.stats_store import IMAGE_EXTENSIONS
+
+# (name, photo paths) for every person in a task
+Shard = List[Tuple[str, List[str]]]
+
+
+def scan_people(database_dir: Optional[str] = None) -> List[Tuple[str, List[str]]]:
+    """(name, photo paths) for every user directory, largest first"""
+    database_dir = database_dir or config.DATABASE_DIR
+    if not os.path.exists(database_dir):
+        return []
+    people = []
+    for entry in os.scandir(database_dir):
+        if entry.is_dir():
+            paths = sorted(f.path for f in os.scandir(entry.path)
+                           if f.is_file() and f.name.lower().endswith(IMAGE_EXTENSIONS))
+            if paths:
+                people.append((entry.name, paths))
+    # Big tasks first so no worker is left with a long one at the end
+    people.sort(key=lambda person: len(person[1]), reverse=True)
+    return people
+
+
+def shard_people(people: List[Tuple[str, List[str]]], chunk_size: int) -> List[Shard]:
+    """Group whole people into tasks of about `chunk_size` photos"""
+    shards, current, photos = [], [], 0
+    for name, paths in people:
+        if current and photos + len(paths) > chunk_size:
+            shards.append(current)
+            current, photos = [], 0
+        current.append((name, paths))
+        photos += len(paths)
+    if current:
+        shards.append(current)
+    return shards
+
+
+def rebuild_gallery(workers: Optional[int] = None, chunk_size: Optional[int] = None,
+                    progress: Optional[Callable[[Dict], None]] = None, recognizer=None) -> int:
+    """Re-embed every photo in DATABASE_DIR across worker processes and swap in the new gallery.
+
+    People are sharded whole, so each finished task streams complete person
+    blocks into the new file while the current gallery keeps serving. The
+    file is replaced atomically at the end; if a task fails the old gallery
+    is kept and RuntimeError is raised. Only one rebuild runs at a time (a
+    second one raises RuntimeError). Enrolments and deletions are not
+    blocked: people they change meanwhile keep their current rows in the
+    new file. `progress` is called after every task with counts, throughput
+    and an ETA. With a `recognizer` the photos are embedded in this process
+    with its model and embedding cache. Returns the number of people.
+    """
+    with rebuild_lock(config.EMBEDDINGS_PATH):
+        return _rebuild(workers or config.EMBEDDING_PROCESSES,
+                        chunk_size or config.EMBEDDING_PROCESS_CHUNK_SIZE, progress, recognizer)
+
+
+def _person_sums(gallery: Optional[GalleryFile]) -> Dict[str, Tuple[int, float]]:
+    """Row count and row sum of every person, to tell which people changed between two reads"""
+    if gallery is None or not len(gallery.counts):
+        return {}
+    row_sums = gallery.matrix.sum(axis=1, dtype=np.float64) + gallery.norms
+    offsets = np.concatenate(([0], np.cumsum(gallery.counts)[:-1]))
+    sums = np.add.reduceat(row_sums, offsets)
+    return {name: (int(count), float(total)) for name, count, total in zip(gallery.names, gallery.counts, sums)}
+
+
+def _read_current() -> Optional[GalleryFile]:
+    if not os.path.exists(config.EMBEDDINGS_PATH):
+        return None
+    return read_gallery_file(config.EMBEDDINGS_PATH)
+
+
+def _embed_in_process(recognizer, tasks: List[List[str]]):
+    for i, paths in enumerate(tasks):
+        try:
+            yield i, recognizer.extract_embeddings_batch(paths, detector_backend=recognizer.enrolment_detector), ""
+        except Exception as e:
+            yield i, None, str(e)
+    recognizer.cache.save()
+
+
+def _rebuild(workers: int, chunk_size: int, progress: Optional[Callable[[Dict], None]], recognizer) -> int:
+    # Snapshot before scanning, so anything an enrolment changes afterwards shows up at the swap
+    with write_lock(config.EMBEDDINGS_PATH):
+        before = _person_sums(_read_current())
+    people = scan_people()
+    shards = shard_people(people, chunk_size)
+    status = {
+        'people_total': len(people),
+        'photos_total': sum(len(paths) for _, paths in people),
+        'people_done': 0,
+        'photos_done': 0,
+        'embedded': 0,
+        'elapsed_s': 0.0,
+        'photos_per_second': 0.0,
+        'eta_s': None,
+    }
+
+    writer = GalleryFileWriter(config.EMBEDDINGS_PATH)
+    started = time.perf_counter()
+    try:
+        tasks = [[path for _, paths in shard for path in paths] for shard in shards]
+        chunks = embed_path_chunks(tasks, workers) if recognizer is None else _embed_in_process(recognizer, tasks)
+        for i, embeddings, error in chunks:
+            if embeddings is None:
+                raise RuntimeError(f"Rebuild failed, keeping the current face database: {error}")
+            position = 0
+            for name, paths in shards[i]:
+                found = [e for e in embeddings[position:position + len(paths)] if e is not None]
+                position += len(paths)
+                writer.add_person(name, found)
+                status['embedded'] += len(found)
+                status['people_done'] += 1
+                status['photos_done'] += len(paths)
+
+            status['elapsed_s'] = time.perf_counter() - started
+            status['photos_per_second'] = status['photos_done'] / status['elapsed_s']
+            status['eta_s'] = (status['photos_total'] - status['photos_done']) / status['photos_per_second']
+            if progress is not None:
+                progress(dict(status))
+
+        with write_lock(config.EMBEDDINGS_PATH):
+            # People enrolled, changed or deleted during the rebuild keep their current rows
+            current = _read_current()
+            after = _person_sums(current)
+            changed = [name for name, sums in after.items() if before.get(name) != sums]
+            removed = [name for name in before if name not in after]
+            replace = {}
+            if changed:
+                offsets = dict(zip(current.names, np.concatenate(([0], np.cumsum(current.counts)[:-1]))))
+                counts = dict(zip(current.names, current.counts))
+                for name in changed:
+                    rows = slice(offsets[name], offsets[name] + counts[name])
+                    replace[name] = (np.array(current.matrix[rows]), np.array(current.norms[rows]))
+            current = None  # Drop any memory map of the file about to be replaced
+            writer.close(replace, removed)
+    except BaseException:
+        writer.abort()
+        raise
+    if changed or removed:
+        print(f"Kept {len(changed)} people changed and dropped {len(removed)} removed during the rebuild")
+
+    print(f"✅ Database rebuilt with {len(writer.names)} people ({status['embedded']} of "
+          f"{status['photos_total']} photos embedded in {time.perf_counter() - started:.1f}s)")
+    return len(writer.names)
@@ -0,0 +1,290 @@
+"""Headless HTTP recognition service sharing one warm pipeline.
+
+Endpoints (image bodies are raw JPEG/PNG bytes):
+    POST /recognize[?multi=1&log=0]          identify the face(s) in the image
+    POST /verify?name=NAME                   1:1 check of the image against an enrolled user
+    POST /enroll?name=NAME[&department=...]  add the image as a photo of NAME
+    GET  /health                             readiness, model load times and queue depth
+
+Requests are queued for a fixed pool of workers; once SERVICE_QUEUE_SIZE
+requests are waiting, new ones get 503 with Retry-After instead of piling up.
+
+Usage (from the project root):
+    python -m utils.http_service --port 8080
+    curl --data-binary @face.jpg http://127.0.0.1:8080/recognize
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+import numpy as np
+import config
+from utils.database_manager import DatabaseManager
+from utils.face_verification import FaceVerifier
+from utils.warmup import get_warmup
+
+REASONS = {200: "OK", 400: "Bad Request", 403: "Forbidden", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 422: "Unprocessable Entity", 500: "Internal Server Error",
+           503: "Service Unavailable"}
+
+Response = Tuple[int, Dict]
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+class RecognitionService:
+    """Routes HTTP requests onto a bounded queue served by worker threads"""
+
+    ROUTES = {
+        '/recognize': ('POST', 'recognize'),
+        '/verify': ('POST', 'verify'),
+        '/enroll': ('POST', 'enroll'),
+        '/health': ('GET', 'health'),
+    }
+
+    def __init__(self, workers: Optional[int] = None, queue_size: Optional[int] = None):
+        self.warmup = get_warmup()
+        self.pipeline = self.warmup.pipeline
+        self.verifier = FaceVerifier(self.pipeline.recognizer)
+        self.db_manager = DatabaseManager()
+        self.workers = workers or config.SERVICE_WORKERS
+        self.queue_size = queue_size or config.SERVICE_QUEUE_SIZE
+        self.max_body = config.SERVICE_MAX_BODY_BYTES
+        self.enroll_token = config.SERVICE_ENROLL_TOKEN
+        self.served = 0
+        self.rejected = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="http-worker")
+
+    async def start(self, host: Optional[str] = None, port: Optional[int] = None) -> asyncio.AbstractServer:
+        """Start warm-up, the workers and the listening socket"""
+        self.warmup.start()
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        for _ in range(self.workers):
+            asyncio.ensure_future(self._worker())
+        return await asyncio.start_server(self._handle_connection, host or config.SERVICE_HOST,
+                                          port or config.SERVICE_PORT)
+
+    # ========================================
+    # ENDPOINTS (run on worker threads)
+    # ========================================
+
+    def recognize(self, query: Dict[str, str], body: bytes, headers: Dict[str, str]) -> Response:
+        self.warmup.wait()
+        log = query.get('log', '1') != '0'
+        if query.get('multi', '0') == '1':
+            result = self.pipeline.run_multi(body)
+            faces = result['faces']
+        else:
+            result = self.pipeline.run(body)
+            faces = [result] if result['face_detected'] else []
+        if not faces:
+            return 422, {'error': 'No face detected', **result}
+        if log and 'identity' not in result['timed_out']:
+            for face in faces:
+                if face['person_name']:
+                    self.db_manager.log_access(face['person_name'], face['confidence'],
+                                               face['emotion']['dominant_emotion'], face['is_suspicious'])
+                else:
+                    self.db_manager.log_access_denied(0.0)
+        return 200, result
+
+    def verify(self, query: Dict[str, str], body: bytes, headers: Dict[str, str]) -> Response:
+        name = self._user_name(query)
+        self.warmup.wait()
+        if name not in self.pipeline.recognizer.ensure_gallery().name_index:
+            return 404, {'error': f"Unknown user {name}"}
+        verified, confidence, details = self.verifier.verify(body, name)
+        if 'error' in details:
+            return 422, {'name': name, 'verified': False, 'error': details['error']}
+        return 200, {'name': name, 'verified': bool(verified), 'confidence': float(confidence),
+                     'distance': details.get('distance'), 'threshold': details.get('threshold')}
+
+    def enroll(self, query: Dict[str, str], body: bytes, headers: Dict[str, str]) -> Response:
+        if self.enroll_token and headers.get('x-enroll-token') != self.enroll_token:
+            return 403, {'error': 'Missing or invalid X-Enroll-Token'}
+        name = self._user_name(query)
+        self.warmup.wait()
+        added = self.db_manager.add_user_photo(name, body, query.get('employee_id', ''),
+                                               query.get('department', ''), query.get('notes', ''))
+        if not added:
+            return 422, {'name': name, 'enrolled': False, 'error': 'No face detected'}
+        return 200, {'name': name, 'enrolled': True, 'photos': self.db_manager.get_user_image_count(name)}
+
+    def health(self) -> Response:
+        gallery = self.pipeline.recognizer.gallery
+        return 200, {
+            'status': 'ok' if self.warmup.ready else self.warmup.state,
+            'warmup': self.warmup.status(),
+            'queue_depth': self._queue.qsize() if self._queue else 0,
+            'queue_size': self.queue_size,
+            'workers': self.workers,
+            'served': self.served,
+            'rejected': self.rejected,
+            'gallery': gallery.get_stats(),
+        }
+
+    @staticmethod
+    def _user_name(query: Dict[str, str]) -> str:
+        name = query.get('name', '').strip()
+        # The name becomes a directory under DATABASE_DIR
+        if not name or name in ('.', '..') or os.path.basename(name) != name:
+            raise ValueError("A valid 'name' query parameter is required")
+        return name
+
+    # ========================================
+    # HTTP PLUMBING
+    # ========================================
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            handler, query, body, headers, future = await self._queue.get()
+            try:
+                response = await loop.run_in_executor(self._executor, self._call, handler, query, body, headers)
+            except (Exception, asyncio.CancelledError) as e:
+                # E.g. the executor was shut down or the loop is tearing down: never leave the request hanging
+                if not future.done():
+                    future.set_result((500, {'error': str(e) or type(e).__name__}))
+                if isinstance(e, asyncio.CancelledError):
+                    raise
+                print(f"Service error in {handler.__name__}: {e}")
+                continue
+            finally:
+                self._queue.task_done()
+            if not future.done():
+                future.set_result(response)
+
+    @staticmethod
+    def _call(handler, query: Dict[str, str], body: bytes, headers: Dict[str, str]) -> Response:
+        try:
+            return handler(query, body, headers)
+        except ValueError as e:
+            return 400, {'error': str(e)}
+        except Exception as e:
+            print(f"Service error in {handler.__name__}: {e}")
+            return 500, {'error': str(e)}
+
+    async def _dispatch(self, method: str, target: str, headers: Dict[str, str], body: bytes) -> Response:
+        url = urlsplit(target)
+        route = self.ROUTES.get(url.path)
+        if route is None:
+            return 404, {'error': f"No endpoint {url.path}"}
+        allowed, name = route
+        if method != allowed:
+            return 405, {'error': f"{url.path} expects {allowed}"}
+        if name == 'health':
+            return self.health()
+        if not body:
+            return 400, {'error': 'Request body must contain the image bytes'}
+
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((getattr(self, name), query, body, headers, future))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return 503, {'error': 'Server busy, retry later'}
+        response = await future
+        self.served += 1
+        return response
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    await self._respond(writer, 400, {'error': 'Malformed request line'}, keep_alive=False)
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    key, _, value = line.decode('latin-1').partition(":")
+                    headers[key.strip().lower()] = value.strip()
+
+                keep_alive = (headers.get('connection', '').lower() != 'close'
+                              and version.upper() == 'HTTP/1.1')
+                try:
+                    length = int(headers.get('content-length', 0) or 0)
+                    if length < 0:
+                        raise ValueError(length)
+                except ValueError:
+                    await self._respond(writer, 400, {'error': 'Invalid Content-Length'}, keep_alive=False)
+                    break
+                if length > self.max_body:
+                    await self._respond(writer, 413, {'error': f"Body exceeds {self.max_body} bytes"},
+                                        keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                started = time.perf_counter()
+                status, payload = await self._dispatch(method.upper(), target, headers, body)
+                await self._respond(writer, status, payload, keep_alive,
+                                    elapsed_ms=(time.perf_counter() - started) * 1000)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _respond(writer: asyncio.StreamWriter, status: int, payload: Dict, keep_alive: bool,
+                       elapsed_ms: Optional[float] = None):
+        body = json.dumps(payload, default=_json_default).encode('utf-8')
+        headers = [
+            f"HTTP/1.1 {status} {REASONS.get(status, '')}",
+            "Content-Type: application/json",
+            f"Content-Length: {len(body)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}",
+        ]
+        if status == 503:
+            headers.append("Retry-After: 1")
+        if elapsed_ms is not None:
+            headers.append(f"Server-Timing: total;dur={elapsed_ms:.1f}")
+        writer.write(("\r\n".join(headers) + "\r\n\r\n").encode('latin-1') + body)
+        await writer.drain()
+
+
+async def serve(host: Optional[str] = None, port: Optional[int] = None,
+                workers: Optional[int] = None, queue_size: Optional[int] = None):
+    service = RecognitionService(workers, queue_size)
+    server = await service.start(host, port)
+    addresses = ", ".join(str(sock.getsockname()) for sock in server.sockets)
+    print(f"✓ Recognition service listening on {addresses}")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=config.SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=config.SERVICE_PORT)
+    parser.add_argument("--workers", type=int, default=config.SERVICE_WORKERS)
+    parser.add_argument("--queue-size", type=int, default=config.SERVICE_QUEUE_SIZE)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, args.queue_size))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+import os
+import shutil
+import uuid
+from datetime import datetime
+from typing import Optional, Union
+import numpy as np
+import config
+
+# A file path, encoded image bytes (JPEG/PNG), a file-like object such as a
+# Streamlit UploadedFile, or an already decoded BGR array.
+ImageSource = Union[str, bytes, bytearray, memoryview, np.ndarray, object]
+
+
+def _encoded_buffer(source) -> Optional[memoryview]:
+    """Zero-copy view of encoded image bytes, or None for paths and arrays"""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return memoryview(source)
+    if hasattr(source, 'getbuffer'):
+        return source.getbuffer()
+    if hasattr(source, 'read'):
+        if hasattr(source, 'seek'):
+            source.seek(0)
+        return memoryview(source.read())
+    return None
+
+
+def decode_image(data) -> np.ndarray:
+    """Decode JPEG/PNG bytes into a BGR uint8 array"""
+    import cv2
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError("Could not decode image data")
+    return image
+
+
+def load_image(source: ImageSource) -> Union[str, np.ndarray]:
+    """Normalize an image source into something DeepFace accepts.
+
+    Paths are passed through untouched; everything else is decoded in memory
+    into a BGR array so no temp file is needed.
+    """
+    if isinstance(source, str):
+        return source
+    if isinstance(source, np.ndarray):
+        return source
+    buffer = _encoded_buffer(source)
+    if buffer is None:
+        raise TypeError(f"Unsupported image source: {type(source).__name__}")
+    return decode_image(buffer)
+
+
+def image_fingerprint(source: ImageSource) -> bytes:
+    """Bytes identifying an image's content, used for cache keys"""
+    if isinstance(source, str):
+        with open(source, 'rb') as f:
+            return f.read()
+    if isinstance(source, np.ndarray):
+        return str(source.shape).encode() + np.ascontiguousarray(source).tobytes()
+    buffer = _encoded_buffer(source)
+    if buffer is None:
+        raise TypeError(f"Unsupported image source: {type(source).__name__}")
+    return buffer.tobytes()
+
+
+def write_image(dest_path: str, source: ImageSource):
+    """Store an image as a JPEG file, copying already-encoded JPEGs verbatim"""
+    if isinstance(source, str):
+        shutil.copy(source, dest_path)
+        return
+    buffer = None if isinstance(source, np.ndarray) else _encoded_buffer(source)
+    if buffer is not None and buffer[:2].tobytes() == b'\xff\xd8':
+        with open(dest_path, 'wb') as f:
+            f.write(buffer)
+        return
+    import cv2
+    image = source if isinstance(source, np.ndarray) else decode_image(buffer)
+    if not cv2.imwrite(dest_path, image):
+        raise IOError(f"Could not write image to {dest_path}")
+
+
+def save_audit_capture(source: ImageSource, prefix: str = "access") -> Optional[str]:
+    """Keep a copy of a processed frame when AUDIT_CAPTURE_ENABLED is set"""
+    if not config.AUDIT_CAPTURE_ENABLED:
+        return None
+    try:
+        os.makedirs(config.AUDIT_CAPTURE_DIR, exist_ok=True)
+        file_name = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{prefix}_{uuid.uuid4().hex[:8]}.jpg"
+        dest_path = os.path.join(config.AUDIT_CAPTURE_DIR, file_name)
+        write_image(dest_path, source)
+        return dest_path
+    except Exception as e:
+        print(f"Audit capture error: {e}")
+        return None
@@ -0,0 +1,225 @@
+import json
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Tuple
+import config
+from utils.sqlite_store import SQLiteStore
+
+_shared_stores: Dict[str, 'AccessLogStore'] = {}
+_shared_lock = threading.Lock()
+
+LOG_COLUMNS = ('timestamp', 'user_name', 'confidence', 'emotion', 'suspicious', 'status')
+
+ACCESS_LOGS_TABLE = """
+    CREATE TABLE IF NOT EXISTS access_logs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp TEXT NOT NULL,
+        user_name TEXT NOT NULL,
+        confidence REAL NOT NULL DEFAULT 0,
+        emotion TEXT NOT NULL DEFAULT '',
+        suspicious INTEGER NOT NULL DEFAULT 0,
+        status TEXT NOT NULL
+    )
+"""
+
+# store_meta key present while legacy entries are replayed; the user store's trigger skips them
+IMPORTING_LOGS_KEY = "importing_access_logs"
+
+# Aggregate tables kept by triggers, and the bucket each log row falls into
+AGGREGATES = {
+    'access_hourly': "substr({row}.timestamp, 1, 13)",
+    'access_daily': "substr({row}.timestamp, 1, 10)",
+    'access_by_user': "{row}.user_name",
+}
+
+
+def get_log_store() -> 'AccessLogStore':
+    """Process-wide access log store for the configured database file"""
+    with _shared_lock:
+        if config.DB_PATH not in _shared_stores:
+            _shared_stores[config.DB_PATH] = AccessLogStore(config.DB_PATH)
+        return _shared_stores[config.DB_PATH]
+
+
+class AccessLogStore(SQLiteStore):
+    """Append-only access log: one INSERT per event, nothing is rewritten.
+
+    History is unbounded unless ACCESS_LOG_RETENTION is set. The legacy
+    access_logs.json is imported once, the first time the store is opened.
+    Queries are served from indexes with keyset (cursor) pagination, and
+    triggers keep per-status counters plus hourly, daily and per-user
+    aggregates so dashboards never recount the log.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        super().__init__(path)
+        self.retention = config.ACCESS_LOG_RETENTION
+        if os.path.exists(config.ACCESS_LOGS_PATH):
+            self.import_json(config.ACCESS_LOGS_PATH)
+
+    def _create_schema(self, conn: sqlite3.Connection):
+        conn.execute(ACCESS_LOGS_TABLE)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_access_logs_timestamp ON access_logs (timestamp)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_access_logs_user ON access_logs (user_name, id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_access_logs_status ON access_logs (status, id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_access_logs_suspicious ON access_logs (suspicious, id)")
+
+        has_counters = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'access_counters'"
+        ).fetchone()
+        conn.execute("CREATE TABLE IF NOT EXISTS access_counters (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        if not has_counters:
+            # Backfill once for logs written before the counters existed
+            conn.execute("INSERT INTO access_counters SELECT 'total', COUNT(*) FROM access_logs")
+            conn.execute("INSERT INTO access_counters SELECT 'suspicious', COALESCE(SUM(suspicious), 0) FROM access_logs")
+            conn.execute("INSERT INTO access_counters SELECT status, COUNT(*) FROM access_logs GROUP BY status")
+        conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS access_logs_count_insert AFTER INSERT ON access_logs BEGIN
+                INSERT OR IGNORE INTO access_counters (key, value) VALUES (NEW.status, 0);
+                UPDATE access_counters SET value = value + 1 WHERE key IN ('total', NEW.status);
+                UPDATE access_counters SET value = value + NEW.suspicious WHERE key = 'suspicious';
+            END
+        """)
+        conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS access_logs_count_delete AFTER DELETE ON access_logs BEGIN
+                UPDATE access_counters SET value = value - 1 WHERE key IN ('total', OLD.status);
+                UPDATE access_counters SET value = value - OLD.suspicious WHERE key = 'suspicious';
+            END
+        """)
+        for table, bucket in AGGREGATES.items():
+            self._create_aggregate(conn, table, bucket)
+        # Granted entries update users.last_seen/total_access_count through this trigger, so it
+        # must exist whichever store opens the database first
+        from utils.user_store import create_user_schema
+        create_user_schema(conn)
+
+    @staticmethod
+    def _create_aggregate(conn: sqlite3.Connection, table: str, bucket: str):
+        exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                bucket TEXT PRIMARY KEY,
+                total INTEGER NOT NULL DEFAULT 0,
+                granted INTEGER NOT NULL DEFAULT 0,
+                denied INTEGER NOT NULL DEFAULT 0,
+                suspicious INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        if not exists:
+            conn.execute(
+                f"INSERT INTO {table} SELECT {bucket.format(row='access_logs')}, COUNT(*), "
+                f"SUM(status = 'granted'), SUM(status = 'denied'), SUM(suspicious) FROM access_logs GROUP BY 1"
+            )
+        for event, row, sign in (("INSERT", "NEW", "+"), ("DELETE", "OLD", "-")):
+            key = bucket.format(row=row)
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {table}_{event.lower()} AFTER {event} ON access_logs BEGIN
+                    INSERT OR IGNORE INTO {table} (bucket) VALUES ({key});
+                    UPDATE {table} SET total = total {sign} 1,
+                        granted = granted {sign} ({row}.status = 'granted'),
+                        denied = denied {sign} ({row}.status = 'denied'),
+                        suspicious = suspicious {sign} {row}.suspicious
+                    WHERE bucket = {key};
+                END
+            """)
+
+    def append(self, entry: Dict) -> int:
+        """Append one log entry and return its id"""
+        with self.transaction() as conn:
+            log_id = self._insert(conn, entry)
+            if self.retention:
+                conn.execute("DELETE FROM access_logs WHERE id <= ?", (log_id - self.retention,))
+            return log_id
+
+    def recent(self, limit: int = 50) -> List[Dict]:
+        """Newest entries first"""
+        rows = self.query(f"SELECT {', '.join(LOG_COLUMNS)} FROM access_logs ORDER BY id DESC LIMIT ?", (int(limit),))
+        return [self._to_dict(row) for row in rows]
+
+    def search(self, user_name: Optional[str] = None, start: Optional[str] = None, end: Optional[str] = None,
+               status: Optional[str] = None, suspicious: Optional[bool] = None,
+               cursor: Optional[int] = None, limit: int = 50) -> Tuple[List[Dict], Optional[int]]:
+        """Filtered page of entries, newest first.
+
+        ``start``/``end`` are inclusive timestamp bounds in the log's
+        "%Y-%m-%d %H:%M:%S" format. Pass the returned cursor to fetch the
+        next (older) page; it is None when there are no more entries.
+        """
+        clauses, params = [], []
+        for clause, value in (("user_name = ?", user_name), ("timestamp >= ?", start),
+                              ("timestamp <= ?", end), ("status = ?", status), ("id < ?", cursor)):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+        if suspicious is not None:
+            clauses.append("suspicious = ?")
+            params.append(int(bool(suspicious)))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        rows = self.query(
+            f"SELECT id, {', '.join(LOG_COLUMNS)} FROM access_logs {where} ORDER BY id DESC LIMIT ?",
+            tuple(params) + (int(limit) + 1,)
+        )
+        page = rows[:limit]
+        next_cursor = page[-1]['id'] if len(rows) > limit else None
+        return [self._to_dict(row) for row in page], next_cursor
+
+    def user_names(self) -> List[str]:
+        return [row['user_name'] for row in self.query("SELECT DISTINCT user_name FROM access_logs ORDER BY user_name")]
+
+    def counters(self) -> Dict[str, int]:
+        """Trigger-maintained totals: 'total', 'suspicious' and one key per status"""
+        return {row['key']: row['value'] for row in self.query("SELECT key, value FROM access_counters")}
+
+    def aggregates(self, table: str, limit: int = 24, order_by: str = 'bucket',
+                   exclude: Tuple[str, ...] = ()) -> List[Dict]:
+        """Rows of one of the AGGREGATES tables, largest `order_by` first, leaving out `exclude` buckets"""
+        if table not in AGGREGATES or order_by not in ('bucket', 'total'):
+            raise ValueError(f"Unknown aggregate {table} ordered by {order_by}")
+        where = f"WHERE bucket NOT IN ({', '.join('?' for _ in exclude)})" if exclude else ""
+        rows = self.query(f"SELECT * FROM {table} {where} ORDER BY {order_by} DESC LIMIT ?",
+                          tuple(exclude) + (int(limit),))
+        return [dict(row) for row in rows]
+
+    def import_json(self, path: str, force: bool = False) -> int:
+        """Import a legacy access_logs.json once; returns the number of imported entries.
+
+        Replayed entries update the log counters and aggregates but not the
+        users' last_seen/total_access_count, which user_info.json already holds.
+        """
+        marker = f"imported:{os.path.abspath(path)}"
+        with self.transaction() as conn:
+            if self._get_meta(conn, marker) and not force:
+                return 0
+            try:
+                with open(path, 'r') as f:
+                    entries = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"Warning: Could not import {path}: {e}")
+                entries = []
+            self._set_meta(conn, IMPORTING_LOGS_KEY, "1")
+            for entry in entries:
+                self._insert(conn, entry)
+            conn.execute("DELETE FROM store_meta WHERE key = ?", (IMPORTING_LOGS_KEY,))
+            self._set_meta(conn, marker, str(len(entries)))
+        if entries:
+            print(f"✓ Imported {len(entries)} access log entries from {path}")
+        return len(entries)
+
+    @staticmethod
+    def _insert(conn: sqlite3.Connection, entry: Dict) -> int:
+        cursor = conn.execute(
+            "INSERT INTO access_logs (timestamp, user_name, confidence, emotion, suspicious, status) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (str(entry['timestamp']), str(entry.get('user_name', 'Unknown')),
+             float(entry.get('confidence', 0.0)), str(entry.get('emotion', '') or ''),
+             int(bool(entry.get('suspicious', False))), str(entry.get('status', 'denied')))
+        )
+        return cursor.lastrowid
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> Dict:
+        entry = {column: row[column] for column in LOG_COLUMNS}
+        entry['suspicious'] = bool(entry['suspicious'])
+        return entry
@@ -0,0 +1,119 @@
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+import config
+from utils.gallery import EmbeddingGallery
+
+
+class GalleryMatcher:
+    """Scores queries against a whole EmbeddingGallery in one shot.
+
+    Row distances come from a single matrix multiply against the normalized
+    gallery; per-person average distances are a segment reduction over the
+    gallery's contiguous person blocks. ``all_matches`` holds the ``top_k``
+    closest people, nearest first; pass ``all_people=True`` for everyone.
+    """
+
+    def __init__(self, distance_metric: Optional[str] = None, threshold: Optional[float] = None,
+                 top_k: Optional[int] = None):
+        self.distance_metric = distance_metric or config.DISTANCE_METRIC
+        self.threshold = config.RECOGNITION_THRESHOLD if threshold is None else threshold
+        self.top_k = top_k or config.MATCH_TOP_K
+
+    def row_distances(self, matrix: np.ndarray, norms: np.ndarray, queries: np.ndarray) -> np.ndarray:
+        """Distances between every query and every normalized gallery row, shape (Q, N)"""
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        q_norms = np.linalg.norm(queries, axis=1)
+        q_unit = queries / np.where(q_norms > 0, q_norms, 1.0)[:, None]
+        similarity = q_unit @ matrix.T
+
+        if self.distance_metric == "cosine":
+            return 1.0 - similarity
+        if self.distance_metric == "euclidean":
+            # |q - g|^2 = |q|^2 + |g|^2 - 2 |q| |g| cos(q, g)
+            squared = (q_norms[:, None] ** 2 + norms[None, :] ** 2
+                       - 2.0 * q_norms[:, None] * norms[None, :] * similarity)
+            return np.sqrt(np.maximum(squared, 0.0))
+        return np.full(similarity.shape, np.inf, dtype=np.float32)
+
+    def person_distances(self, gallery: EmbeddingGallery, queries: np.ndarray) -> np.ndarray:
+        """Average distance from every query to every person, shape (Q, P)"""
+        distances = self.row_distances(gallery.matrix, gallery.norms, queries)
+        sums = np.add.reduceat(distances, gallery.offsets, axis=1)
+        return sums / gallery.counts[None, :]
+
+    def match(self, gallery: EmbeddingGallery, query: np.ndarray,
+              all_people: bool = False) -> Tuple[Optional[str], float, Dict]:
+        return self.match_batch(gallery, np.atleast_2d(query), all_people)[0]
+
+    def match_indexed(self, gallery: EmbeddingGallery, index, query: np.ndarray,
+                      candidates: Optional[int] = None, indexed: Optional[EmbeddingGallery] = None,
+                      fresh_ids: Optional[np.ndarray] = None) -> Tuple[Optional[str], float, Dict]:
+        """Shortlist people with an ANN index, then re-rank them exactly.
+
+        When the index was built over an older snapshot (`indexed`), its
+        shortlist is mapped into `gallery` by name and `fresh_ids`, the people
+        added or changed since, are added to it. ``all_matches`` only covers
+        the shortlisted people.
+        """
+        unit = np.asarray(query, dtype=np.float32).ravel()
+        unit = unit / max(float(np.linalg.norm(unit)), 1e-12)
+        rows = index.search(unit, candidates or config.ANN_CANDIDATES)
+        if indexed is None or indexed.version == gallery.version:
+            return self.match_candidates(gallery, query, np.unique(gallery.labels[rows]))
+        names = [indexed.names[pid] for pid in np.unique(indexed.labels[rows])]
+        person_ids = np.array([gallery.name_index[n] for n in names if n in gallery.name_index], dtype=np.int64)
+        if fresh_ids is not None:
+            person_ids = np.union1d(person_ids, fresh_ids)
+        return self.match_candidates(gallery, query, person_ids)
+
+    def match_candidates(self, gallery: EmbeddingGallery, query: np.ndarray,
+                         person_ids: np.ndarray) -> Tuple[Optional[str], float, Dict]:
+        """Exact per-person average distances restricted to a candidate set"""
+        if not len(person_ids):
+            return None, 0.0, {}
+        person_ids = np.sort(np.asarray(person_ids, dtype=np.int64))
+        averages = self.candidate_distances(gallery, query, person_ids)
+        nearest = self._nearest(averages[None, :], False)[0]
+        all_matches = {gallery.names[person_ids[i]]: float(averages[i]) for i in nearest}
+        best_distance = float(averages[nearest[0]])
+        if best_distance <= self.threshold:
+            return gallery.names[person_ids[nearest[0]]], 1 - best_distance, all_matches
+        return None, 0.0, all_matches
+
+    def candidate_distances(self, gallery: EmbeddingGallery, query: np.ndarray,
+                            person_ids: np.ndarray) -> np.ndarray:
+        """Average distance from one query to each given person, touching only their rows"""
+        counts = gallery.counts[person_ids]
+        starts = gallery.offsets[person_ids]
+        local_offsets = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        rows = np.repeat(starts - local_offsets, counts) + np.arange(int(counts.sum()))
+
+        distances = self.row_distances(gallery.matrix[rows], gallery.norms[rows], query)[0]
+        return np.add.reduceat(distances, local_offsets) / counts
+
+    def match_batch(self, gallery: EmbeddingGallery, queries: np.ndarray,
+                    all_people: bool = False) -> List[Tuple[Optional[str], float, Dict]]:
+        queries = np.atleast_2d(queries)
+        if not len(gallery):
+            return [(None, 0.0, {}) for _ in range(len(queries))]
+
+        averages = self.person_distances(gallery, queries)
+        results = []
+        for row, nearest in zip(averages, self._nearest(averages, all_people)):
+            all_matches = {gallery.names[i]: float(row[i]) for i in nearest}
+            best_distance = float(row[nearest[0]])
+            if best_distance <= self.threshold:
+                results.append((gallery.names[nearest[0]], 1 - best_distance, all_matches))
+            else:
+                results.append((None, 0.0, all_matches))
+        return results
+
+    def _nearest(self, distances: np.ndarray, all_people: bool) -> np.ndarray:
+        """Column positions of the closest people per row, nearest first (top_k unless all_people)"""
+        k = distances.shape[1] if all_people else min(self.top_k, distances.shape[1])
+        if k < distances.shape[1]:
+            part = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        else:
+            part = np.broadcast_to(np.arange(k), distances.shape)
+        order = np.argsort(np.take_along_axis(distances, part, axis=1), axis=1, kind='stable')
+        return np.take_along_axis(part, order, axis=1)
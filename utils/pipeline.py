@@ -0,0 +1,158 @@
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import config
+from utils.emotion_detector import EmotionDetector
+from utils.face_recognition import FaceRecognizer
+from utils.image_io import ImageSource, load_image, save_audit_capture
+
+
+def _face_area(face: Dict) -> int:
+    area = face.get('facial_area') or {}
+    return int(area.get('w', 0)) * int(area.get('h', 0))
+
+
+class AuthenticationPipeline:
+    """Detects and aligns faces once, then feeds the same crops to the
+    recognition and emotion models with detection skipped.
+
+    Identity and emotion are independent given the crops, so they run on a
+    shared thread pool (TensorFlow releases the GIL during inference). Each
+    stage has its own timeout; with EMOTION_POLICY "granted_only" emotion
+    runs after identity and only for recognized faces.
+    """
+
+    def __init__(self, recognizer: Optional[FaceRecognizer] = None,
+                 emotion_detector: Optional[EmotionDetector] = None):
+        self.recognizer = recognizer or FaceRecognizer()
+        self.emotion_detector = emotion_detector or EmotionDetector()
+        self.max_faces = config.MAX_FACES_PER_FRAME
+        self.emotion_policy = config.EMOTION_POLICY
+        self.identity_timeout = config.IDENTITY_TIMEOUT_SECONDS
+        self.emotion_timeout = config.EMOTION_TIMEOUT_SECONDS
+        self._executor = ThreadPoolExecutor(max_workers=config.PIPELINE_WORKERS, thread_name_prefix="auth-stage")
+
+    def run(self, image: ImageSource) -> Dict:
+        """Authenticate the largest face in the frame"""
+        request_id, detected, faces, timings, timed_out = self._process(image, max_faces=1)
+        result = {
+            'request_id': request_id,
+            'face_detected': bool(faces),
+            'facial_area': None,
+            'person_name': None,
+            'confidence': 0.0,
+            'all_matches': {},
+            'emotion': None,
+            'suspicion_score': 0.0,
+            'is_suspicious': False,
+            'timings': timings,
+            'timed_out': timed_out,
+        }
+        if faces:
+            result.update(faces[0])
+        return result
+
+    def run_multi(self, image: ImageSource, max_faces: Optional[int] = None) -> Dict:
+        """Authenticate every face in the frame, largest first, up to max_faces"""
+        request_id, detected, faces, timings, timed_out = self._process(image, max_faces or self.max_faces)
+        return {
+            'request_id': request_id,
+            'face_count': detected,
+            'faces': faces,
+            'timings': timings,
+            'timed_out': timed_out,
+        }
+
+    def _process(self, image: ImageSource, max_faces: int) -> Tuple[str, int, List[Dict], Dict, List[str]]:
+        timings, timed_out = {}, []
+        started = time.perf_counter()
+        request_id = uuid.uuid4().hex
+
+        stage_start = time.perf_counter()
+        frame = load_image(image)
+        timings['decode_ms'] = (time.perf_counter() - stage_start) * 1000
+        save_audit_capture(image, prefix=f"access_{request_id[:12]}")
+
+        stage_start = time.perf_counter()
+        detected = self.recognizer.detect_faces(frame)
+        timings['detection_ms'] = (time.perf_counter() - stage_start) * 1000
+        if not detected:
+            timings['total_ms'] = (time.perf_counter() - started) * 1000
+            return request_id, 0, [], timings, timed_out
+
+        # Biggest faces are closest to the door; the cap bounds per-frame latency
+        selected = sorted(detected, key=_face_area, reverse=True)[:max_faces]
+        crops = [face['face'] for face in selected]
+        results = [{
+            'facial_area': face['facial_area'],
+            'person_name': None,
+            'confidence': 0.0,
+            'all_matches': {},
+        } for face in selected]
+
+        identity = self._submit(self._identify, crops, timings)
+        emotion = None
+        if self.emotion_policy == "always":
+            emotion = self._submit(self._analyze_emotions, crops, timings)
+
+        matches = self._wait(identity, self.identity_timeout, 'identity', timed_out)
+        for result, match in zip(results, matches or []):
+            if match is not None:
+                person_name, confidence, all_matches = match
+                result.update(person_name=person_name, confidence=confidence, all_matches=all_matches)
+
+        analyzed = list(range(len(crops)))
+        if emotion is None:
+            # Denied faces skip emotion entirely so they return sooner
+            analyzed = [i for i, result in enumerate(results) if result['person_name']]
+            if analyzed:
+                emotion = self._submit(self._analyze_emotions, [crops[i] for i in analyzed], timings)
+        emotions = self._wait(emotion, self.emotion_timeout, 'emotion', timed_out) if emotion else None
+
+        unknown = self.emotion_detector.unknown_result()
+        by_face = dict(zip(analyzed, emotions or []))
+        for i, result in enumerate(results):
+            emotion_result, suspicion_score, is_suspicious = by_face.get(i, unknown)
+            result.update(emotion=emotion_result, suspicion_score=suspicion_score, is_suspicious=is_suspicious)
+
+        timings['total_ms'] = (time.perf_counter() - started) * 1000
+        return request_id, len(detected), results, timings, timed_out
+
+    def _identify(self, crops: List[np.ndarray], timings: Dict) -> List[Optional[Tuple[Optional[str], float, Dict]]]:
+        """(person_name, confidence, all_matches) per crop; None where no embedding was produced"""
+        stage_start = time.perf_counter()
+        embeddings = self.recognizer.embed_faces_shared(crops)
+        timings['embedding_ms'] = (time.perf_counter() - stage_start) * 1000
+
+        matches = [None] * len(crops)
+        found = [i for i, e in enumerate(embeddings) if e is not None]
+        if found:
+            stage_start = time.perf_counter()
+            for i, match in zip(found, self.recognizer.match_embeddings(np.stack([embeddings[i] for i in found]))):
+                matches[i] = match
+            timings['matching_ms'] = (time.perf_counter() - stage_start) * 1000
+        return matches
+
+    def _analyze_emotions(self, crops: List[np.ndarray], timings: Dict) -> List[Tuple[Dict, float, bool]]:
+        stage_start = time.perf_counter()
+        emotions = [self.emotion_detector.analyze_face(crop) for crop in crops]
+        timings['emotion_ms'] = (time.perf_counter() - stage_start) * 1000
+        return emotions
+
+    def _submit(self, fn, crops: List[np.ndarray], timings: Dict) -> Tuple[Future, float]:
+        return self._executor.submit(fn, crops, timings), time.monotonic()
+
+    @staticmethod
+    def _wait(submitted: Tuple[Future, float], timeout: float, stage: str, timed_out: List[str]):
+        """Result of a stage, or None if it failed or ran past `timeout` seconds from submission"""
+        future, submitted_at = submitted
+        try:
+            return future.result(timeout=max(0.0, submitted_at + timeout - time.monotonic()))
+        except FutureTimeoutError:
+            print(f"Warning: {stage} stage timed out after {timeout:.1f}s")
+            timed_out.append(stage)
+        except Exception as e:
+            print(f"Error in {stage} stage: {e}")
+        return None
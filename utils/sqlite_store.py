@@ -0,0 +1,58 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Iterator
+import config
+
+
+class SQLiteStore:
+    """Shared plumbing for the stores kept in the local SQLite file.
+
+    One connection per store instance is shared between Streamlit sessions
+    and guarded by a lock. WAL mode lets readers run alongside the writer,
+    and synchronous=NORMAL batches fsyncs to WAL checkpoints instead of
+    paying one per event.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path or config.DB_PATH
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(f"PRAGMA synchronous={config.DB_SYNCHRONOUS}")
+        with self.transaction() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS store_meta (key TEXT PRIMARY KEY, value TEXT)")
+            self._create_schema(conn)
+
+    def _create_schema(self, conn: sqlite3.Connection):
+        raise NotImplementedError
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Run statements atomically; rolled back if anything raises"""
+        with self._lock:
+            try:
+                self._conn.execute("BEGIN IMMEDIATE")
+                yield self._conn
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def query(self, sql: str, params: tuple = ()) -> list:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def _get_meta(self, conn: sqlite3.Connection, key: str):
+        row = conn.execute("SELECT value FROM store_meta WHERE key = ?", (key,)).fetchone()
+        return row['value'] if row else None
+
+    def _set_meta(self, conn: sqlite3.Connection, key: str, value: str):
+        conn.execute("INSERT OR REPLACE INTO store_meta (key, value) VALUES (?, ?)", (key, value))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,97 @@
+import os
+import sqlite3
+import threading
+from typing import Dict, Optional
+import config
+from utils.sqlite_store import SQLiteStore
+
+_shared_stores: Dict[str, 'StatsStore'] = {}
+_shared_lock = threading.Lock()
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+
+def get_stats_store() -> 'StatsStore':
+    """Process-wide enrolment statistics for the configured database file"""
+    with _shared_lock:
+        if config.DB_PATH not in _shared_stores:
+            _shared_stores[config.DB_PATH] = StatsStore(config.DB_PATH)
+        return _shared_stores[config.DB_PATH]
+
+
+def scan_photo_counts(database_dir: Optional[str] = None) -> Dict[str, int]:
+    """Photo count per user directory, read from disk"""
+    database_dir = database_dir or config.DATABASE_DIR
+    if not os.path.exists(database_dir):
+        return {}
+    counts = {}
+    for name in os.listdir(database_dir):
+        user_dir = os.path.join(database_dir, name)
+        if os.path.isdir(user_dir):
+            counts[name] = sum(1 for f in os.listdir(user_dir) if f.lower().endswith(IMAGE_EXTENSIONS))
+    return counts
+
+
+class StatsStore(SQLiteStore):
+    """Enrolment totals updated on register/delete instead of recounted per render.
+
+    Each enrolled user has one row with their photo count; triggers keep the
+    user and photo totals in `enrolment_counters`. The rows are seeded from
+    the user directories the first time the store is opened.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        super().__init__(path)
+        with self.transaction() as conn:
+            if not self._get_meta(conn, 'enrolments_synced'):
+                self._sync(conn, scan_photo_counts())
+
+    def _create_schema(self, conn: sqlite3.Connection):
+        conn.execute("CREATE TABLE IF NOT EXISTS enrolments (user_name TEXT PRIMARY KEY, photo_count INTEGER NOT NULL)")
+        conn.execute("CREATE TABLE IF NOT EXISTS enrolment_counters (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        conn.execute("INSERT OR IGNORE INTO enrolment_counters (key, value) VALUES ('users', 0), ('photos', 0)")
+        conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS enrolments_count_insert AFTER INSERT ON enrolments BEGIN
+                UPDATE enrolment_counters SET value = value + 1 WHERE key = 'users';
+                UPDATE enrolment_counters SET value = value + NEW.photo_count WHERE key = 'photos';
+            END
+        """)
+        conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS enrolments_count_update AFTER UPDATE ON enrolments BEGIN
+                UPDATE enrolment_counters SET value = value + NEW.photo_count - OLD.photo_count WHERE key = 'photos';
+            END
+        """)
+        conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS enrolments_count_delete AFTER DELETE ON enrolments BEGIN
+                UPDATE enrolment_counters SET value = value - 1 WHERE key = 'users';
+                UPDATE enrolment_counters SET value = value - OLD.photo_count WHERE key = 'photos';
+            END
+        """)
+
+    def record_enrolment(self, name: str, photo_count: int):
+        """Add a user, or update the photo count of an existing one"""
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT INTO enrolments (user_name, photo_count) VALUES (?, ?) "
+                "ON CONFLICT (user_name) DO UPDATE SET photo_count = excluded.photo_count",
+                (name, int(photo_count))
+            )
+
+    def record_removal(self, name: str):
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM enrolments WHERE user_name = ?", (name,))
+
+    def resync(self, photo_counts: Optional[Dict[str, int]] = None):
+        """Replace the rows with the given counts (default: rescan the user directories)"""
+        with self.transaction() as conn:
+            self._sync(conn, scan_photo_counts() if photo_counts is None else photo_counts)
+
+    def counters(self) -> Dict[str, int]:
+        """Trigger-maintained 'users' and 'photos' totals"""
+        return {row['key']: row['value'] for row in self.query("SELECT key, value FROM enrolment_counters")}
+
+    def _sync(self, conn: sqlite3.Connection, photo_counts: Dict[str, int]):
+        conn.execute("DELETE FROM enrolments")
+        conn.executemany("INSERT INTO enrolments (user_name, photo_count) VALUES (?, ?)",
+                         [(name, int(count)) for name, count in photo_counts.items()])
+        self._set_meta(conn, 'enrolments_synced', '1')
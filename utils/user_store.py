@@ -0,0 +1,127 @@
+import json
+import os
+import sqlite3
+import threading
+from typing import Dict, Optional
+import config
+from utils.log_store import ACCESS_LOGS_TABLE, IMPORTING_LOGS_KEY
+from utils.sqlite_store import SQLiteStore
+
+_shared_stores: Dict[str, 'UserStore'] = {}
+_shared_lock = threading.Lock()
+
+USER_COLUMNS = ('full_name', 'employee_id', 'department', 'notes', 'photo_count',
+                'registered_date', 'last_seen', 'total_access_count')
+
+
+def get_user_store() -> 'UserStore':
+    """Process-wide user metadata store for the configured database file"""
+    with _shared_lock:
+        if config.DB_PATH not in _shared_stores:
+            _shared_stores[config.DB_PATH] = UserStore(config.DB_PATH)
+        return _shared_stores[config.DB_PATH]
+
+
+def create_user_schema(conn: sqlite3.Connection):
+    """Users table plus the access_logs trigger that keeps it current; AccessLogStore creates it too"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            name TEXT PRIMARY KEY,
+            full_name TEXT NOT NULL DEFAULT '',
+            employee_id TEXT NOT NULL DEFAULT '',
+            department TEXT NOT NULL DEFAULT '',
+            notes TEXT NOT NULL DEFAULT '',
+            photo_count INTEGER NOT NULL DEFAULT 0,
+            registered_date TEXT,
+            last_seen TEXT,
+            total_access_count INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    # The trigger needs the log table, which may not exist yet in a fresh database
+    conn.execute(ACCESS_LOGS_TABLE)
+    # Replayed legacy logs are skipped: user_info.json already holds their totals.
+    # Recreated on open so databases with the unguarded trigger are upgraded.
+    conn.execute("DROP TRIGGER IF EXISTS users_touch_on_access")
+    conn.execute(f"""
+        CREATE TRIGGER users_touch_on_access AFTER INSERT ON access_logs
+        WHEN NEW.status = 'granted'
+            AND NOT EXISTS (SELECT 1 FROM store_meta WHERE key = '{IMPORTING_LOGS_KEY}') BEGIN
+            UPDATE users SET last_seen = NEW.timestamp, total_access_count = total_access_count + 1
+            WHERE name = NEW.user_name;
+        END
+    """)
+
+
+class UserStore(SQLiteStore):
+    """User metadata, one row per registered user.
+
+    `last_seen` and `total_access_count` are bumped by a trigger on
+    access_logs, so a granted access updates only that user's row and does
+    so in the same transaction as the log insert. The legacy user_info.json
+    is imported once, the first time the store is opened; entries replayed
+    from access_logs.json do not fire the trigger, since user_info.json
+    already counts them.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        super().__init__(path)
+        if os.path.exists(config.USER_INFO_PATH):
+            self.import_json(config.USER_INFO_PATH)
+
+    def _create_schema(self, conn: sqlite3.Connection):
+        create_user_schema(conn)
+
+    def get(self, name: str) -> Optional[Dict]:
+        rows = self.query(f"SELECT {', '.join(USER_COLUMNS)} FROM users WHERE name = ?", (name,))
+        return dict(rows[0]) if rows else None
+
+    def get_all(self) -> Dict[str, Dict]:
+        """Every user's metadata in one query, keyed by name"""
+        rows = self.query(f"SELECT name, {', '.join(USER_COLUMNS)} FROM users ORDER BY name")
+        return {row['name']: {column: row[column] for column in USER_COLUMNS} for row in rows}
+
+    def upsert(self, name: str, data: Dict):
+        """Insert or replace one user's metadata"""
+        with self.transaction() as conn:
+            self._upsert(conn, name, data)
+
+    def delete(self, name: str) -> bool:
+        with self.transaction() as conn:
+            return conn.execute("DELETE FROM users WHERE name = ?", (name,)).rowcount > 0
+
+    def import_json(self, path: str, force: bool = False) -> int:
+        """Import a legacy user_info.json once; returns the number of imported users"""
+        marker = f"imported:{os.path.abspath(path)}"
+        with self.transaction() as conn:
+            if self._get_meta(conn, marker) and not force:
+                return 0
+            try:
+                with open(path, 'r') as f:
+                    metadata = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"Warning: Could not import {path}: {e}")
+                metadata = {}
+            for name, data in metadata.items():
+                self._upsert(conn, name, data)
+            self._set_meta(conn, marker, str(len(metadata)))
+        if metadata:
+            print(f"✓ Imported {len(metadata)} users from {path}")
+        return len(metadata)
+
+    @staticmethod
+    def _upsert(conn: sqlite3.Connection, name: str, data: Dict):
+        values = {
+            'full_name': str(data.get('full_name', name)),
+            'employee_id': str(data.get('employee_id', '')),
+            'department': str(data.get('department', '')),
+            'notes': str(data.get('notes', '')),
+            'photo_count': int(data.get('photo_count', 0)),
+            'registered_date': data.get('registered_date'),
+            'last_seen': data.get('last_seen'),
+            'total_access_count': int(data.get('total_access_count', 0)),
+        }
+        conn.execute(
+            f"INSERT OR REPLACE INTO users (name, {', '.join(USER_COLUMNS)}) "
+            f"VALUES (?, {', '.join('?' for _ in USER_COLUMNS)})",
+            (name,) + tuple(values[column] for column in USER_COLUMNS)
+        )
@@ -0,0 +1,112 @@
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+from utils.pipeline import AuthenticationPipeline
+
+_shared_warmup: Optional['ModelWarmup'] = None
+_shared_lock = threading.Lock()
+
+
+def get_warmup() -> 'ModelWarmup':
+    """Process-wide warm-up, owning the pipeline every kiosk session shares"""
+    global _shared_warmup
+    with _shared_lock:
+        if _shared_warmup is None:
+            _shared_warmup = ModelWarmup()
+        return _shared_warmup
+
+
+class ModelWarmup:
+    """Builds every model and loads the gallery before the first request.
+
+    DeepFace builds models on first use, so each stage runs one dummy
+    inference through the same code path a request takes. Stages run in
+    order; a failing stage is recorded and the others still run.
+    """
+
+    PENDING, WARMING, READY, FAILED = "pending", "warming", "ready", "failed"
+
+    def __init__(self, pipeline: Optional[AuthenticationPipeline] = None):
+        self.pipeline = pipeline or AuthenticationPipeline()
+        self.state = self.PENDING
+        self.timings: Dict[str, float] = {}
+        self.errors: Dict[str, str] = {}
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._thread: Optional[threading.Thread] = None
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self.state == self.READY
+
+    def start(self, background: bool = True) -> 'ModelWarmup':
+        """Begin warming up (once per process); returns immediately unless `background` is False"""
+        with self._lock:
+            if self._thread is None:
+                self.started_at = time.time()
+                self.state = self.WARMING
+                self._thread = threading.Thread(target=self._run, name="model-warmup", daemon=True)
+                self._thread.start()
+        if not background:
+            self.wait()
+        return self
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until warm-up has finished; True if every stage succeeded"""
+        self._done.wait(timeout)
+        return self.ready
+
+    def status(self) -> Dict:
+        elapsed = None
+        if self.started_at is not None:
+            elapsed = (self.finished_at or time.time()) - self.started_at
+        return {
+            'state': self.state,
+            'ready': self.ready,
+            'timings_ms': dict(self.timings),
+            'errors': dict(self.errors),
+            'elapsed_s': elapsed,
+        }
+
+    def _stages(self) -> List[Tuple[str, Callable[[], None]]]:
+        recognizer = self.pipeline.recognizer
+        emotion_detector = self.pipeline.emotion_detector
+        frame = np.zeros((224, 224, 3), dtype=np.uint8)
+        face = np.zeros((160, 160, 3), dtype=np.uint8)
+
+        def recognition_model():
+            recognizer.embed_faces([face])
+
+        def face_detector():
+            # The kiosk-facing detector; enrolment and emotion ones load on first use
+            recognizer.detect_faces(frame)
+
+        def emotion_model():
+            emotion_detector.analyze_face(face)
+
+        def gallery():
+            # Reads every row once, so a memory-mapped matrix is paged in and the ANN index is built
+            snapshot = recognizer.ensure_gallery()
+            if snapshot is not None and snapshot.size:
+                recognizer.match_embedding(snapshot.matrix[0] * snapshot.norms[0])
+                recognizer.wait_for_index()
+
+        return [('recognition_model', recognition_model), ('face_detector', face_detector),
+                ('emotion_model', emotion_model), ('gallery', gallery)]
+
+    def _run(self):
+        for name, stage in self._stages():
+            started = time.perf_counter()
+            try:
+                stage()
+            except Exception as e:
+                print(f"Warm-up error in {name}: {e}")
+                self.errors[name] = str(e)
+            self.timings[name] = (time.perf_counter() - started) * 1000
+            print(f"✓ Warm-up {name}: {self.timings[name]:.0f} ms")
+        self.finished_at = time.time()
+        self.state = self.FAILED if self.errors else self.READY
+        self._done.set()